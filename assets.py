@@ -0,0 +1,151 @@
+"""
+Static asset pipeline for AI Portfolio.
+
+- Every file under static/ gets a content-hashed URL, e.g.
+  css/style.css → /static/css/style.3f9a1c2b7d.css
+- Templates resolve logical names with the `asset_url()` global.
+- Hashed URLs are served with `Cache-Control: immutable`, so repeat
+  visitors never revalidate; a content change produces a new URL.
+- Prebuilt .br / .gz variants are served when the client accepts them.
+
+Build the compressed variants (optional, brotli needs `pip install brotli`):
+    python assets.py
+"""
+
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+from fastapi.staticfiles import StaticFiles
+from starlette.responses import FileResponse
+from templating import TEMPLATE_AUTO_RELOAD
+import memstats
+
+STATIC_DIR = "static"
+STATIC_URL = "/static"
+HASH_LENGTH = 10
+IMMUTABLE = "public, max-age=31536000, immutable"
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".txt", ".html", ".map"}
+
+# style.3f9a1c2b7d.css → (style, 3f9a1c2b7d, .css)
+_HASHED_RE = re.compile(rf"^(.*)\.([0-9a-f]{{{HASH_LENGTH}}})(\.[A-Za-z0-9]+)$")
+
+# logical path → (mtime, hashed path)
+_manifest: dict[str, tuple[float, str]] = {}
+memstats.register("assets.manifest", _manifest)
+
+
+def _file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            h.update(block)
+    return h.hexdigest()[:HASH_LENGTH]
+
+
+def _hashed_name(logical: str) -> str | None:
+    full = os.path.join(STATIC_DIR, logical)
+    try:
+        mtime = os.stat(full).st_mtime
+    except OSError:
+        return None
+    cached = _manifest.get(logical)
+    if cached and (not TEMPLATE_AUTO_RELOAD or cached[0] == mtime):
+        return cached[1]
+    root, ext = os.path.splitext(logical)
+    hashed = f"{root}.{_file_hash(full)}{ext}"
+    _manifest[logical] = (mtime, hashed)
+    return hashed
+
+
+def asset_url(logical: str) -> str:
+    """Template global: 'css/style.css' → '/static/css/style.<hash>.css'."""
+    logical = logical.lstrip("/")
+    hashed = _hashed_name(logical)
+    return f"{STATIC_URL}/{hashed or logical}"
+
+
+def _resolve_hashed(path: str) -> str | None:
+    """'css/style.<hash>.css' → 'css/style.css' if the hash matches the current file."""
+    m = _HASHED_RE.match(path)
+    if not m:
+        return None
+    logical = m.group(1) + m.group(3)
+    return logical if _hashed_name(logical) == path else None
+
+
+class AssetStaticFiles(StaticFiles):
+    """StaticFiles that understands hashed names and serves precompressed variants."""
+
+    async def get_response(self, path: str, scope):
+        logical = _resolve_hashed(path)
+        immutable = logical is not None
+        logical = logical or path
+
+        accepted = set()
+        for key, value in scope.get("headers", []):
+            if key == b"accept-encoding":
+                accepted = {e.split(";")[0].strip() for e in value.decode("latin-1").split(",")}
+                break
+
+        full, stat = self.lookup_path(logical)
+        if stat is not None and accepted:
+            for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+                if encoding not in accepted:
+                    continue
+                variant, variant_stat = self.lookup_path(logical + suffix)
+                # Ignore variants left over from an older build of the file
+                if variant_stat is None or variant_stat.st_mtime < stat.st_mtime:
+                    continue
+                response = FileResponse(variant, stat_result=variant_stat)
+                response.headers["content-type"] = mimetypes.guess_type(full)[0] or "text/plain"
+                response.headers["content-encoding"] = encoding
+                response.headers["vary"] = "Accept-Encoding"
+                if immutable:
+                    response.headers["cache-control"] = IMMUTABLE
+                return response
+
+        response = await super().get_response(logical, scope)
+        if immutable and response.status_code == 200:
+            response.headers["cache-control"] = IMMUTABLE
+        return response
+
+
+def build(static_dir: str = STATIC_DIR) -> list[str]:
+    """Write .gz (and .br when brotli is installed) next to every compressible file."""
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        print("[Assets] brotli not installed — writing gzip variants only")
+
+    written = []
+    for root, _, files in os.walk(static_dir):
+        for name in files:
+            if os.path.splitext(name)[1] not in COMPRESSIBLE:
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                data = f.read()
+            variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+            if brotli:
+                variants.append((".br", brotli.compress(data, quality=11)))
+            for suffix, blob in variants:
+                if len(blob) >= len(data):
+                    continue
+                with open(path + suffix, "wb") as f:
+                    f.write(blob)
+                written.append(path + suffix)
+    return written
+
+
+if __name__ == "__main__":
+    for path in build():
+        print(f"✅ {path}")
+    for root, _, files in os.walk(STATIC_DIR):
+        for name in files:
+            if name.endswith((".gz", ".br")):
+                continue
+            logical = os.path.relpath(os.path.join(root, name), STATIC_DIR).replace(os.sep, "/")
+            print(f"   {logical} → {asset_url(logical)}")
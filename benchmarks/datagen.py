@@ -0,0 +1,312 @@
+"""
+Synthetic dataset generator for analytics benchmarks.
+
+Bulk-loads realistic applications, ref codes and visits with COPY, then
+times every query in sql_queries/, collect_portfolio_data(),
+summarize_visits() and GET /dashboard at each scale:
+
+    python -m benchmarks.datagen --docker --scales 1k,10k,100k,1m
+    python -m benchmarks.datagen --database-url postgresql://... --scales 10m --repeat 5
+    python -m benchmarks.datagen --database-url postgresql://... --scales 100k --load-only
+
+The generated data mirrors production shapes:
+- ref popularity is Zipf-skewed and ~30% of applications are never viewed
+- visits to the same ref arrive in time order, so visit_count and
+  is_return_visit are consistent
+- visit_source / UTM tags follow a fixed mix (LinkedIn, email, direct, ...)
+- time_on_site is log-normal (median ~45 s, capped at 6 h), and some
+  visits never send the beacon (NULL)
+
+The target database's tables are TRUNCATED — never point this at real data.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import statistics
+from itertools import accumulate
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta, timezone
+import psycopg
+from benchmarks import ROOT, git_commit
+from benchmarks.db import apply_schema, docker_postgres, truncate
+
+SQL_DIR = os.path.join(ROOT, "sql_queries")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+BENCH_SECRET = "benchmark-secret"
+BENCH_PASSWORD = "benchmark-password"
+
+# Value sets mirror the validation lists in routers/tracking.py
+OUTCOMES = (("pending", 55), ("no_response", 25), ("rejected", 15), ("got_call", 5))
+OUTREACH_CHANNELS = (("portal_apply", 40), ("linkedin_dm", 25), ("hr_email", 15),
+                     ("cold_founder_email", 12), ("referral", 8))
+ROLE_CATEGORIES = ("data_analyst", "apm", "founders_office", "ai_engineer", "business_analyst", "other")
+POSITIONS = ("Data Analyst", "Associate Product Manager", "Founder's Office", "AI Engineer",
+             "Business Analyst", "Analytics Engineer")
+COUNTRIES = (("IN", 55), ("US", 15), ("GB", 6), ("DE", 4), ("SG", 4), ("AE", 3), (None, 13))
+
+# (visit_source, utm_source, utm_medium, weight)
+SOURCE_MIX = (
+    ("linkedin", "linkedin", "social", 28),
+    ("linkedin", None, None, 10),
+    ("email_click", "gmail", "email", 18),
+    ("email_click", "outlook", "email", 6),
+    ("direct", None, None, 26),
+    ("unknown", None, None, 12),
+)
+
+NEVER_VIEWED_SHARE = 0.30
+NO_BEACON_SHARE = 0.15
+MAX_TIME_ON_SITE = 6 * 60 * 60
+
+
+def parse_scale(text: str) -> int:
+    text = text.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+def _weighted(options):
+    values = [o[:-1] if len(o) > 2 else o[0] for o in options]
+    return values, list(accumulate(o[-1] for o in options))
+
+
+# ─── Generation ───
+
+def _applications(rng: random.Random, count: int, today: date):
+    outcomes, outcome_w = _weighted(OUTCOMES)
+    channels, channel_w = _weighted(OUTREACH_CHANNELS)
+    for i in range(1, count + 1):
+        applied = today - timedelta(days=rng.randint(0, 365))
+        outcome = rng.choices(outcomes, cum_weights=outcome_w)[0]
+        yield (
+            i,
+            f"Company {i}",
+            f"Bench {i}",
+            rng.choice(POSITIONS),
+            applied,
+            outcome,
+            f"g{i:07x}",
+            rng.choices(channels, cum_weights=channel_w)[0],
+            rng.choice(ROLE_CATEGORIES),
+            rng.random() < 0.4,
+            applied + timedelta(days=rng.randint(3, 40)) if outcome != "pending" else None,
+        )
+
+
+def _visits(rng: random.Random, count: int, applied: dict[str, date], now: datetime):
+    """Visits in time order per ref, with Zipf-skewed ref popularity."""
+    viewed = [code for code in applied if rng.random() >= NEVER_VIEWED_SHARE] or list(applied)
+    rng.shuffle(viewed)
+    ref_weights = list(accumulate(1 / rank ** 1.1 for rank in range(1, len(viewed) + 1)))
+    sources, source_w = _weighted(SOURCE_MIX)
+    countries, country_w = _weighted(COUNTRIES)
+
+    last_seen: dict[str, datetime] = {}
+    seen_count: dict[str, int] = {}
+    batch = 100_000
+    for start in range(0, count, batch):
+        refs = rng.choices(viewed, cum_weights=ref_weights, k=min(batch, count - start))
+        for offset, code in enumerate(refs):
+            previous = last_seen.get(code)
+            if previous is None:
+                base = datetime.combine(applied[code], datetime.min.time(), tzinfo=timezone.utc)
+                ts = base + timedelta(hours=rng.expovariate(1 / 72))
+            else:
+                ts = previous + timedelta(hours=rng.expovariate(1 / 48))
+            if ts > now:
+                ts = now - timedelta(seconds=rng.randint(1, 3600))
+            last_seen[code] = ts
+            n = seen_count[code] = seen_count.get(code, 0) + 1
+
+            visit_source, utm_source, utm_medium = rng.choices(sources, cum_weights=source_w)[0]
+            seconds = None
+            if rng.random() >= NO_BEACON_SHARE:
+                seconds = min(MAX_TIME_ON_SITE, int(rng.lognormvariate(math.log(45), 1.2)))
+            yield (
+                code, ts, n, rng.choices(countries, cum_weights=country_w)[0],
+                f"s{start + offset:x}{rng.getrandbits(64):016x}", n > 1,
+                visit_source, seconds, utm_source, utm_medium,
+            )
+
+
+def load(url: str, visits: int, visits_per_application: int = 20, seed: int = 42) -> dict:
+    """Truncate and bulk-load a dataset of `visits` visits. Returns row counts and load time."""
+    rng = random.Random(seed)
+    today = date.today()
+    now = datetime.now(timezone.utc)
+    applications = max(50, visits // visits_per_application)
+
+    truncate(url)
+    start = time.perf_counter()
+    applied: dict[str, date] = {}
+    with psycopg.connect(url) as conn, conn.cursor() as cur:
+        with cur.copy(
+            "COPY applications (id, company_name, person_name, position, date_applied, outcome, "
+            "ref_code, outreach_channel, role_category, followed_up, outcome_date) FROM STDIN"
+        ) as copy:
+            for row in _applications(rng, applications, today):
+                applied[row[6]] = row[4]
+                copy.write_row(row)
+
+        with cur.copy("COPY ref_codes (id, ref_code, application_id) FROM STDIN") as copy:
+            for i, code in enumerate(applied, start=1):
+                copy.write_row((i, code, i))
+
+        with cur.copy(
+            "COPY visits (ref_code, timestamp, visit_count, country, visit_token, "
+            "is_return_visit, visit_source, time_on_site, utm_source, utm_medium) FROM STDIN"
+        ) as copy:
+            for row in _visits(rng, visits, applied, now):
+                copy.write_row(row)
+
+        for table in ("applications", "ref_codes"):
+            cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), %s)", (applications,))
+    with psycopg.connect(url, autocommit=True) as conn:
+        conn.execute("ANALYZE applications, ref_codes, visits")
+
+    return {
+        "applications": applications,
+        "visits": visits,
+        "load_seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+# ─── Measurement ───
+
+def _time(fn, repeat: int) -> dict:
+    fn()    # warm-up: plan caches, page cache, first-import costs
+    samples, rows = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": round(statistics.median(samples), 2), "max_ms": round(max(samples), 2), "rows": rows}
+
+
+def _prepare_app_env(url: str):
+    """Point the app modules at the benchmark database before they are imported."""
+    os.environ.update({
+        "DATABASE_URL": url,
+        "SESSION_SECRET_KEY": BENCH_SECRET,
+        "DASHBOARD_PASSWORD": BENCH_PASSWORD,
+        "GROQ_API_KEY": "",
+        "NOTIFICATION_EMAIL": "",
+        "NOTIFICATION_EMAIL_PASSWORD": "",
+        "LAZY_ADMIN_ROUTERS": "false",
+    })
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+
+def measure(url: str, repeat: int) -> dict:
+    timings = {}
+
+    for name in sorted(os.listdir(SQL_DIR)):
+        if not name.endswith(".sql"):
+            continue
+        with open(os.path.join(SQL_DIR, name)) as f:
+            query = f.read()
+
+        def run_query(query=query):
+            with psycopg.connect(url) as conn:
+                return len(conn.execute(query).fetchall())
+
+        timings[f"sql_queries/{name}"] = _time(run_query, repeat)
+
+    from fastapi.testclient import TestClient
+    from config import SESSION_TOKEN
+    from routers import intelligence
+    import main
+
+    def collect():
+        data = intelligence.collect_portfolio_data()
+        return len(data["visits"])
+
+    def summarize():
+        return intelligence.summarize_visits()["total_visits"]
+
+    client = TestClient(main.app)
+    client.cookies.set("auth", SESSION_TOKEN)
+
+    def dashboard():
+        response = client.get("/dashboard")
+        response.raise_for_status()
+        return len(response.content)    # "rows" is the page size in bytes here
+
+    timings["collect_portfolio_data()"] = _time(collect, repeat)
+    timings["summarize_visits()"] = _time(summarize, repeat)
+    timings["GET /dashboard"] = _time(dashboard, repeat)
+    return timings
+
+
+def print_matrix(results: dict):
+    scales = list(results)
+    names = list(next(iter(results.values()))["timings"]) if results else []
+    width = max((len(n) for n in names), default=10) + 2
+    print("\n" + "median ms".ljust(width) + "".join(f"{s:>14s}" for s in scales))
+    for name in names:
+        cells = "".join(f"{results[s]['timings'][name]['median_ms']:14.1f}" for s in scales)
+        print(name.ljust(width) + cells)
+    print("load seconds".ljust(width) + "".join(f"{results[s]['load_seconds']:14.1f}" for s in scales))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load synthetic data at several scales and time the analytics.")
+    db = parser.add_mutually_exclusive_group()
+    db.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"),
+                    help="disposable database (tables are truncated); default $BENCH_DATABASE_URL")
+    db.add_argument("--docker", action="store_true", help="start a throwaway Postgres container")
+    parser.add_argument("--scales", default="1k,10k,100k", help="visit counts, e.g. 1k,100k,1m,10m")
+    parser.add_argument("--visits-per-application", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--load-only", action="store_true", help="load the (last) scale and stop")
+    parser.add_argument("--output", help="result file (default benchmarks/results/datagen-<timestamp>-<commit>.json)")
+    args = parser.parse_args()
+
+    if not args.docker and not args.database_url:
+        parser.error("pass --docker or a disposable --database-url / BENCH_DATABASE_URL")
+    scales = [parse_scale(s) for s in args.scales.split(",") if s.strip()]
+
+    results = {}
+    with (docker_postgres() if args.docker else nullcontext(args.database_url)) as url:
+        # Before apply_schema, which imports the database package
+        _prepare_app_env(url)
+        apply_schema(url)
+        if args.load_only:
+            info = load(url, scales[-1], args.visits_per_application, args.seed)
+            print(f"✅ Loaded {info['applications']} applications, {info['visits']} visits "
+                  f"in {info['load_seconds']} s")
+            return
+
+        for visits in scales:
+            info = load(url, visits, args.visits_per_application, args.seed)
+            print(f"Loaded {info['visits']:>10,} visits / {info['applications']:>8,} applications "
+                  f"in {info['load_seconds']:.1f} s — measuring")
+            info["timings"] = measure(url, args.repeat)
+            results[f"{visits:,}"] = info
+
+    commit = git_commit()
+    output = args.output or os.path.join(RESULTS_DIR, f"datagen-{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "config": {"visits_per_application": args.visits_per_application,
+                       "repeat": args.repeat, "seed": args.seed},
+            "scales": results,
+        }, f, indent=2)
+
+    print_matrix(results)
+    print(f"\n✅ Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Fake Groq backend for benchmarks.
+
+Answers the OpenAI-compatible chat completions endpoint the Groq SDK calls
+with a fixed, valid insights payload after a configurable delay, so
+/insights/refresh can be load-tested without network access or API quota.
+The app is pointed at it through GROQ_BASE_URL, which the Groq SDK reads.
+
+    python -m benchmarks.fake_groq --port 8099 --delay-ms 800
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+INSIGHTS = [
+    {
+        "type": "pattern",
+        "headline": "LinkedIn outreach converts best",
+        "explanation": "Benchmark fixture insight.",
+        "action": "Keep prioritising direct outreach.",
+    },
+    {
+        "type": "warning",
+        "headline": "Many links never opened",
+        "explanation": "Benchmark fixture insight.",
+        "action": "Follow up after five days.",
+    },
+    {
+        "type": "opportunity",
+        "headline": "Return visitors signal intent",
+        "explanation": "Benchmark fixture insight.",
+        "action": "Prioritise companies with repeat visits.",
+    },
+]
+
+
+def _completion() -> bytes:
+    content = json.dumps({"insights": INSIGHTS})
+    return json.dumps({
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "llama-3.3-70b-versatile",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 1500, "completion_tokens": 300, "total_tokens": 1800},
+    }).encode()
+
+
+class FakeGroq:
+    """Threaded HTTP server; use as a context manager to run it in the background."""
+
+    def __init__(self, port: int = 0, delay_ms: float = 800, fail_rate: float = 0.0):
+        self.delay = delay_ms / 1000
+        self.fail_rate = fail_rate
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                time.sleep(fake.delay)
+                if random.random() < fake.fail_rate:
+                    body, status = b'{"error": {"message": "fake failure"}}', 500
+                else:
+                    body, status = _completion(), 200
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--delay-ms", type=float, default=800)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    fake = FakeGroq(args.port, args.delay_ms, args.fail_rate)
+    print(f"Fake Groq listening on {fake.url} (GROQ_BASE_URL={fake.url})")
+    fake.server.serve_forever()
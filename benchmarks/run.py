@@ -0,0 +1,295 @@
+"""
+Load-test the visit and beacon hot paths.
+
+Starts the app under uvicorn against a disposable database and a fake Groq
+backend, then drives each scenario at a fixed concurrency and reports
+throughput and p50 / p95 / p99 latency:
+
+    visit             GET  /?ref=<code>        (skewed ref popularity, unique client IPs)
+    track_time        POST /track-time         (beacon for a seeded visit)
+    dashboard         GET  /dashboard          (admin cookie)
+    insights_refresh  POST /insights/refresh   (admin cookie, fake Groq)
+
+Results are saved as JSON (benchmarks/results/<timestamp>-<commit>.json)
+for comparison across commits:
+
+    python -m benchmarks.run --docker
+    python -m benchmarks.run --database-url postgresql://... --concurrency 32 --requests 5000
+    python -m benchmarks.run --docker --compare benchmarks/results/<baseline>.json
+
+The target database's tables are TRUNCATED — never point this at real data.
+Requires httpx (pip install -r benchmarks/requirements.txt).
+"""
+
+import os
+import sys
+import math
+import hmac
+import json
+import time
+import random
+import socket
+import asyncio
+import hashlib
+import argparse
+import platform
+import subprocess
+from itertools import accumulate
+from contextlib import nullcontext
+import httpx
+import psycopg
+from benchmarks import ROOT, git_commit
+from benchmarks.db import apply_schema, docker_postgres
+from benchmarks.datagen import load
+from benchmarks.fake_groq import FakeGroq
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+SCENARIOS = ("visit", "track_time", "dashboard", "insights_refresh")
+
+BENCH_SECRET = "benchmark-secret"
+BENCH_PASSWORD = "benchmark-password"
+
+
+# ─── Fixture data ───
+
+def seed(url: str, applications: int, visits: int) -> tuple[list[str], list[str]]:
+    """Load a generated dataset. Returns (ref_codes, a sample of visit tokens)."""
+    load(url, visits, visits_per_application=max(1, visits // applications))
+    with psycopg.connect(url) as conn:
+        ref_codes = [row[0] for row in conn.execute("SELECT ref_code FROM ref_codes")]
+        tokens = [row[0] for row in conn.execute(
+            "SELECT visit_token FROM visits ORDER BY random() LIMIT 5000"
+        )]
+    return ref_codes, tokens
+
+
+# ─── App process ───
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(database_url: str, groq_url: str, workers: int, concurrency: int) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(os.environ)
+    # Explicit (even empty) values win over .env, so no real email / GA4 / Groq
+    env.update({
+        "DATABASE_URL": database_url,
+        "SESSION_SECRET_KEY": BENCH_SECRET,
+        "DASHBOARD_PASSWORD": BENCH_PASSWORD,
+        "GROQ_API_KEY": "benchmark",
+        "GROQ_BASE_URL": groq_url,
+        "NOTIFICATION_EMAIL": "",
+        "NOTIFICATION_EMAIL_PASSWORD": "",
+        "GA4_MEASUREMENT_ID": "",
+        "GA4_API_SECRET": "",
+        "EXCLUDED_IPS": "",
+        "LAZY_ADMIN_ROUTERS": "false",
+        "TIMING_SAMPLE_RATE": "0",
+        # Load shedding would turn most dashboard / insights requests into
+        # instant 503s; measure the routes themselves at the driven concurrency
+        "DASHBOARD_CONCURRENCY": str(concurrency),
+        "INSIGHTS_CONCURRENCY": str(concurrency),
+    })
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"App exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"{base}/health", timeout=1).status_code == 200:
+                return proc, base
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("App did not become healthy within 30s")
+
+
+# ─── Load driver ───
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies_ms: list[float], errors: int, wall_seconds: float) -> dict:
+    values = sorted(latencies_ms)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_rps": round(len(values) / wall_seconds, 1) if wall_seconds else 0.0,
+        "mean_ms": round(sum(values) / len(values), 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50), 2),
+        "p95_ms": round(percentile(values, 95), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+        "max_ms": round(values[-1], 2) if values else 0.0,
+    }
+
+
+def _zipf_weights(n: int, s: float = 1.1) -> list[float]:
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+
+def make_request(name: str, ref_codes: list[str], tokens: list[str], cookie: str):
+    rng = random.Random(7)
+    cum_weights = list(accumulate(_zipf_weights(len(ref_codes))))
+
+    def visit(client: httpx.AsyncClient):
+        code = rng.choices(ref_codes, cum_weights=cum_weights)[0]
+        # A distinct client IP per request keeps the per-IP rate limiter out of the way
+        ip = f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+        return client.get("/", params={"ref": code}, headers={"X-Forwarded-For": ip})
+
+    def track_time(client):
+        return client.post("/track-time", json={
+            "visit_token": rng.choice(tokens), "elapsed_seconds": rng.randint(1, 900),
+        })
+
+    admin = {"Cookie": f"auth={cookie}"}
+
+    def dashboard(client):
+        return client.get("/dashboard", headers=admin)
+
+    def insights_refresh(client):
+        return client.post("/insights/refresh", headers=admin)
+
+    return {
+        "visit": visit, "track_time": track_time,
+        "dashboard": dashboard, "insights_refresh": insights_refresh,
+    }[name]
+
+
+async def drive(base: str, request, total: int, concurrency: int, warmup: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30) as client:
+        for _ in range(warmup):
+            await request(client)
+
+        latencies: list[float] = []
+        errors = 0
+        remaining = total
+
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                try:
+                    response = await request(client)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append((time.perf_counter() - start) * 1000)
+                if not ok:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return summarize(latencies, errors, time.perf_counter() - start)
+
+
+# ─── Reporting ───
+
+def print_table(results: dict, baseline: dict | None = None):
+    print(f"\n{'scenario':18s} {'rps':>9s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'errors':>7s}")
+    for name, r in results.items():
+        print(f"{name:18s} {r['throughput_rps']:9.1f} {r['p50_ms']:9.2f} {r['p95_ms']:9.2f} "
+              f"{r['p99_ms']:9.2f} {r['errors']:7d}")
+        old = (baseline or {}).get(name)
+        if old:
+            def delta(key):
+                return f"{(r[key] - old[key]) / old[key] * 100:+8.1f}%" if old[key] else f"{'n/a':>9s}"
+            print(f"{'  vs baseline':18s} {delta('throughput_rps')} {delta('p50_ms')} "
+                  f"{delta('p95_ms')} {delta('p99_ms')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the visit and beacon hot paths.")
+    db = parser.add_mutually_exclusive_group()
+    db.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"),
+                    help="disposable database (tables are truncated); default $BENCH_DATABASE_URL")
+    db.add_argument("--docker", action="store_true", help="start a throwaway Postgres container")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--insights-requests", type=int, default=50,
+                        help="requests for insights_refresh (each waits on the fake Groq delay)")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--applications", type=int, default=200)
+    parser.add_argument("--visits", type=int, default=5000)
+    parser.add_argument("--groq-delay-ms", type=float, default=800)
+    parser.add_argument("--output", help="result file (default benchmarks/results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", help="baseline result file to diff against")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    if not args.docker and not args.database_url:
+        parser.error("pass --docker or a disposable --database-url / BENCH_DATABASE_URL")
+
+    cookie = hmac.new(BENCH_SECRET.encode(), BENCH_PASSWORD.encode(), hashlib.sha256).hexdigest()
+    results = {}
+
+    with (docker_postgres() if args.docker else nullcontext(args.database_url)) as database_url:
+        apply_schema(database_url)
+        ref_codes, tokens = seed(database_url, args.applications, args.visits)
+        print(f"Seeded {args.applications} applications, {args.visits} visits")
+
+        with FakeGroq(delay_ms=args.groq_delay_ms) as groq:
+            proc, base = start_app(database_url, groq.url, args.workers, args.concurrency)
+            try:
+                for name in scenarios:
+                    total = args.insights_requests if name == "insights_refresh" else args.requests
+                    request = make_request(name, ref_codes, tokens, cookie)
+                    warmup = min(args.warmup, total)
+                    results[name] = asyncio.run(drive(base, request, total, args.concurrency, warmup))
+                    print(f"  {name:18s} done ({results[name]['throughput_rps']} req/s)")
+            finally:
+                proc.terminate()
+                proc.wait(timeout=10)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "concurrency": args.concurrency, "requests": args.requests,
+            "insights_requests": args.insights_requests, "workers": args.workers,
+            "applications": args.applications, "visits": args.visits,
+            "groq_delay_ms": args.groq_delay_ms,
+        },
+        "scenarios": results,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["scenarios"]
+    print_table(results, baseline)
+    print(f"\n✅ Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
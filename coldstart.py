@@ -0,0 +1,135 @@
+"""
+Cold-start helpers for AI Portfolio.
+
+DeferredRouters keeps admin-only routers out of the import path of a
+serverless cold start: they are imported and mounted on the first request
+for a non-public path instead.
+
+Run this file to measure the cold-start budget (fresh interpreter each run):
+    python coldstart.py --runs 5 --budget-ms 400
+"""
+
+import os
+import sys
+import json
+import argparse
+import importlib
+import statistics
+import subprocess
+
+
+def include_deferred_routers(app, modules) -> None:
+    """Import each router module and mount its `router` (idempotent)."""
+    if getattr(app.state, "deferred_routers_loaded", False):
+        return
+    for name in modules:
+        app.include_router(importlib.import_module(name).router)
+    app.state.deferred_routers_loaded = True
+
+
+class DeferredRouters:
+    """
+    ASGI middleware: mounts `modules` into `fastapi_app` on the first HTTP
+    request whose path is not public. Public pages never trigger the import.
+    """
+
+    def __init__(self, app, fastapi_app, modules, public_paths, public_prefixes=("/static/",)):
+        self.app = app
+        self.fastapi_app = fastapi_app
+        self.modules = tuple(modules)
+        self.public_paths = frozenset(public_paths)
+        self.public_prefixes = tuple(public_prefixes)
+        self.loaded = False
+
+    async def __call__(self, scope, receive, send):
+        if not self.loaded and scope["type"] == "http":
+            path = scope["path"]
+            if path not in self.public_paths and not path.startswith(self.public_prefixes):
+                include_deferred_routers(self.fastapi_app, self.modules)
+                self.loaded = True
+        await self.app(scope, receive, send)
+
+
+# ─── Import-time report ───
+
+# Modules that a public page request should never need at startup
+WATCHED_MODULES = (
+    "psycopg", "groq", "smtplib", "email.mime.text", "urllib.request",
+    "routers.intelligence", "routers.export", "routers.diagnostics",
+)
+
+_PROBE = """
+import sys, time, json
+t = time.perf_counter()
+import main
+elapsed = (time.perf_counter() - t) * 1000
+print(json.dumps({"ms": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def _child_env(lazy: bool) -> dict:
+    env = dict(os.environ)
+    env.setdefault("SESSION_SECRET_KEY", "coldstart-probe")
+    env["LAZY_ADMIN_ROUTERS"] = "true" if lazy else "false"
+    # Measure with .pyc files, as a deployed function would have them
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def measure(runs: int, lazy: bool) -> tuple[list[float], list[str]]:
+    times, loaded = [], []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE % (WATCHED_MODULES,)],
+            env=_child_env(lazy), capture_output=True, text=True, check=True,
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(result["ms"])
+        loaded = result["loaded"]
+    return times, loaded
+
+
+def top_imports(lazy: bool, top: int) -> list[tuple[int, str]]:
+    """Largest cumulative import times (µs) from `python -X importtime`."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=_child_env(lazy), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("COLD_START_BUDGET_MS", "0")),
+                        help="fail (exit 1) if the median lazy import exceeds this")
+    args = parser.parse_args()
+
+    for lazy in (False, True):
+        times, loaded = measure(args.runs, lazy)
+        label = "lazy admin routers" if lazy else "eager (all routers)"
+        print(f"{label:22s} median {statistics.median(times):7.1f} ms  "
+              f"min {min(times):7.1f} ms  max {max(times):7.1f} ms")
+        print(f"{'':22s} heavy modules loaded at import: {', '.join(loaded) or 'none'}")
+
+    print(f"\nTop {args.top} imports (cumulative, lazy mode):")
+    for cumulative, name in top_imports(True, args.top):
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    if args.budget_ms:
+        median = statistics.median(measure(args.runs, True)[0])
+        if median > args.budget_ms:
+            print(f"\n❌ Cold start {median:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+            sys.exit(1)
+        print(f"\n✅ Cold start {median:.1f} ms within budget {args.budget_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Negotiated response compression for AI Portfolio.
+
+Compresses HTML / JSON / text responses with Brotli when the client accepts
+it and the optional `brotli` package is installed, otherwise gzip. Works
+for streaming responses too. Responses that already carry a
+Content-Encoding (precompressed assets, .gz exports), event streams and
+small bodies pass through untouched.
+"""
+
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional — gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/html", "text/plain", "text/css", "text/csv",
+    "application/json", "application/javascript", "application/x-ndjson",
+    "image/svg+xml",
+)
+
+
+class _Gzip:
+    encoding = "gzip"
+
+    def __init__(self, level: int):
+        self._c = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+class _Brotli:
+    encoding = "br"
+
+    def __init__(self, quality: int):
+        self._c = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.process(data)
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+def _negotiate(accept_encoding: str) -> str | None:
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024,
+                 gzip_level: int = 6, brotli_quality: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start: Message | None = None
+        self.compressor = None
+        self.passthrough = False
+
+    def _should_compress(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _begin(self):
+        if self.encoding == "br":
+            self.compressor = _Brotli(self.middleware.brotli_quality)
+        else:
+            self.compressor = _Gzip(self.middleware.gzip_level)
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = self.compressor.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if "content-length" in headers:
+            del headers["Content-Length"]
+        if "etag" in headers and not headers["etag"].startswith("W/"):
+            # Compressed bytes differ from the identity body
+            headers["ETag"] = "W/" + headers["etag"]
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = message["status"] < 200 or message["status"] in (204, 304) \
+                or not self._should_compress(headers)
+            if self.passthrough:
+                await self._send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self._send(self.start)
+                await self._send(message)
+                return
+            self._begin()
+            if not more_body:
+                compressed = self.compressor.compress(body) + self.compressor.finish()
+                MutableHeaders(raw=self.start["headers"])["Content-Length"] = str(len(compressed))
+                await self._send(self.start)
+                await self._send({"type": "http.response.body", "body": compressed})
+                return
+            await self._send(self.start)
+
+        out = self.compressor.compress(body)
+        if not more_body:
+            out += self.compressor.finish()
+        if out or not more_body:
+            await self._send({"type": "http.response.body", "body": out, "more_body": more_body})
@@ -0,0 +1,54 @@
+"""
+Configuration for AI Portfolio.
+Loads .env exactly once per process and derives shared values (like the
+session token) a single time; every other module imports from here.
+"""
+
+import os
+import hmac
+import hashlib
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """True/false environment switch ("1", "true", "yes", "on")."""
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+# Optional read replica for dashboard and analytics reads (database.get_read_connection)
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL") or None
+
+DASHBOARD_PASSWORD = os.getenv("DASHBOARD_PASSWORD", "changeme")
+SESSION_SECRET_KEY = os.getenv("SESSION_SECRET_KEY", "")
+
+# HMAC-sign the password so the auth cookie never contains the actual password.
+# Same password always produces the same token, so sessions survive restarts.
+SESSION_TOKEN = hmac.new(
+    key=SESSION_SECRET_KEY.encode(),
+    msg=DASHBOARD_PASSWORD.encode(),
+    digestmod=hashlib.sha256
+).hexdigest()
+
+BASE_URL = os.getenv("BASE_URL", "http://127.0.0.1:8000")
+CALENDLY_LINK = os.getenv("CALENDLY_LINK", "https://calendly.com")
+EXCLUDED_IPS = frozenset(ip.strip() for ip in os.getenv("EXCLUDED_IPS", "").split(",") if ip.strip())
+
+NOTIFICATION_EMAIL = os.getenv("NOTIFICATION_EMAIL", "")
+NOTIFICATION_EMAIL_PASSWORD = os.getenv("NOTIFICATION_EMAIL_PASSWORD", "")
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+
+GA4_MEASUREMENT_ID = os.getenv("GA4_MEASUREMENT_ID", "").strip()
+GA4_API_SECRET = os.getenv("GA4_API_SECRET", "").strip()
+
+# Bearer token for Prometheus scrapes of /metrics (the admin cookie also works)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "").strip()
+
+# Import admin-only routers on first use instead of at startup (serverless cold starts)
+LAZY_ADMIN_ROUTERS = env_flag("LAZY_ADMIN_ROUTERS", default=bool(os.getenv("VERCEL")))
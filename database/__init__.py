@@ -1,46 +1,179 @@
 """
 Database connection module for AI Portfolio.
 Provides context managers for PostgreSQL connections using psycopg3.
+
+Reads that can tolerate a few seconds of lag (dashboard, analytics,
+exports) use get_read_connection(), which goes to DATABASE_READ_URL when
+one is configured and falls back to the primary otherwise.
 """
 
 import os
-import psycopg
-from psycopg.rows import dict_row
+import math
+import time
 from contextlib import contextmanager
-from dotenv import load_dotenv
+from config import DATABASE_URL, DATABASE_READ_URL
+from timing import stage
+from database import profiler, changes
+import resilience
+from resilience import DATABASE, DATABASE_READ, CircuitOpenError
+from metrics import (
+    DB_CONNECTIONS_OPENED, DB_CONNECTIONS_CLOSED, DB_CONNECT_DURATION, DB_CONNECTION_LIFETIME,
+    DB_READS,
+)
+
+# psycopg is imported on first connection, not at import time: public pages
+# that never touch the database skip its import cost on a cold start.
+
+# Rows pulled per round trip when iterating a server-side cursor
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "2000"))
+
+# A replica further behind than this is skipped; lag is re-measured at most
+# every DATABASE_READ_LAG_CHECK_SECONDS
+DATABASE_READ_MAX_LAG_SECONDS = float(os.getenv("DATABASE_READ_MAX_LAG_SECONDS", "30"))
+DATABASE_READ_LAG_CHECK_SECONDS = float(os.getenv("DATABASE_READ_LAG_CHECK_SECONDS", "5"))
+
+# Postgres standby lag; 0 when caught up (an idle primary sends no new
+# transactions, so the replay timestamp alone would look stale)
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+_replica = {"lag_seconds": None, "checked_at": float("-inf"), "lag_supported": True}
+
 
-load_dotenv()
+def _open(url: str, breaker, connect_timeout: int | None = None):
+    import psycopg
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+    with stage("db_connect"), DB_CONNECT_DURATION.time(), breaker.guard():
+        timeout = resilience.connect_timeout(breaker)
+        if connect_timeout:
+            timeout = min(timeout, connect_timeout)
+        conn = psycopg.connect(url, connect_timeout=timeout)
+    profiler.instrument(conn)
+    DB_CONNECTIONS_OPENED.inc()
+    return conn
+
+
+@contextmanager
+def _session(conn):
+    """Commit on success, roll back on error, always close."""
+    opened_at = time.perf_counter()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        changes.discard(conn)
+        conn.rollback()
+        raise
+    else:
+        changes.committed(conn)
+    finally:
+        conn.close()
+        DB_CONNECTIONS_CLOSED.inc()
+        DB_CONNECTION_LIFETIME.observe(time.perf_counter() - opened_at)
 
 
 @contextmanager
-def get_connection():
+def get_connection(connect_timeout: int | None = None):
     """
     Context manager that yields a PostgreSQL connection.
     Automatically commits on success and rolls back on error.
+
+    Connecting goes through the DATABASE circuit breaker: while it is open
+    this raises resilience.CircuitOpenError without touching the network,
+    and otherwise waits at most the breaker's adaptive timeout (or
+    `connect_timeout` seconds, if lower).
     
     Usage:
         with get_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT 1")
     """
-    conn = None
+    with _session(_open(DATABASE_URL, DATABASE, connect_timeout)) as conn:
+        yield conn
+
+
+def _replica_lag(conn) -> float | None:
+    """Seconds the replica is behind, re-measured every DATABASE_READ_LAG_CHECK_SECONDS."""
+    now = time.monotonic()
+    if not _replica["lag_supported"] or now - _replica["checked_at"] < DATABASE_READ_LAG_CHECK_SECONDS:
+        return _replica["lag_seconds"]
+    _replica["checked_at"] = now
     try:
-        conn = psycopg.connect(DATABASE_URL)
+        lag = conn.execute(REPLICA_LAG_QUERY).fetchone()[0]
+        _replica["lag_seconds"] = float(lag or 0)
+    except Exception as e:
+        if getattr(e, "sqlstate", None) != "42883":      # undefined_function
+            # Lag unknown: skip the replica this time and measure again next time
+            print(f"[DB] Replica lag check failed ({type(e).__name__}: {e}) — reading from primary")
+            DATABASE_READ.record_failure(e)
+            _replica["checked_at"] = float("-inf")
+            return math.inf
+        # e.g. CockroachDB, which has no standby functions: rely on the breaker alone
+        print(f"[DB] Replica lag unavailable ({type(e).__name__}) — not checking it again")
+        _replica["lag_supported"] = False
+        _replica["lag_seconds"] = None
+    conn.rollback()
+    return _replica["lag_seconds"]
+
+
+def _open_replica():
+    """An open replica connection, or None if reads should go to the primary."""
+    try:
+        conn = _open(DATABASE_READ_URL, DATABASE_READ)
+    except CircuitOpenError:
+        return None
+    except Exception as e:
+        print(f"[DB] Replica unavailable ({type(e).__name__}: {e}) — reading from primary")
+        return None
+    lag = _replica_lag(conn)
+    if lag is not None and lag > DATABASE_READ_MAX_LAG_SECONDS:
+        conn.close()
+        DB_CONNECTIONS_CLOSED.inc()
+        return None
+    return conn
+
+
+def replica_status() -> dict:
+    return {
+        "configured": bool(DATABASE_READ_URL),
+        "lag_seconds": _replica["lag_seconds"],
+        "lag_checked": _replica["lag_supported"],
+        "max_lag_seconds": DATABASE_READ_MAX_LAG_SECONDS,
+    }
+
+
+@contextmanager
+def get_read_connection(primary: bool = False):
+    """
+    Context manager that yields a connection for read-only queries.
+
+    With DATABASE_READ_URL set, this is a replica connection unless
+    `primary` is True (read-your-writes, see routers/tracking.py), the
+    replica's breaker is open or it cannot be reached, or it lags more than
+    DATABASE_READ_MAX_LAG_SECONDS. All of those fall back to get_connection().
+    Only the connect step falls back: an error mid-query is raised.
+    """
+    conn = None
+    if DATABASE_READ_URL and not primary:
+        conn = _open_replica()
+        DB_READS.inc("replica" if conn else "fallback")
+    else:
+        DB_READS.inc("primary")
+
+    if conn is None:
+        with get_connection() as conn:
+            yield conn
+        return
+    with _session(conn):
         yield conn
-        conn.commit()
-    except Exception:
-        if conn:
-            conn.rollback()
-        raise
-    finally:
-        if conn:
-            conn.close()
 
 
 @contextmanager
-def get_cursor(dict_cursor=True):
+def get_cursor(dict_cursor=True, connect_timeout: int | None = None):
     """
     Context manager that yields a PostgreSQL cursor.
     Uses dict_row by default for dict-like row access.
@@ -51,10 +184,57 @@ def get_cursor(dict_cursor=True):
             cur.execute("SELECT * FROM applications")
             rows = cur.fetchall()
     """
-    with get_connection() as conn:
+    from psycopg.rows import dict_row
+
+    with stage("db"), get_connection(connect_timeout) as conn:
         row_factory = dict_row if dict_cursor else None
         cur = conn.cursor(row_factory=row_factory)
         try:
             yield cur
         finally:
             cur.close()
+
+
+@contextmanager
+def get_read_cursor(dict_cursor=True, primary: bool = False):
+    """get_cursor() for read-only queries, on get_read_connection(primary)."""
+    from psycopg.rows import dict_row
+
+    with stage("db"), get_read_connection(primary) as conn:
+        cur = conn.cursor(row_factory=dict_row if dict_cursor else None)
+        try:
+            yield cur
+        finally:
+            cur.close()
+
+
+@contextmanager
+def get_server_cursor(name: str, batch_size: int = STREAM_BATCH_SIZE,
+                      row_factory=None, conn=None):
+    """
+    Context manager that yields a server-side (named) cursor.
+    Iterating it fetches `batch_size` rows per round trip, so memory stays
+    flat no matter how many rows the query returns. Rows are plain tuples
+    unless a psycopg row_factory is given.
+
+    Pass `conn` to stream several queries over one connection; otherwise a
+    connection is opened (and committed/closed) just for this cursor.
+
+    Usage:
+        with get_server_cursor("visits_scan") as cur:
+            cur.execute("SELECT ref_code, time_on_site FROM visits")
+            for ref_code, seconds in cur:
+                ...
+    """
+    if conn is None:
+        with get_connection() as own_conn:
+            with get_server_cursor(name, batch_size, row_factory, own_conn) as cur:
+                yield cur
+        return
+
+    cur = conn.cursor(name=name, row_factory=row_factory)
+    cur.itersize = batch_size
+    try:
+        yield cur
+    finally:
+        cur.close()
@@ -0,0 +1,151 @@
+"""
+Change notifications for in-process caches.
+
+Writers call `publish(cur, table, key)` inside their transaction. That
+- queues the change on the connection; get_connection() and
+  run_transaction() apply it (bump this process's data version and run
+  subscribed evictions) right after COMMIT, and drop it on rollback, so a
+  retried attempt does not fire twice and no reader re-caches the
+  pre-commit state, and
+- with CACHE_NOTIFY=true, queues `pg_notify` on the same transaction, so
+  every worker's listener thread sees the change once it commits.
+
+A worker also receives its own notifications; evicting twice is harmless.
+
+Caches subscribe a callback taking a `Change`. `table=None` means "anything
+may have changed" (sent when the listener reconnects, since notifications
+are not queued while disconnected), so subscribers must then drop everything.
+
+LISTEN/NOTIFY is PostgreSQL-only — CockroachDB rejects both — so it is off
+by default and each worker only invalidates its own caches.
+"""
+
+import os
+import json
+import uuid
+import time
+import threading
+import weakref
+from typing import Callable, NamedTuple
+from config import DATABASE_URL, env_flag
+
+CACHE_NOTIFY = env_flag("CACHE_NOTIFY")
+CHANNEL = os.getenv("CACHE_NOTIFY_CHANNEL", "portfolio_changes")
+
+# Identifies this process in payloads (for logs; own echoes are still applied)
+ORIGIN = uuid.uuid4().hex[:12]
+
+
+class Change(NamedTuple):
+    table: str | None       # None → full invalidation
+    key: str | None         # None → many / unknown rows
+    column: str | None      # None → row-level change
+
+
+_subscribers: list[Callable[[Change], None]] = []
+_lock = threading.Lock()
+_version = 0
+_status = {"connected": False, "received": 0, "last_event_at": None, "errors": 0}
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+# Changes published on each connection's open transaction, applied at COMMIT
+_pending: "weakref.WeakKeyDictionary[object, list[Change]]" = weakref.WeakKeyDictionary()
+
+
+def subscribe(callback: Callable[[Change], None]) -> None:
+    _subscribers.append(callback)
+
+
+def data_version() -> int:
+    """Increases on every local or remote change; cheap staleness check for caches."""
+    return _version
+
+
+def _apply(change: Change) -> None:
+    global _version
+    with _lock:
+        _version += 1
+    for callback in list(_subscribers):
+        try:
+            callback(change)
+        except Exception as e:
+            print(f"[Changes] Subscriber {getattr(callback, '__qualname__', callback)} failed: {e}")
+
+
+def publish(cur, table: str, key=None, column: str | None = None) -> None:
+    """Record a write made on `cur`'s transaction (see module docstring)."""
+    change = Change(table, None if key is None else str(key), column)
+    if CACHE_NOTIFY:
+        payload = json.dumps({"table": change.table, "key": change.key,
+                              "column": change.column, "origin": ORIGIN})
+        cur.execute("SELECT pg_notify(%s, %s)", (CHANNEL, payload))
+    with _lock:
+        queued = _pending.setdefault(cur.connection, [])
+        if change not in queued:
+            queued.append(change)
+
+
+def committed(conn) -> None:
+    """Apply the changes published on `conn` now that its transaction has committed."""
+    with _lock:
+        queued = _pending.pop(conn, ())
+    for change in queued:
+        _apply(change)
+
+
+def discard(conn) -> None:
+    """Forget the changes published on `conn`; its transaction rolled back."""
+    with _lock:
+        _pending.pop(conn, None)
+
+
+# ─── Listener ───
+
+def _listen_forever() -> None:
+    import psycopg
+
+    backoff = 1.0
+    while not _stop.is_set():
+        try:
+            with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+                conn.execute(f"LISTEN {CHANNEL}")
+                _status["connected"] = True
+                backoff = 1.0
+                # Notifications sent while we were not listening are lost
+                _apply(Change(None, None, None))
+                while not _stop.is_set():
+                    for notify in conn.notifies(timeout=5.0):
+                        try:
+                            data = json.loads(notify.payload)
+                            change = Change(data.get("table"), data.get("key"), data.get("column"))
+                        except (ValueError, AttributeError):
+                            change = Change(None, None, None)
+                        _status["received"] += 1
+                        _status["last_event_at"] = time.time()
+                        _apply(change)
+        except Exception as e:
+            _status["errors"] += 1
+            print(f"[Changes] Listener disconnected: {type(e).__name__}: {e} — retrying in {backoff:.0f}s")
+        finally:
+            _status["connected"] = False
+        _stop.wait(backoff)
+        backoff = min(backoff * 2, 60.0)
+
+
+def start_listener() -> None:
+    """Start this worker's LISTEN thread (no-op unless CACHE_NOTIFY is on)."""
+    global _thread
+    if not CACHE_NOTIFY or not DATABASE_URL or (_thread and _thread.is_alive()):
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_listen_forever, name="cache-notify", daemon=True)
+    _thread.start()
+
+
+def stop_listener() -> None:
+    _stop.set()
+
+
+def status() -> dict:
+    return {"enabled": CACHE_NOTIFY, "channel": CHANNEL, "origin": ORIGIN,
+            "data_version": _version, **_status}
@@ -0,0 +1,245 @@
+"""
+Opt-in query profiler for AI Portfolio.
+
+With QUERY_PROFILING=true every connection from get_connection() gets
+profiling cursors. For each normalized statement the profiler records:
+- call count, total / mean / max duration and rows
+- a `[SlowQuery]` log line when a call takes longer than SLOW_QUERY_MS
+- a plan for a sample (EXPLAIN_SAMPLE_RATE) of slow SELECT / WITH
+  statements, captured on a separate connection in a background thread.
+  ANALYZE really executes the statement and a rollback does not undo
+  sequence advances or notifications, so only plain SELECTs without
+  nextval/setval/pg_notify get `EXPLAIN (ANALYZE, BUFFERS)`; the rest
+  (e.g. data-modifying CTEs) get a plain `EXPLAIN`.
+
+Server-side cursors (streamed reads) are timed from execute to close, so
+their duration includes the time the caller spent consuming rows.
+
+The top-N table is served at /admin/queries. Profile the canned analytics
+queries directly with:
+    python -m database.profiler sql_queries/*.sql
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import threading
+from config import DATABASE_URL, env_flag
+import memstats
+
+QUERY_PROFILING = env_flag("QUERY_PROFILING")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+EXPLAIN_SAMPLE_RATE = float(os.getenv("EXPLAIN_SAMPLE_RATE", "0.1"))
+
+# Re-explain the same statement at most this often
+EXPLAIN_COOLDOWN_SECONDS = 300
+# Bound on distinct statements kept; the cheapest is dropped beyond it
+MAX_TRACKED_QUERIES = 500
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_RE = re.compile(r"%(?:\(\w+\))?[sbt]")
+# Side effects EXPLAIN ANALYZE would really perform
+_SIDE_EFFECT_RE = re.compile(r"\b(?:nextval|setval|pg_notify|insert|update|delete|merge)\b", re.IGNORECASE)
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(query) -> str:
+    """Collapse literals, placeholders and whitespace so calls group by shape."""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    elif not isinstance(query, str):
+        try:
+            query = query.as_string(None)
+        except Exception:
+            query = str(query)
+    text = _STRING_RE.sub("?", query)
+    text = _PLACEHOLDER_RE.sub("?", text)
+    text = _NUMBER_RE.sub("?", text)
+    text = _IN_LIST_RE.sub("(?, ...)", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+class QueryStats:
+    __slots__ = ("query", "calls", "total_ms", "max_ms", "rows", "slow", "explain", "explained_at")
+
+    def __init__(self, query: str):
+        self.query = query
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.slow = 0
+        self.explain: str | None = None
+        self.explained_at = 0.0
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.calls if self.calls else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "query": self.query,
+            "calls": self.calls,
+            "total_ms": round(self.total_ms, 2),
+            "mean_ms": round(self.mean_ms, 2),
+            "max_ms": round(self.max_ms, 2),
+            "rows": self.rows,
+            "slow": self.slow,
+            "explain": self.explain,
+        }
+
+
+_stats: dict[str, QueryStats] = {}
+memstats.register("profiler.query_stats", _stats)
+_lock = threading.Lock()
+_explain_lock = threading.Lock()      # at most one EXPLAIN in flight
+
+
+def record(query, params, elapsed_ms: float, rows: int) -> None:
+    key = normalize_sql(query)
+    with _lock:
+        stats = _stats.get(key)
+        if stats is None:
+            if len(_stats) >= MAX_TRACKED_QUERIES:
+                del _stats[min(_stats.values(), key=lambda s: s.total_ms).query]
+            stats = _stats[key] = QueryStats(key)
+        stats.calls += 1
+        stats.total_ms += elapsed_ms
+        stats.max_ms = max(stats.max_ms, elapsed_ms)
+        stats.rows += max(rows, 0)
+        slow = elapsed_ms >= SLOW_QUERY_MS
+        if slow:
+            stats.slow += 1
+
+    if not slow:
+        return
+    print(f"[SlowQuery] {elapsed_ms:.1f} ms, {rows} rows: {key[:300]}")
+    if (
+        key.upper().startswith(("SELECT", "WITH"))
+        and random.random() < EXPLAIN_SAMPLE_RATE
+        and time.time() - stats.explained_at > EXPLAIN_COOLDOWN_SECONDS
+        and _explain_lock.acquire(blocking=False)
+    ):
+        stats.explained_at = time.time()
+        threading.Thread(target=_capture_explain, args=(stats, query, params), daemon=True).start()
+
+
+def explain_prefix(query: str) -> str:
+    """EXPLAIN ANALYZE only for statements that are safe to actually run."""
+    text = query.lstrip().upper()
+    if text.startswith("SELECT") and not _SIDE_EFFECT_RE.search(query):
+        return "EXPLAIN (ANALYZE, BUFFERS) "
+    return "EXPLAIN "
+
+
+def _capture_explain(stats: QueryStats, query, params) -> None:
+    """Run EXPLAIN on its own connection and always roll back."""
+    try:
+        import psycopg
+        from psycopg import sql
+
+        prefix = explain_prefix(stats.query)
+        if isinstance(query, str):
+            explain = prefix + query
+        else:
+            explain = sql.Composed([sql.SQL(prefix), query])
+        with psycopg.connect(DATABASE_URL) as conn:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(explain, params)
+                    stats.explain = "\n".join(row[0] for row in cur.fetchall())
+            finally:
+                conn.rollback()
+    except Exception as e:
+        print(f"[SlowQuery] EXPLAIN failed: {type(e).__name__}: {e}")
+    finally:
+        _explain_lock.release()
+
+
+def top(n: int = 20, order_by: str = "total_ms") -> list[dict]:
+    if order_by not in ("total_ms", "mean_ms", "max_ms", "calls", "slow"):
+        order_by = "total_ms"
+    with _lock:
+        rows = [stats.as_dict() for stats in _stats.values()]
+    return sorted(rows, key=lambda row: row[order_by], reverse=True)[:n]
+
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+
+
+# ─── Cursor classes ───
+# Built on first use so importing this module does not import psycopg.
+
+_factories = None
+
+
+def _cursor_factories():
+    global _factories
+    if _factories is None:
+        import psycopg
+
+        class ProfilingCursor(psycopg.Cursor):
+            def execute(self, query, params=None, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return super().execute(query, params, **kwargs)
+                finally:
+                    record(query, params, (time.perf_counter() - start) * 1000, self.rowcount)
+
+        class ProfilingServerCursor(psycopg.ServerCursor):
+            _profile = None
+
+            def execute(self, query, params=None, **kwargs):
+                self._profile = (query, params, time.perf_counter())
+                return super().execute(query, params, **kwargs)
+
+            def close(self):
+                try:
+                    super().close()
+                finally:
+                    if self._profile is not None:
+                        query, params, start = self._profile
+                        self._profile = None
+                        record(query, params, (time.perf_counter() - start) * 1000, self.rownumber or 0)
+
+        _factories = (ProfilingCursor, ProfilingServerCursor)
+    return _factories
+
+
+def instrument(conn) -> None:
+    """Give `conn` profiling cursors (no-op unless QUERY_PROFILING is on)."""
+    if not QUERY_PROFILING:
+        return
+    conn.cursor_factory, conn.server_cursor_factory = _cursor_factories()
+
+
+def _profile_files(paths: list[str]) -> None:
+    """Run each .sql file once and print its timing and plan."""
+    import psycopg
+
+    for path in paths:
+        with open(path) as f:
+            query = f.read().strip().rstrip(";")
+        with psycopg.connect(DATABASE_URL) as conn:
+            with conn.cursor() as cur:
+                start = time.perf_counter()
+                cur.execute(explain_prefix(query) + query)
+                plan = "\n".join(row[0] for row in cur.fetchall())
+                elapsed = (time.perf_counter() - start) * 1000
+            conn.rollback()
+        marker = "❌" if elapsed >= SLOW_QUERY_MS else "✅"
+        print(f"{marker} {path}  {elapsed:.1f} ms")
+        print("   " + plan.replace("\n", "\n   ") + "\n")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m database.profiler sql_queries/*.sql")
+        sys.exit(1)
+    _profile_files(sys.argv[1:])
@@ -0,0 +1,127 @@
+"""
+Ref code allocation for AI Portfolio.
+
+Codes are derived from a database sequence pushed through a keyed
+format-preserving permutation (a Feistel network over 42 bits, with
+cycle-walking down to 36^8). Distinct sequence numbers always map to
+distinct codes, so no uniqueness pre-check is needed, and the output still
+looks like the original opaque 8-char lowercase base36 codes.
+
+Sequence numbers are reserved in blocks, so most codes cost no round trip.
+"""
+
+import os
+import hmac
+import hashlib
+import threading
+from collections import deque
+from config import SESSION_SECRET_KEY
+from database import get_cursor
+import memstats
+
+ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyz"
+CODE_LENGTH = 8
+DOMAIN = len(ALPHABET) ** CODE_LENGTH      # 36^8 ≈ 2^41.4
+
+_HALF_BITS = 21                            # 2 × 21 = 42 bits ≥ DOMAIN
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = 8
+
+# Keep this stable once codes are issued: a new key maps the sequence onto
+# different codes, and clashes with old codes are only caught on INSERT.
+REF_CODE_KEY = os.getenv("REF_CODE_KEY") or SESSION_SECRET_KEY
+REF_CODE_BLOCK_SIZE = int(os.getenv("REF_CODE_BLOCK_SIZE", "32"))
+
+
+def _round(key: bytes, i: int, half: int) -> int:
+    digest = hmac.new(key, bytes([i]) + half.to_bytes(4, "big"), hashlib.sha256).digest()
+    return int.from_bytes(digest[:4], "big") & _HALF_MASK
+
+
+def _feistel(key: bytes, value: int) -> int:
+    left, right = value >> _HALF_BITS, value & _HALF_MASK
+    for i in range(_ROUNDS):
+        left, right = right, left ^ _round(key, i, right)
+    return (left << _HALF_BITS) | right
+
+
+def permute(n: int, key: str = REF_CODE_KEY) -> int:
+    """
+    Bijection on [0, DOMAIN). The Feistel network permutes 42-bit values;
+    cycle-walking re-applies it until the result lands back inside DOMAIN.
+    """
+    if not 0 <= n < DOMAIN:
+        raise ValueError(f"sequence value {n} outside ref code domain")
+    k = key.encode()
+    value = _feistel(k, n)
+    while value >= DOMAIN:
+        value = _feistel(k, value)
+    return value
+
+
+def encode(n: int) -> str:
+    """Fixed-width base36 encoding of n."""
+    chars = []
+    for _ in range(CODE_LENGTH):
+        n, r = divmod(n, len(ALPHABET))
+        chars.append(ALPHABET[r])
+    return "".join(reversed(chars))
+
+
+def is_ref_code(value: str) -> bool:
+    """True if `value` has the shape of an issued code (it may still be unknown)."""
+    return len(value) == CODE_LENGTH and all(c in ALPHABET for c in value)
+
+
+def code_for(seq: int, key: str = REF_CODE_KEY) -> str:
+    """The ref code for sequence number `seq`."""
+    return encode(permute(seq % DOMAIN, key))
+
+
+class RefCodeAllocator:
+    """
+    Hands out ref codes from blocks of sequence numbers reserved in one query.
+    Thread-safe; each worker process keeps its own block, and unused numbers
+    are simply skipped on restart.
+    """
+
+    def __init__(self, block_size: int = REF_CODE_BLOCK_SIZE, key: str = REF_CODE_KEY):
+        self.block_size = block_size
+        self.key = key
+        self._pool: deque[int] = deque()
+        self._lock = threading.Lock()
+
+    def _nextvals(self, count: int) -> list[int]:
+        with get_cursor(dict_cursor=False) as cur:
+            cur.execute(
+                "SELECT nextval('ref_code_seq') FROM generate_series(1, %s)",
+                (count,)
+            )
+            return [row[0] for row in cur.fetchall()]
+
+    def _fetch_sequence(self, count: int) -> list[int]:
+        try:
+            return self._nextvals(count)
+        except Exception as e:
+            # Databases created before ref_code_seq was added to schema.sql
+            if getattr(e, "sqlstate", None) != "42P01":      # undefined_table
+                raise
+        with get_cursor() as cur:
+            cur.execute("CREATE SEQUENCE IF NOT EXISTS ref_code_seq")
+        print("[RefCodes] Created missing ref_code_seq")
+        return self._nextvals(count)
+
+    def reserve(self, count: int) -> list[str]:
+        """Return `count` codes, topping up the local block with at most one query."""
+        with self._lock:
+            if len(self._pool) < count:
+                self._pool.extend(self._fetch_sequence(count - len(self._pool) + self.block_size))
+            seqs = [self._pool.popleft() for _ in range(count)]
+        return [code_for(seq, self.key) for seq in seqs]
+
+    def next_code(self) -> str:
+        return self.reserve(1)[0]
+
+
+allocator = RefCodeAllocator()
+memstats.register("ref_codes.reserved_block", allocator._pool)
@@ -0,0 +1,81 @@
+"""
+Transaction retries for serialization conflicts.
+
+CockroachDB runs every transaction at SERIALIZABLE and, when two of them
+conflict (e.g. concurrent visits counting and inserting for the same ref
+code), aborts one with SQLSTATE 40001 and expects the client to run it
+again. Postgres raises the same code under SERIALIZABLE, and 40P01 for a
+deadlock. run_transaction() owns that loop: it runs `fn(cur)` in a
+transaction, and on a retryable error rolls back, sleeps with exponential
+backoff and full jitter, and calls `fn` again on the same connection.
+
+`fn` may therefore run more than once, so it must keep side effects that
+cannot be undone (emails, HTTP calls, in-memory counters) out of the
+transaction or make them idempotent. Other errors are raised at once.
+
+Usage:
+    def mark_called(cur):
+        cur.execute("UPDATE applications SET outcome = 'got_call' WHERE id = %s", (app_id,))
+        return cur.rowcount
+
+    updated = run_transaction(mark_called)
+"""
+
+import os
+import time
+import random
+from typing import Callable, TypeVar
+from database import get_connection, changes
+from timing import stage
+from metrics import DB_RETRIES
+
+DB_RETRY_ATTEMPTS = int(os.getenv("DB_RETRY_ATTEMPTS", "5"))
+DB_RETRY_BASE_MS = float(os.getenv("DB_RETRY_BASE_MS", "10"))
+DB_RETRY_MAX_MS = float(os.getenv("DB_RETRY_MAX_MS", "500"))
+
+# serialization_failure (incl. CockroachDB "restart transaction"), deadlock_detected
+RETRYABLE_SQLSTATES = frozenset({"40001", "40P01"})
+
+T = TypeVar("T")
+
+
+def is_retryable(exc: BaseException) -> bool:
+    return getattr(exc, "sqlstate", None) in RETRYABLE_SQLSTATES
+
+
+def backoff(attempt: int) -> float:
+    """Seconds to sleep before retry number `attempt` (1-based): full jitter, capped."""
+    ceiling = min(DB_RETRY_MAX_MS, DB_RETRY_BASE_MS * 2 ** (attempt - 1))
+    return random.uniform(0, ceiling) / 1000
+
+
+def run_transaction(fn: Callable[..., T], dict_cursor: bool = True,
+                    connect_timeout: int | None = None,
+                    attempts: int | None = None) -> T:
+    """
+    Run `fn(cur)` in its own transaction, retrying it on 40001/40P01.
+    Returns what `fn` returns; the transaction is committed before that.
+    """
+    from psycopg.rows import dict_row
+
+    attempts = attempts or DB_RETRY_ATTEMPTS
+    name = getattr(fn, "__name__", "transaction")
+    with stage("db"), get_connection(connect_timeout) as conn:
+        for attempt in range(1, attempts + 1):
+            try:
+                # COMMIT is inside the loop too: CockroachDB can report the conflict there
+                with conn.transaction(), conn.cursor(row_factory=dict_row if dict_cursor else None) as cur:
+                    result = fn(cur)
+            except Exception as e:
+                changes.discard(conn)
+                if not is_retryable(e) or attempt == attempts:
+                    if is_retryable(e):
+                        DB_RETRIES.inc(name, "exhausted")
+                    raise
+                DB_RETRIES.inc(name, "retried")
+                delay = backoff(attempt)
+                print(f"[DB] {name}: {e.sqlstate} on attempt {attempt}/{attempts}, retrying in {delay * 1000:.0f} ms")
+                time.sleep(delay)
+            else:
+                changes.committed(conn)
+                return result
@@ -0,0 +1,47 @@
+"""
+Applies database/schema.sql to a fresh or existing database.
+
+schema.sql is written for CockroachDB, the production database, and is
+idempotent there as is. Postgres lacks `CREATE TYPE IF NOT EXISTS`, so on
+Postgres those statements run inside a DO block that ignores
+duplicate_object instead.
+
+Usage:
+    from database.schema import apply_schema
+    apply_schema(os.environ["DATABASE_URL"])
+"""
+
+import os
+import re
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.sql")
+
+_CREATE_TYPE_RE = re.compile(r"^CREATE TYPE IF NOT EXISTS\s+(.*)$", re.IGNORECASE | re.DOTALL)
+
+
+def _statements(sql: str) -> list[str]:
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [stmt.strip() for stmt in "\n".join(lines).split(";") if stmt.strip()]
+
+
+def is_cockroachdb(conn) -> bool:
+    return "cockroachdb" in conn.execute("SELECT version()").fetchone()[0].lower()
+
+
+def apply_schema(url: str, path: str = SCHEMA_PATH) -> None:
+    """Run every statement of `path` against `url`, adapting CREATE TYPE for Postgres."""
+    import psycopg
+
+    with open(path, encoding="utf-8") as f:
+        statements = _statements(f.read())
+    with psycopg.connect(url, autocommit=True) as conn:
+        wrap_types = not is_cockroachdb(conn)
+        for stmt in statements:
+            m = _CREATE_TYPE_RE.match(stmt)
+            if m and wrap_types:
+                stmt = (
+                    f"DO $$ BEGIN CREATE TYPE {m.group(1)}; "
+                    "EXCEPTION WHEN duplicate_object THEN NULL; END $$"
+                )
+            conn.execute(stmt)
+    print(f"[Schema] Applied {os.path.basename(path)} ({len(statements)} statements)")
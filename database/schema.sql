@@ -50,6 +50,10 @@ CREATE TABLE IF NOT EXISTS ref_codes (
     is_active       BOOLEAN DEFAULT TRUE
 );
 
+-- Sequence behind ref code allocation (database/ref_codes.py).
+-- Each value is permuted into an opaque 8-char code, so codes never need a uniqueness check.
+CREATE SEQUENCE IF NOT EXISTS ref_code_seq;
+
 -- Index for fast ref_code lookups on visits table
 CREATE INDEX IF NOT EXISTS idx_visits_ref_code ON visits(ref_code);
 
@@ -0,0 +1,16 @@
+-- AI Portfolio — optional CockroachDB key layout
+-- Run after schema.sql, on CockroachDB only:
+--   cockroach sql --url $DATABASE_URL < database/schema_cockroach.sql
+
+-- visits.id: SERIAL ids (a sequence, or unique_rowid()) grow with time, so
+-- every new visit is written to the end of the same range and a burst of
+-- visits queues on one node. unordered_unique_rowid() spreads inserts
+-- across the key space. Ids stay unique but no longer follow insert order
+-- (sort by timestamp instead) and are 64-bit.
+ALTER TABLE visits ALTER COLUMN id TYPE INT8;
+ALTER TABLE visits ALTER COLUMN id SET DEFAULT unordered_unique_rowid();
+
+-- Date-filtered visit scans (e.g. exports) without a timestamp
+-- hotspot: a hash-sharded index splits the ever-increasing timestamps
+-- over 8 buckets, and range scans read all buckets in parallel.
+CREATE INDEX IF NOT EXISTS idx_visits_timestamp ON visits (timestamp) USING HASH WITH (bucket_count = 8);
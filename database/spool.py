@@ -0,0 +1,182 @@
+"""
+Append-only local journal for writes the database could not take.
+
+When the database breaker (resilience.DATABASE) is open or a visit insert
+fails, log_visit appends the visit here and returns its visit_token right
+away. Records are JSON lines. Each append is written straight to the OS;
+fsync runs in batches (every SPOOL_FSYNC_MS or SPOOL_FSYNC_BATCH records),
+so a page load never waits on the disk and a host crash loses at most one
+batch. Once the spool holds SPOOL_MAX_BYTES, append() raises SpoolFull and
+new records are dropped (and counted) until a replay frees space.
+
+Every process appends to its own file, `<name>-<pid>.jsonl`. replay()
+seals that file (renames it aside, so new records start a fresh one),
+claims sealed files by renaming them again, and removes each one only
+after its handler returns. A failed replay leaves the file for the next
+attempt; handlers must therefore be idempotent (visits are keyed by
+visit_token). Files left by dead processes are picked up as well.
+
+On Vercel only /tmp is writable and it does not outlive the instance: the
+spool rides out database blips there, not instance recycling.
+"""
+
+import os
+import json
+import glob
+import time
+import tempfile
+import threading
+from typing import Callable
+
+SPOOL_DIR = os.getenv("SPOOL_DIR") or os.path.join(tempfile.gettempdir(), "portfolio-spool")
+SPOOL_FSYNC_MS = float(os.getenv("SPOOL_FSYNC_MS", "200"))
+SPOOL_FSYNC_BATCH = int(os.getenv("SPOOL_FSYNC_BATCH", "50"))
+SPOOL_MAX_BYTES = int(os.getenv("SPOOL_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+class SpoolFull(OSError):
+    """Raised by Journal.append() once the spool holds max_bytes."""
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Journal:
+    def __init__(self, name: str, directory: str = SPOOL_DIR, max_bytes: int = SPOOL_MAX_BYTES):
+        self.name = name
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._file = None
+        self._unsynced = 0
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        # Checked on the hot path; the directory is only scanned at startup
+        self.pending = bool(glob.glob(os.path.join(directory, f"{name}-*")))
+        # Spooled bytes not yet replayed; appends by other processes are only
+        # counted after this one's next replay
+        self._bytes = self._size()
+
+    @property
+    def _active_path(self) -> str:
+        return os.path.join(self.directory, f"{self.name}-{os.getpid()}.jsonl")
+
+    def _size(self) -> int:
+        return sum(os.path.getsize(path)
+                   for path in glob.glob(os.path.join(self.directory, f"{self.name}-*"))
+                   if os.path.exists(path))
+
+    def append(self, record: dict) -> None:
+        line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            if self._bytes + len(line) > self.max_bytes:
+                self.dropped += 1
+                raise SpoolFull(f"spool holds {self._bytes} bytes (SPOOL_MAX_BYTES={self.max_bytes})")
+            if self._file is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._file = open(self._active_path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+            self._bytes += len(line)
+            self._unsynced += 1
+            self.pending = True
+            now = time.monotonic()
+            if self._unsynced >= SPOOL_FSYNC_BATCH or (now - self._synced_at) * 1000 >= SPOOL_FSYNC_MS:
+                os.fsync(self._file.fileno())
+                self._unsynced = 0
+                self._synced_at = now
+
+    def _seal(self) -> None:
+        """Close this process's file and move it aside for replay."""
+        with self._lock:
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+                self._unsynced = 0
+            if os.path.exists(self._active_path):
+                os.rename(self._active_path, self._sealed_path(os.getpid()))
+
+    def _sealed_path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"{self.name}-{time.time_ns()}-{pid}.sealed")
+
+    def _adopt_orphans(self) -> None:
+        """Seal files of dead processes and release their unfinished claims."""
+        for path in glob.glob(os.path.join(self.directory, f"{self.name}-*.jsonl")):
+            pid = int(path.rsplit("-", 1)[1].split(".")[0])
+            if pid != os.getpid() and not _pid_alive(pid):
+                os.replace(path, self._sealed_path(pid))
+        for path in glob.glob(os.path.join(self.directory, f"{self.name}-*.sealed.*")):
+            pid = int(path.rsplit(".", 1)[1])
+            if pid != os.getpid() and not _pid_alive(pid):
+                os.replace(path, path.rsplit(".", 1)[0])
+
+    @staticmethod
+    def _read(path: str) -> list[dict]:
+        records = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # Torn final line from a crash mid-write
+                    print(f"[Spool] Skipping unreadable line in {os.path.basename(path)}")
+        return records
+
+    def replay(self, handler: Callable[[list[dict]], None]) -> int:
+        """
+        Feed every sealed file to `handler`, oldest first. Returns records
+        replayed; stops at the first handler error (the file is kept).
+        """
+        if not self._replay_lock.acquire(blocking=False):
+            return 0
+        replayed = 0
+        try:
+            if not os.path.isdir(self.directory):
+                self.pending = False
+                return 0
+            self._seal()
+            self._adopt_orphans()
+            for path in sorted(glob.glob(os.path.join(self.directory, f"{self.name}-*.sealed"))):
+                claimed = f"{path}.{os.getpid()}"
+                try:
+                    os.rename(path, claimed)
+                except FileNotFoundError:
+                    continue        # another worker claimed it
+                records = self._read(claimed)
+                try:
+                    if records:
+                        handler(records)
+                except Exception:
+                    os.rename(claimed, path)
+                    raise
+                os.remove(claimed)
+                replayed += len(records)
+            with self._lock:
+                self.pending = self._file is not None
+                self._bytes = self._size()
+            return replayed
+        finally:
+            self._replay_lock.release()
+
+    def status(self) -> dict:
+        files = glob.glob(os.path.join(self.directory, f"{self.name}-*"))
+        return {
+            "directory": self.directory,
+            "pending": self.pending,
+            "files": len(files),
+            "bytes": sum(os.path.getsize(path) for path in files if os.path.exists(path)),
+            "max_bytes": self.max_bytes,
+            "dropped": self.dropped,
+        }
+
+
+visits = Journal("visits")
@@ -0,0 +1,217 @@
+"""
+Offline IP → country resolution for AI Portfolio.
+
+Lookups binary-search a sorted range table that is memory-mapped, not
+loaded: startup costs one mmap call and the OS pages in only the parts of
+the file that lookups touch. Repeat IPs are answered from an LRU cache.
+
+The table is built from a CSV of `start_ip,end_ip,country` rows (e.g. the
+free DB-IP "IP to Country Lite" download; IPv4 and IPv6 both work):
+    python -m geoip build dbip-country-lite.csv data/geoip.bin
+    python -m geoip lookup 8.8.8.8
+
+Replacing GEOIP_DB (build writes a temp file and renames it into place) is
+picked up within GEOIP_RELOAD_SECONDS without a restart. With no file, every
+lookup returns None.
+
+File layout (all integers little-endian, addresses big-endian so that
+byte order is numeric order):
+    header   8s magic, u32 IPv4 count, u32 IPv6 count
+    IPv4     start(4) end(4) country(2)    per range, sorted by start
+    IPv6     start(16) end(16) country(2)  per range, sorted by start
+"""
+
+import os
+import sys
+import csv
+import mmap
+import time
+import struct
+import bisect
+import ipaddress
+import threading
+from functools import lru_cache
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+GEOIP_DB = os.getenv("GEOIP_DB") or os.path.join(ROOT, "data", "geoip.bin")
+GEOIP_CACHE_SIZE = int(os.getenv("GEOIP_CACHE_SIZE", "4096"))
+GEOIP_RELOAD_SECONDS = float(os.getenv("GEOIP_RELOAD_SECONDS", "60"))
+
+MAGIC = b"PFGEO\x00\x00\x01"
+HEADER = struct.Struct("<8sII")
+
+
+class _Section:
+    """Fixed-size range records for one address family, indexable by start key."""
+
+    def __init__(self, buf, offset: int, count: int, key_size: int):
+        self.buf = buf
+        self.offset = offset
+        self.count = count
+        self.key_size = key_size
+        self.record_size = 2 * key_size + 2
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> bytes:
+        start = self.offset + i * self.record_size
+        return self.buf[start:start + self.key_size]
+
+    def find(self, key: bytes) -> str | None:
+        i = bisect.bisect_right(self, key) - 1
+        if i < 0:
+            return None
+        record = self.offset + i * self.record_size + self.key_size
+        if key > self.buf[record:record + self.key_size]:
+            return None      # in a gap between ranges
+        code = self.buf[record + self.key_size:record + self.key_size + 2].decode("ascii")
+        return None if code in ("ZZ", "--") else code
+
+
+class GeoTable:
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = os.fstat(f.fileno())
+        self.path = path
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        magic, n4, n6 = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a geoip table")
+        self.v4 = _Section(self.buf, HEADER.size, n4, 4)
+        self.v6 = _Section(self.buf, HEADER.size + n4 * self.v4.record_size, n6, 16)
+        expected = self.v6.offset + n6 * self.v6.record_size
+        if len(self.buf) != expected:
+            raise ValueError(f"{path} is truncated ({len(self.buf)} of {expected} bytes)")
+
+    def find(self, address) -> str | None:
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        section = self.v4 if address.version == 4 else self.v6
+        return section.find(address.packed)
+
+
+_table: GeoTable | None = None
+_checked_at = float("-inf")     # first lookup loads the table
+_reload_lock = threading.Lock()
+
+
+def _file_identity(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def reload(force: bool = False) -> bool:
+    """(Re)open GEOIP_DB if it changed; returns True if a new table was loaded."""
+    global _table, _checked_at
+    with _reload_lock:
+        _checked_at = time.monotonic()
+        identity = _file_identity(GEOIP_DB)
+        if identity is None:
+            if _table is not None:
+                print(f"[GeoIP] {GEOIP_DB} disappeared — country lookups disabled")
+            _table = None
+            _lookup.cache_clear()
+            return False
+        if not force and _table is not None and _table.identity == identity:
+            return False
+        try:
+            table = GeoTable(GEOIP_DB)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"[GeoIP] Could not load {GEOIP_DB}: {e}")
+            return False
+        # Lookups still holding the old table finish on it; its mmap closes
+        # once nothing references it
+        _table = table
+        _lookup.cache_clear()
+        print(f"[GeoIP] Loaded {GEOIP_DB}: {table.v4.count} IPv4 + {table.v6.count} IPv6 ranges")
+        return True
+
+
+@lru_cache(maxsize=GEOIP_CACHE_SIZE)
+def _lookup(ip: str) -> str | None:
+    table = _table
+    if table is None:
+        return None
+    try:
+        return table.find(ipaddress.ip_address(ip))
+    except ValueError:
+        return None
+
+
+def country(ip: str | None) -> str | None:
+    """ISO country code for `ip`, or None (unknown, private, or no table)."""
+    if time.monotonic() - _checked_at >= GEOIP_RELOAD_SECONDS:
+        reload()
+    if not ip:
+        return None
+    return _lookup(ip)
+
+
+def status() -> dict:
+    table = _table
+    info = _lookup.cache_info()
+    return {
+        "path": GEOIP_DB,
+        "loaded": table is not None,
+        "ipv4_ranges": table.v4.count if table else 0,
+        "ipv6_ranges": table.v6.count if table else 0,
+        "cache": {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max": info.maxsize},
+    }
+
+
+# ─── Build ───
+
+def _parse_address(value: str):
+    value = value.strip()
+    if value.isdigit():
+        return ipaddress.IPv4Address(int(value))
+    return ipaddress.ip_address(value)
+
+
+def build(csv_path: str, out_path: str) -> tuple[int, int]:
+    """Convert a start,end,country CSV into a table file (atomically replaces out_path)."""
+    v4, v6 = [], []
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if len(row) < 3 or row[0].startswith("#"):
+                continue
+            try:
+                start, end = _parse_address(row[0]), _parse_address(row[1])
+            except ValueError:
+                continue        # header line
+            code = row[2].strip().upper()[:2]
+            if len(code) != 2 or start.version != end.version:
+                continue
+            (v4 if start.version == 4 else v6).append((start.packed, end.packed, code.encode("ascii")))
+
+    v4.sort()
+    v6.sort()
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, len(v4), len(v6)))
+        for start, end, code in v4 + v6:
+            out.write(start + end + code)
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, out_path)
+    return len(v4), len(v6)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "build":
+        n4, n6 = build(sys.argv[2], sys.argv[3])
+        print(f"✅ Wrote {sys.argv[3]}: {n4} IPv4 + {n6} IPv6 ranges")
+    elif len(sys.argv) >= 3 and sys.argv[1] == "lookup":
+        for ip in sys.argv[2:]:
+            print(f"{ip}\t{country(ip) or '—'}")
+    else:
+        print("Usage: python -m geoip build <ranges.csv> <out.bin>")
+        print("       python -m geoip lookup <ip> [<ip> ...]")
+        sys.exit(1)
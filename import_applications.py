@@ -0,0 +1,52 @@
+"""
+Bulk application import for AI Portfolio.
+Loads past applications from a CSV (header row) or JSONL file using the
+same validation as the admin form, and prints every generated ref link.
+
+Usage:
+    python import_applications.py applications.csv
+    python import_applications.py applications.jsonl --partial
+"""
+
+import argparse
+import sys
+import psycopg
+from routers.tracking import import_applications, parse_import_rows
+from resilience import ServiceUnavailable
+from fastapi import HTTPException
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", help="CSV or JSONL file with one application per row")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    parser.add_argument("--partial", action="store_true", help="import valid rows even if some rows fail")
+    args = parser.parse_args()
+
+    fmt = args.format or ("jsonl" if args.path.lower().endswith((".jsonl", ".ndjson")) else "csv")
+    with open(args.path, encoding="utf-8-sig") as f:
+        content = f.read()
+
+    try:
+        rows = parse_import_rows(content, fmt)
+        result = import_applications(rows, partial=args.partial)
+    except HTTPException as e:
+        print(f"❌ {e.detail}")
+        sys.exit(2)
+    except (psycopg.Error, ServiceUnavailable) as e:
+        print(f"❌ Database error, nothing was imported: {type(e).__name__}: {e}")
+        sys.exit(2)
+
+    for err in result["errors"]:
+        print(f"❌ row {err['row']}: {err['error']}")
+    for item in result["imported"]:
+        print(f"✅ row {item['row']}: {item['company_name']} — {item['position']} → {item['ref_link']}")
+
+    print(f"\nImported {len(result['imported'])} of {len(rows)} rows, {len(result['errors'])} errors")
+    if result["errors"] and not result["imported"]:
+        print("Nothing was written. Fix the rows above or re-run with --partial.")
+    sys.exit(1 if result["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
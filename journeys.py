@@ -0,0 +1,177 @@
+"""
+Per-visit page journeys, stored in visits.pages_visited.
+
+The landing page of a ?ref= visit hands its visit_token to the browser,
+which keeps it in sessionStorage and beacons each page it then shows
+(POST /track-page). Those events are buffered here and appended to their
+visits in one UPDATE per flush (every PAGE_FLUSH_SECONDS, or sooner once
+PAGE_BUFFER_MAX paths are waiting), so a page view costs no database
+round trip of its own.
+
+pages_visited keeps its existing format: paths in order, joined by ", ",
+at most MAX_PAGES_PER_VISIT of them.
+Paths that cannot be written (database down, or the visit itself still in
+the spool) go to the visit spool and are appended on replay. On serverless
+hosts the flusher only runs while an instance is awake; the buffer is
+flushed once more at shutdown.
+"""
+
+import os
+import re
+import threading
+from database import changes
+from database.spool import visits as visit_spool
+from database.retry import run_transaction
+from resilience import CircuitOpenError
+import memstats
+
+PAGE_FLUSH_SECONDS = float(os.getenv("PAGE_FLUSH_SECONDS", "5"))
+PAGE_BUFFER_MAX = int(os.getenv("PAGE_BUFFER_MAX", "500"))
+
+# A journey longer than this stops growing (enforced by APPEND_SQL)
+MAX_PAGES_PER_VISIT = 50
+SEPARATOR = ", "
+
+PATH_RE = re.compile(r"^/[A-Za-z0-9_\-/]{0,99}$")
+# secrets.token_urlsafe(16), with some slack
+VISIT_TOKEN_RE = re.compile(r"^[A-Za-z0-9_\-]{8,64}$")
+
+# visit_token → paths not yet written, in order
+_buffer: dict[str, list[str]] = {}
+memstats.register("journeys.buffer", _buffer)
+_buffered = 0
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_stop = threading.Event()
+_wake = threading.Event()       # buffer full: flush now instead of at the next tick
+_thread: threading.Thread | None = None
+
+# Appends, then keeps the first MAX_PAGES_PER_VISIT paths (WITH ORDINALITY
+# rather than an array slice, which CockroachDB lacks)
+APPEND_SQL = """
+    UPDATE visits v
+    SET pages_visited = array_to_string(ARRAY(
+        SELECT p.page
+        FROM unnest(string_to_array(
+            CASE
+                WHEN v.pages_visited IS NULL OR v.pages_visited = '' THEN d.pages
+                ELSE v.pages_visited || %(sep)s || d.pages
+            END, %(sep)s
+        )) WITH ORDINALITY AS p(page, n)
+        WHERE p.n <= %(max_pages)s
+        ORDER BY p.n
+    ), %(sep)s)
+    FROM (
+        SELECT unnest(%(tokens)s::text[]) AS token, unnest(%(pages)s::text[]) AS pages
+    ) d
+    WHERE v.visit_token = d.token
+    RETURNING v.visit_token
+"""
+
+
+def valid_path(path: str) -> bool:
+    return bool(PATH_RE.match(path))
+
+
+def valid_token(visit_token: str) -> bool:
+    """Shape check for beaconed visit tokens, before they reach the database or the spool."""
+    return bool(VISIT_TOKEN_RE.match(visit_token))
+
+
+def record(visit_token: str, path: str) -> None:
+    """Buffer one page view (called per /track-page beacon)."""
+    global _buffered
+    # Unwritten journeys are spooled, so junk tokens must not get this far
+    if not valid_token(visit_token):
+        return
+    with _lock:
+        pages = _buffer.setdefault(visit_token, [])
+        if len(pages) >= MAX_PAGES_PER_VISIT:
+            return
+        pages.append(path)
+        _buffered += 1
+        full = _buffered >= PAGE_BUFFER_MAX
+    if full:
+        if _thread and _thread.is_alive():
+            _wake.set()
+        elif not _flush_lock.locked():
+            # No flusher (e.g. not started yet): one flush at a time
+            threading.Thread(target=flush, name="journey-flush", daemon=True).start()
+
+
+def append_pages(cur, journeys: dict[str, list[str]]) -> set[str]:
+    """Append each token's paths to its visit; returns the tokens that matched a row."""
+    tokens = list(journeys)
+    cur.execute(APPEND_SQL, {
+        "sep": SEPARATOR,
+        "max_pages": MAX_PAGES_PER_VISIT,
+        "tokens": tokens,
+        "pages": [SEPARATOR.join(journeys[token]) for token in tokens],
+    })
+    matched = {row["visit_token"] for row in cur.fetchall()}
+    changes.publish(cur, "visits", column="pages_visited")
+    return matched
+
+
+def flush() -> int:
+    """Write everything buffered in one statement; returns paths written."""
+    global _buffered
+    if not _flush_lock.acquire(blocking=False):
+        return 0
+    try:
+        with _lock:
+            if not _buffer:
+                return 0
+            journeys = dict(_buffer)
+            _buffer.clear()
+            _buffered = 0
+
+        def flush_journeys(cur):
+            return append_pages(cur, journeys)
+
+        failed = False
+        matched = set()
+        try:
+            matched = run_transaction(flush_journeys)
+        except CircuitOpenError:
+            failed = True
+        except Exception as e:
+            print(f"[Journeys] Flush failed: {type(e).__name__}: {e} — spooling {len(journeys)} journeys")
+            failed = True
+
+        # Not written: the database is unavailable, or the visit itself is
+        # still in the spool. Either way the pages queue up behind it there.
+        for token, pages in journeys.items():
+            if token not in matched and (failed or visit_spool.pending):
+                try:
+                    visit_spool.append({"kind": "pages", "visit_token": token, "pages": pages})
+                except OSError as e:
+                    print(f"[Journeys] Could not spool pages: {e}")
+        return sum(len(journeys[token]) for token in matched)
+    finally:
+        _flush_lock.release()
+
+
+def _flush_forever() -> None:
+    while not _stop.is_set():
+        _wake.wait(PAGE_FLUSH_SECONDS)
+        _wake.clear()
+        flush()
+    flush()
+
+
+def start_flusher() -> None:
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_flush_forever, name="journey-flush", daemon=True)
+    _thread.start()
+
+
+def stop_flusher() -> None:
+    """Stop the flusher after one last flush (called at shutdown)."""
+    _stop.set()
+    _wake.set()
+    if _thread:
+        _thread.join(timeout=10)
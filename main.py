@@ -3,50 +3,102 @@ AI-Powered Portfolio — FastAPI Application
 v1.0: Portfolio + Ref Code Tracking + SQL Analytics
 """
 
-import os
-from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from dotenv import load_dotenv
-from routers.tracking import router as tracking_router, log_visit
-from routers.intelligence import router as intelligence_router
+import hmac
+import math
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import Response, JSONResponse
+from starlette.concurrency import run_in_threadpool
+from config import CALENDLY_LINK, LAZY_ADMIN_ROUTERS, SESSION_TOKEN, METRICS_TOKEN
+from routers.tracking import router as tracking_router, log_visit, replay_spool_in_background
+from page_cache import PageCache
+from templating import templates
+from assets import AssetStaticFiles, asset_url
+from compression import CompressionMiddleware
+from coldstart import DeferredRouters, include_deferred_routers
+from timing import TimingMiddleware
+from database import changes
+import journeys
+from resilience import ServiceUnavailable
+import metrics
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Cross-worker cache invalidation (no-op unless CACHE_NOTIFY is on)
+    changes.start_listener()
+    # Visits spooled during a database outage (possibly by a previous process)
+    replay_spool_in_background()
+    journeys.start_flusher()
+    yield
+    journeys.stop_flusher()
+    changes.stop_listener()
 
-load_dotenv()
 
 app = FastAPI(
     title="AI Portfolio",
     description="AI-Powered Portfolio with ref code tracking",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
-# Include routers
-app.include_router(tracking_router)
-app.include_router(intelligence_router)
+@app.exception_handler(ServiceUnavailable)
+async def service_unavailable(request: Request, exc: ServiceUnavailable):
+    """A backend's circuit is open or a route is at its concurrency limit: fail fast."""
+    return JSONResponse(
+        {"detail": str(exc)},
+        status_code=503,
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
 
-# Static files (CSS, JS, images)
-app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Jinja2 templates
-templates = Jinja2Templates(directory="templates")
-templates.env.globals["GA4_MEASUREMENT_ID"] = os.getenv("GA4_MEASUREMENT_ID", "").strip()
+# Negotiated br/gzip compression for HTML, JSON and text responses
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
 
-# Environment
-CALENDLY_LINK = os.getenv("CALENDLY_LINK", "https://calendly.com")
+# Include routers
+app.include_router(tracking_router)
+
+# Admin-only routers. With LAZY_ADMIN_ROUTERS (default on Vercel) they are
+# imported on the first non-public request, keeping them off the cold start
+# of recruiter-facing pages.
+ADMIN_ROUTERS = ("routers.intelligence", "routers.export", "routers.diagnostics", "routers.live")
+PUBLIC_PATHS = {"/", "/about", "/projects", "/blog", "/contact", "/health", "/metrics", "/track-time", "/track-page"}
+if LAZY_ADMIN_ROUTERS:
+    app.add_middleware(DeferredRouters, fastapi_app=app, modules=ADMIN_ROUTERS, public_paths=PUBLIC_PATHS)
+else:
+    include_deferred_routers(app, ADMIN_ROUTERS)
+
+# Per-route latency histograms for /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Stage timings: Server-Timing header for admins, sampled log lines for everyone.
+# Added last so it is the outermost middleware and sees the full request.
+app.add_middleware(TimingMiddleware)
+
+# Static files (CSS, JS, images) — content-hashed URLs are cached immutably
+app.mount("/static", AssetStaticFiles(directory="static"), name="static")
+templates.env.globals["asset_url"] = asset_url
+
+# Public pages are rendered once; only visit_token changes per request
+page_cache = PageCache(templates)
+page_cache.register("home", "home.html", {"active_page": "home"})
+page_cache.register("about", "about.html", {"active_page": "about"})
+page_cache.register("projects", "projects_final.html", {"active_page": "projects"})
+page_cache.register("blog", "blog.html", {"active_page": "blog"})
+page_cache.register("contact", "contact.html", {"active_page": "contact", "calendly_link": CALENDLY_LINK})
+page_cache.render_all()
 
 
 # ─── Public Pages ───
+# Cached pages are served from the event loop; ?ref= visits are logged in the
+# threadpool, since log_visit blocks on the database, SMTP and GA4.
 
 @app.get("/")
 async def home(request: Request, ref: str = None):
     """Home page — also handles ref code visit logging."""
     visit_token = None
     if ref:
-        visit_token = log_visit(ref, request)
-    return templates.TemplateResponse("home.html", {
-        "request": request,
-        "active_page": "home",
-        "visit_token": visit_token
-    })
+        visit_token = await run_in_threadpool(log_visit, ref, request)
+    return page_cache.response(request, "home", visit_token)
 
 
 @app.get("/about")
@@ -54,12 +106,8 @@ async def about(request: Request, ref: str = None):
     """About page."""
     visit_token = None
     if ref:
-        visit_token = log_visit(ref, request)
-    return templates.TemplateResponse("about.html", {
-        "request": request,
-        "active_page": "about",
-        "visit_token": visit_token
-    })
+        visit_token = await run_in_threadpool(log_visit, ref, request)
+    return page_cache.response(request, "about", visit_token)
 
 
 @app.get("/projects")
@@ -67,12 +115,8 @@ async def projects(request: Request, ref: str = None):
     """Projects page."""
     visit_token = None
     if ref:
-        visit_token = log_visit(ref, request)
-    return templates.TemplateResponse("projects_final.html", {
-        "request": request,
-        "active_page": "projects",
-        "visit_token": visit_token
-    })
+        visit_token = await run_in_threadpool(log_visit, ref, request)
+    return page_cache.response(request, "projects", visit_token)
 
 
 @app.get("/blog")
@@ -80,12 +124,8 @@ async def blog(request: Request, ref: str = None):
     """Blog page — case studies and build logs."""
     visit_token = None
     if ref:
-        visit_token = log_visit(ref, request)
-    return templates.TemplateResponse("blog.html", {
-        "request": request,
-        "active_page": "blog",
-        "visit_token": visit_token
-    })
+        visit_token = await run_in_threadpool(log_visit, ref, request)
+    return page_cache.response(request, "blog", visit_token)
 
 
 @app.get("/contact")
@@ -93,16 +133,26 @@ async def contact(request: Request, ref: str = None):
     """Contact page with Calendly link."""
     visit_token = None
     if ref:
-        visit_token = log_visit(ref, request)
-    return templates.TemplateResponse("contact.html", {
-        "request": request,
-        "active_page": "contact",
-        "calendly_link": CALENDLY_LINK,
-        "visit_token": visit_token
-    })
+        visit_token = await run_in_threadpool(log_visit, ref, request)
+    return page_cache.response(request, "contact", visit_token)
 
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint for deployment verification."""
     return {"status": "healthy", "version": "1.0.0"}
+
+
+@app.get("/metrics")
+async def metrics_endpoint(request: Request):
+    """
+    Prometheus metrics. Accepts the admin auth cookie (browser) or
+    `Authorization: Bearer <METRICS_TOKEN>` (scraper).
+    """
+    auth = request.cookies.get("auth", "")
+    bearer = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    cookie_ok = hmac.compare_digest(auth, SESSION_TOKEN)
+    bearer_ok = bool(METRICS_TOKEN) and hmac.compare_digest(bearer, METRICS_TOKEN)
+    if not (cookie_ok or bearer_ok):
+        raise HTTPException(status_code=403, detail="Access denied")
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
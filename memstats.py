@@ -0,0 +1,178 @@
+"""
+In-process memory statistics for AI Portfolio.
+
+Modules register their long-lived structures (rate limiter store, caches,
+manifests) where they define them:
+
+    memstats.register("tracking.rate_limit_store", _rate_limit_store)
+
+/admin/diagnostics then reports entry counts and approximate deep sizes
+for each, plus process RSS. tracemalloc is off by default (it slows every
+allocation); an admin starts it, takes a baseline snapshot, and diffs
+against it later to find the allocation sites behind RSS creep.
+"""
+
+import gc
+import os
+import sys
+import time
+import types
+import tracemalloc
+from collections import deque
+
+# name → (object or zero-arg callable returning it, deep)
+_structures: dict[str, tuple[object, bool]] = {}
+
+# Never followed: shared, not owned by the structure being measured
+_OPAQUE = (type, types.ModuleType, types.FunctionType, types.MethodType)
+
+# Stop walking after this many objects so a large cache never stalls a request
+DEEP_SIZE_LIMIT = 200_000
+
+_baseline: tracemalloc.Snapshot | None = None
+_baseline_taken_at: float | None = None
+
+# Frames from these files are tracemalloc/diagnostics overhead, not the app
+_IGNORED_FILES = (tracemalloc.__file__, __file__, "<frozen importlib._bootstrap>",
+                  "<frozen importlib._bootstrap_external>")
+
+
+def register(name: str, obj, deep: bool = True) -> None:
+    """
+    Track `obj` under `name`. Pass a zero-arg callable for objects that are
+    replaced rather than mutated, and deep=False for structures whose
+    values point into shared state (e.g. compiled templates) to report
+    entry counts only.
+    """
+    _structures[name] = (obj, deep)
+
+
+def deep_sizeof(obj, limit: int = DEEP_SIZE_LIMIT) -> tuple[int, bool]:
+    """Approximate bytes reachable from `obj`. Returns (bytes, truncated)."""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        if len(seen) >= limit:
+            return total, True
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _OPAQUE):
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend(current)
+        elif hasattr(current, "__dict__"):
+            stack.append(vars(current))
+        elif hasattr(current, "__slots__"):
+            stack.extend(getattr(current, s) for s in current.__slots__ if hasattr(current, s))
+    return total, False
+
+
+def structure_sizes() -> list[dict]:
+    rows = []
+    for name, (obj, deep) in sorted(_structures.items()):
+        if callable(obj) and not hasattr(obj, "__len__"):
+            obj = obj()
+        try:
+            entries = len(obj)
+        except TypeError:
+            entries = None
+        try:
+            size, truncated = deep_sizeof(obj) if deep else (sys.getsizeof(obj), False)
+        except RuntimeError:
+            # Mutated by a request thread mid-walk; report what is known
+            size, truncated = sys.getsizeof(obj), True
+        rows.append({"name": name, "entries": entries, "approx_bytes": size, "truncated": truncated})
+    return rows
+
+
+def process_memory() -> dict:
+    info = {"gc_counts": gc.get_count(), "gc_tracked_objects": len(gc.get_objects())}
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        info["rss_bytes"] = pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        info["rss_bytes"] = None
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # KiB on Linux, bytes on macOS
+        info["peak_rss_bytes"] = peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        info["peak_rss_bytes"] = None
+    return info
+
+
+# ─── tracemalloc ───
+
+def tracemalloc_status() -> dict:
+    status = {"tracing": tracemalloc.is_tracing(), "baseline_taken_at": _baseline_taken_at}
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        status.update({
+            "frames": tracemalloc.get_traceback_limit(),
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+        })
+    return status
+
+
+def start_tracing(frames: int = 1) -> None:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(max(1, min(frames, 25)))
+
+
+def stop_tracing() -> None:
+    global _baseline, _baseline_taken_at
+    tracemalloc.stop()
+    _baseline = _baseline_taken_at = None
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not running")
+    return tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, pattern) for pattern in _IGNORED_FILES]
+    )
+
+
+def take_baseline() -> None:
+    """Keep one snapshot to diff against (replaces any previous baseline)."""
+    global _baseline, _baseline_taken_at
+    _baseline = _snapshot()
+    _baseline_taken_at = time.time()
+
+
+def _stat_row(stat) -> dict:
+    frame = stat.traceback[0]
+    row = {
+        "site": f"{frame.filename}:{frame.lineno}",
+        "size_bytes": stat.size,
+        "count": stat.count,
+    }
+    if hasattr(stat, "size_diff"):
+        row["size_diff_bytes"] = stat.size_diff
+        row["count_diff"] = stat.count_diff
+    if len(stat.traceback) > 1:
+        row["traceback"] = [f"{f.filename}:{f.lineno}" for f in stat.traceback]
+    return row
+
+
+def top_allocations(limit: int = 20, group_by: str = "lineno") -> list[dict]:
+    """Largest allocation sites right now."""
+    stats = _snapshot().statistics(group_by)
+    return [_stat_row(stat) for stat in stats[:limit]]
+
+
+def diff_allocations(limit: int = 20, group_by: str = "lineno") -> list[dict]:
+    """Allocation sites that grew most since the baseline snapshot."""
+    if _baseline is None:
+        raise RuntimeError("no baseline snapshot — take one first")
+    stats = _snapshot().compare_to(_baseline, group_by)
+    return [_stat_row(stat) for stat in stats[:limit]]
@@ -0,0 +1,218 @@
+"""
+In-process metrics for AI Portfolio, exposed at /metrics in the Prometheus
+text format (0.0.4).
+
+Counters and histograms are plain dicts keyed by label values, guarded by
+one uncontended lock each — recording a sample costs a dict increment.
+Values are per process and reset on restart, like the insights cache.
+
+    from metrics import VISITS
+    VISITS.inc("logged")
+"""
+
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+import memstats
+
+# Seconds; covers a page-cache hit (<1 ms) up to a slow Groq call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: list["_Metric"] = []
+memstats.register("metrics.series", lambda: {m.name: m._values for m in _registry})
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _labels(self, values: tuple) -> str:
+        if not self.labelnames:
+            return ""
+        pairs = ",".join(
+            f'{name}="{_escape(str(value))}"' for name, value in zip(self.labelnames, values)
+        )
+        return "{" + pairs + "}"
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        return [f"{self.name}{self._labels(labels)} {_num(value)}" for labels, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[tuple, list] = {}   # labels → [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, list(entry)) for labels, entry in self._values.items())
+        lines = []
+        for labels, entry in items:
+            base = self._labels(labels)
+            prefix = base[:-1] + "," if base else "{"
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), entry[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _num(bound)
+                lines.append(f'{self.name}_bucket{prefix}le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{base} {_num(entry[-1])}")
+            lines.append(f"{self.name}_count{base} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render() -> str:
+    """Every registered metric in Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ─── Metrics ───
+
+HTTP_REQUEST_DURATION = Histogram(
+    "portfolio_http_request_duration_seconds", "HTTP request latency by route template.",
+    ("method", "route", "status"),
+)
+VISITS = Counter(
+    "portfolio_visits_total", "Tracked ?ref= visits by outcome.", ("result",),
+)
+DB_CONNECTIONS_OPENED = Counter(
+    "portfolio_db_connections_opened_total", "Database connections opened.",
+)
+DB_CONNECTIONS_CLOSED = Counter(
+    "portfolio_db_connections_closed_total", "Database connections closed.",
+)
+DB_READS = Counter(
+    "portfolio_db_reads_total", "Read-only connections by where they went (replica, primary, fallback).", ("target",),
+)
+DB_CONNECT_DURATION = Histogram(
+    "portfolio_db_connect_duration_seconds", "Time to open a database connection.",
+)
+DB_CONNECTION_LIFETIME = Histogram(
+    "portfolio_db_connection_lifetime_seconds", "Time a connection stayed open.",
+)
+GROQ_REQUEST_DURATION = Histogram(
+    "portfolio_groq_request_duration_seconds", "Groq chat completion latency.",
+)
+GROQ_REQUESTS = Counter(
+    "portfolio_groq_requests_total", "Groq insight generations by outcome.", ("result",),
+)
+GROQ_TOKENS = Counter(
+    "portfolio_groq_tokens_total", "Groq tokens used.", ("kind",),
+)
+INSIGHTS_CACHE = Counter(
+    "portfolio_insights_cache_total", "Insights cache lookups and regenerations.", ("result",),
+)
+GA4_EVENTS = Counter(
+    "portfolio_ga4_events_total", "Server-side GA4 events by outcome.", ("result",),
+)
+NOTIFICATION_EMAILS = Counter(
+    "portfolio_notification_emails_total", "First-visit notification emails by outcome.", ("result",),
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "portfolio_circuit_transitions_total", "Circuit breaker state changes.", ("breaker", "state"),
+)
+LOAD_SHED = Counter(
+    "portfolio_load_shed_total", "Requests refused with 503 by a concurrency limit.", ("limit",),
+)
+SPOOLED_VISITS = Counter(
+    "portfolio_spooled_visits_total", "Visits written to / replayed from the local spool.", ("result",),
+)
+DB_RETRIES = Counter(
+    "portfolio_db_retries_total", "Transactions retried after a serialization conflict.", ("transaction", "result"),
+)
+
+
+class MetricsMiddleware:
+    """Records HTTP_REQUEST_DURATION labelled with the matched route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Route templates (/admin/export/{dataset}), never raw paths, keep
+            # label cardinality bounded
+            route = getattr(scope.get("route"), "path", None)
+            if route is None:
+                route = "/static" if scope["path"].startswith("/static/") else "unmatched"
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, scope["method"], route, status)
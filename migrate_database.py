@@ -0,0 +1,304 @@
+"""
+Database migrator for AI Portfolio.
+Copies applications, ref_codes and visits between two Postgres-compatible
+databases (e.g. Neon → CockroachDB), then runs the deep verifier.
+
+Each table is split into id ranges of --chunk-size source rows, and ranges
+are copied on --jobs connection pairs at once. A range streams straight
+from `COPY ... TO STDOUT` on the source into `COPY ... FROM STDIN` on the
+target, one block at a time, so memory stays flat however big the table.
+
+Every finished range is recorded in the checkpoint file. Rerunning the same
+command after an interruption skips those ranges; a range is cleared on the
+target before it is copied, so one that was half done is simply redone.
+Tables are copied in foreign-key order. At the end the id sequences and
+ref_code_seq are moved past the copied values.
+
+Usage:
+    python migrate_database.py --source $NEON_URL --target $COCKROACH_URL
+    python migrate_database.py --source ... --target ... --apply-schema --jobs 8
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import psycopg
+from psycopg import sql
+from verify_migration import deep_verify
+
+# Foreign-key order: ref_codes references applications
+TABLES = ("applications", "ref_codes", "visits")
+SEQUENCES = ("ref_code_seq",)
+
+DEFAULT_CHECKPOINT = ".migration-checkpoint.json"
+
+
+class Checkpoint:
+    """Planned ranges and finished ranges per table, saved after every range."""
+
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.tables: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str, fingerprint: str) -> "Checkpoint | None":
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        if data.get("fingerprint") != fingerprint:
+            raise SystemExit(f"❌ {path} belongs to a different source/target pair; "
+                             "delete it or pass --restart")
+        checkpoint = cls(path, fingerprint)
+        checkpoint.tables = data["tables"]
+        return checkpoint
+
+    def save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "tables": self.tables}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def plan(self, table: str, ranges: list[list], columns: list[str]) -> None:
+        with self._lock:
+            self.tables[table] = {"ranges": ranges, "columns": columns, "done": [], "rows": 0}
+            self.save()
+
+    def finish(self, table: str, index: int, rows: int) -> None:
+        with self._lock:
+            state = self.tables[table]
+            state["done"].append(index)
+            state["rows"] += rows
+            self.save()
+
+
+def _fingerprint(source_url: str, target_url: str) -> str:
+    return hashlib.sha256(f"{source_url}\n{target_url}".encode()).hexdigest()[:16]
+
+
+class _Connections:
+    """One connection per worker thread and side, opened on first use (at most 2 × --jobs)."""
+
+    def __init__(self, urls: dict[str, str]):
+        self.urls = urls
+        self._local = threading.local()
+        self._opened = []
+        self._lock = threading.Lock()
+
+    def get(self, side: str):
+        conns = self._local.__dict__.setdefault("conns", {})
+        if side not in conns:
+            conn = psycopg.connect(self.urls[side])
+            # COPY text renders timestamps in the session time zone
+            conn.execute("SET TIME ZONE 'UTC'")
+            conn.commit()
+            conns[side] = conn
+            with self._lock:
+                self._opened.append(conn)
+        return conns[side]
+
+    def close(self) -> None:
+        for conn in self._opened:
+            conn.close()
+
+
+def _columns(conn, table: str) -> list[str]:
+    rows = conn.execute(
+        """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = %s
+        ORDER BY ordinal_position
+        """,
+        (table,),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def _range_filter(lo, hi):
+    """WHERE clause for ids in (lo, hi]; None leaves that side open."""
+    conditions = []
+    if lo is not None:
+        conditions.append(sql.SQL("id > {}").format(sql.Literal(lo)))
+    if hi is not None:
+        conditions.append(sql.SQL("id <= {}").format(sql.Literal(hi)))
+    if not conditions:
+        return sql.SQL("TRUE")
+    return sql.SQL(" AND ").join(conditions)
+
+
+def _plan_ranges(conn, table: str, chunk_size: int) -> list[list]:
+    """Split the source table into (lo, hi] id ranges of chunk_size rows; the last is open-ended."""
+    rows = conn.execute(
+        sql.SQL("""
+            SELECT id FROM (
+                SELECT id, row_number() OVER (ORDER BY id) AS rn FROM {table}
+            ) numbered
+            WHERE mod(rn, %s) = 0
+            ORDER BY id
+        """).format(table=sql.Identifier(table)),
+        (chunk_size,),
+    ).fetchall()
+    conn.commit()
+    bounds = [row[0] for row in rows]
+    return [list(pair) for pair in zip([None] + bounds, bounds + [None])]
+
+
+def _copy_range(conns: _Connections, table: str, columns: list[str], lo, hi) -> int:
+    """Replace the target's rows in (lo, hi] with the source's; returns rows copied."""
+    src, tgt = conns.get("source"), conns.get("target")
+    where = _range_filter(lo, hi)
+    cols = sql.SQL(", ").join(sql.Identifier(c) for c in columns)
+    rows = 0
+    try:
+        with src.cursor() as src_cur, tgt.cursor() as tgt_cur:
+            tgt_cur.execute(sql.SQL("DELETE FROM {} WHERE {}").format(sql.Identifier(table), where))
+            copy_out = sql.SQL("COPY (SELECT {cols} FROM {table} WHERE {where} ORDER BY id) TO STDOUT").format(
+                cols=cols, table=sql.Identifier(table), where=where)
+            copy_in = sql.SQL("COPY {table} ({cols}) FROM STDIN").format(cols=cols, table=sql.Identifier(table))
+            with src_cur.copy(copy_out) as out, tgt_cur.copy(copy_in) as into:
+                for block in out:
+                    into.write(block)
+                    # Text format: one line per row, embedded newlines are escaped
+                    rows += bytes(block).count(b"\n")
+        tgt.commit()
+        src.commit()
+    except Exception:
+        tgt.rollback()
+        src.rollback()
+        raise
+    return rows
+
+
+def _ensure_empty(url: str, tables) -> None:
+    with psycopg.connect(url) as conn:
+        for table in tables:
+            if conn.execute(sql.SQL("SELECT 1 FROM {} LIMIT 1").format(sql.Identifier(table))).fetchone():
+                raise SystemExit(f"❌ Target table {table} already has rows. Empty it first, "
+                                 "or rerun with the checkpoint of the migration that filled it.")
+
+
+def _migrate_table(conns: _Connections, checkpoint: Checkpoint, table: str, executor: ThreadPoolExecutor) -> None:
+    state = checkpoint.tables[table]
+    todo = [i for i in range(len(state["ranges"])) if i not in set(state["done"])]
+    started = time.perf_counter()
+    print(f"[Migrate] {table}: {len(todo)} of {len(state['ranges'])} ranges to copy")
+
+    futures = {
+        executor.submit(_copy_range, conns, table, state["columns"], *state["ranges"][i]): i
+        for i in todo
+    }
+    for future in as_completed(futures):
+        try:
+            rows = future.result()
+        except Exception:
+            for pending in futures:
+                pending.cancel()
+            raise
+        checkpoint.finish(table, futures[future], rows)
+        done = len(state["done"])
+        if done % 10 == 0 or done == len(state["ranges"]):
+            print(f"[Migrate] {table}: {done}/{len(state['ranges'])} ranges, {state['rows']} rows")
+
+    print(f"[Migrate] {table}: ✅ {state['rows']} rows in {time.perf_counter() - started:.1f}s")
+
+
+def _reset_sequences(source_url: str, target_url: str) -> None:
+    """Move id sequences past the copied ids and carry ref_code_seq over (creating it if needed)."""
+    with psycopg.connect(source_url) as src, psycopg.connect(target_url) as tgt:
+        for table in TABLES:
+            seq = tgt.execute("SELECT pg_get_serial_sequence(%s, 'id')", (table,)).fetchone()[0]
+            if seq is None:
+                continue        # e.g. CockroachDB's default unique_rowid() ids
+            max_id = tgt.execute(sql.SQL("SELECT max(id) FROM {}").format(sql.Identifier(table))).fetchone()[0]
+            if max_id is not None:
+                tgt.execute("SELECT setval(%s, %s)", (seq, max_id))
+                print(f"[Migrate] {seq} → {max_id}")
+        for seq in SEQUENCES:
+            tgt.execute(sql.SQL("CREATE SEQUENCE IF NOT EXISTS {}").format(sql.Identifier(seq)))
+            if src.execute("SELECT to_regclass(%s)", (seq,)).fetchone()[0] is None:
+                # Source predates the sequence: its codes were random, so start fresh
+                print(f"[Migrate] {seq} missing on the source — left at its start value")
+                continue
+            last_value, is_called = src.execute(
+                sql.SQL("SELECT last_value, is_called FROM {}").format(sql.Identifier(seq))
+            ).fetchone()
+            # Ref codes are derived from this sequence; reusing a value would reissue a code
+            tgt.execute("SELECT setval(%s, %s, %s)", (seq, last_value, is_called))
+            print(f"[Migrate] {seq} → {last_value}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", required=True, help="SOURCE_DATABASE_URL")
+    parser.add_argument("--target", required=True, help="TARGET_DATABASE_URL")
+    parser.add_argument("--jobs", type=int, default=4, help="Ranges copied at once")
+    parser.add_argument("--chunk-size", type=int, default=20000, help="Rows per range")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Progress file used to resume")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--apply-schema", action="store_true", help="Apply database/schema.sql to the target first")
+    parser.add_argument("--no-verify", action="store_true", help="Skip the deep verification at the end")
+    args = parser.parse_args()
+
+    fingerprint = _fingerprint(args.source, args.target)
+    checkpoint = None if args.restart else Checkpoint.load(args.checkpoint, fingerprint)
+    conns = _Connections({"source": args.source, "target": args.target})
+    started = time.perf_counter()
+
+    try:
+        if checkpoint is None:
+            if args.apply_schema:
+                from database.schema import apply_schema
+                apply_schema(args.target)
+            _ensure_empty(args.target, TABLES)
+            checkpoint = Checkpoint(args.checkpoint, fingerprint)
+        else:
+            print(f"[Migrate] Resuming from {args.checkpoint}")
+
+        with psycopg.connect(args.source) as src, psycopg.connect(args.target) as tgt:
+            for table in TABLES:
+                if table in checkpoint.tables:
+                    continue
+                target_columns = set(_columns(tgt, table))
+                columns = [c for c in _columns(src, table) if c in target_columns]
+                checkpoint.plan(table, _plan_ranges(src, table, args.chunk_size), columns)
+
+        # One pool for all tables: its threads keep their connection pair
+        with ThreadPoolExecutor(max_workers=args.jobs, thread_name_prefix="migrate") as executor:
+            for table in TABLES:
+                _migrate_table(conns, checkpoint, table, executor)
+        _reset_sequences(args.source, args.target)
+    except psycopg.Error as e:
+        print(f"❌ Migration stopped: {e}")
+        print(f"   Progress is saved in {args.checkpoint}; rerun the same command to resume.")
+        sys.exit(2)
+    finally:
+        conns.close()
+
+    print(f"✅ Copied {sum(checkpoint.tables[t]['rows'] for t in TABLES)} rows "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    if args.no_verify:
+        sys.exit(0)
+
+    failures = deep_verify(args.source, args.target, list(TABLES), jobs=args.jobs)
+    if failures:
+        print("❌ Migration verification failed:")
+        for f in failures:
+            print(f"- {f}")
+        sys.exit(1)
+    print("✅ Migration verification passed")
+    os.remove(args.checkpoint)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Pre-rendered public pages.
+
+Public pages only vary by `visit_token`, so each one is rendered once with
+a placeholder where the token goes. Requests without a token get the cached
+bytes with a strong ETag (and a 304 when it matches); requests that logged
+a visit get the token spliced in — no Jinja work per request either way.
+"""
+
+import os
+import hashlib
+from dataclasses import dataclass
+from fastapi import Request
+from fastapi.responses import Response
+from templating import TEMPLATE_AUTO_RELOAD, TEMPLATES_DIR
+import memstats
+
+VISIT_TOKEN_PLACEHOLDER = "__VISIT_TOKEN__"
+
+
+@dataclass
+class CachedPage:
+    head: bytes             # everything before the visit_token placeholder
+    tail: bytes             # everything after it ("" if the page has none)
+    body: bytes             # token-free page
+    etag: str
+
+
+class PageCache:
+    def __init__(self, templates, directory: str = TEMPLATES_DIR):
+        self.templates = templates
+        self.directory = directory
+        self._pages: dict[str, tuple[str, dict]] = {}
+        self._cache: dict[str, CachedPage] = {}
+        self._mtime = 0.0
+        memstats.register("page_cache.pages", lambda: self._cache)
+
+    def register(self, name: str, template: str, context: dict):
+        """Register a page; `context` must hold every variable except visit_token."""
+        self._pages[name] = (template, context)
+        self._cache.pop(name, None)
+
+    def _templates_mtime(self) -> float:
+        return max((e.stat().st_mtime for e in os.scandir(self.directory) if e.is_file()), default=0.0)
+
+    def _render(self, name: str) -> CachedPage:
+        template, context = self._pages[name]
+        html = self.templates.get_template(template).render(
+            **context, visit_token=VISIT_TOKEN_PLACEHOLDER
+        ).encode("utf-8")
+        head, _, tail = html.partition(VISIT_TOKEN_PLACEHOLDER.encode())
+        body = head + tail
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        return CachedPage(head=head, tail=tail, body=body, etag=etag)
+
+    def render_all(self):
+        """Render every registered page up front (called at startup)."""
+        self._mtime = self._templates_mtime()
+        self._cache = {name: self._render(name) for name in self._pages}
+
+    def get(self, name: str) -> CachedPage:
+        if TEMPLATE_AUTO_RELOAD:
+            mtime = self._templates_mtime()
+            if mtime != self._mtime:
+                self._mtime = mtime
+                self._cache.clear()
+        page = self._cache.get(name)
+        if page is None:
+            page = self._cache[name] = self._render(name)
+        return page
+
+    def response(self, request: Request, name: str, visit_token: str | None = None) -> Response:
+        page = self.get(name)
+        if visit_token:
+            # Token pages are unique per visit — never cache them
+            return Response(
+                content=page.head + visit_token.encode() + page.tail,
+                media_type="text/html",
+                headers={"Cache-Control": "no-store"},
+            )
+
+        headers = {"ETag": page.etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            etags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+            if page.etag in etags or "*" in etags:
+                return Response(status_code=304, headers=headers)
+        return Response(content=page.body, media_type="text/html", headers=headers)
@@ -0,0 +1,266 @@
+"""
+Circuit breakers and load shedding for AI Portfolio's backends.
+
+A breaker tracks consecutive failures of one dependency. Exceptions count,
+and so do calls slower than its `slow_call_ms`, since a backend that answers
+in ten seconds is as bad for a page load as one that does not answer.
+- closed: calls go through; `failure_threshold` failures in a row open it
+- open: allow() is False for `reset_seconds`, so callers take their
+  fallback at once instead of waiting on a struggling backend
+- half-open: then a single trial call is let through; success closes the
+  breaker, failure opens it for another `reset_seconds`
+
+Breakers given a timeout range also derive an adaptive timeout from the
+latency of recent successful calls (smoothed mean + 4 deviations, as TCP
+does for retransmits), so a normally fast backend is given up on quickly.
+
+ConcurrencyLimit caps in-flight requests on an expensive route; excess
+requests get a 503 at once instead of queueing for a threadpool slot.
+Both CircuitOpenError and Overloaded are ServiceUnavailable, which main.py
+turns into `503` with a Retry-After header.
+
+Usage:
+    with DATABASE.guard():
+        ...                      # raises CircuitOpenError while open
+    with DASHBOARD_LIMIT.slot():
+        ...                      # raises Overloaded when full
+"""
+
+import os
+import time
+import math
+import threading
+from contextlib import contextmanager
+from metrics import CIRCUIT_TRANSITIONS, LOAD_SHED
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+_breakers: dict[str, "CircuitBreaker"] = {}
+_limits: dict[str, "ConcurrencyLimit"] = {}
+
+
+class ServiceUnavailable(Exception):
+    """A request refused to protect a backend; answered with 503 + Retry-After."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(ServiceUnavailable):
+    """Raised by CircuitBreaker.guard() when the breaker refuses the call."""
+
+    def __init__(self, name: str, retry_after: float = 1.0):
+        super().__init__(f"circuit '{name}' is open", retry_after)
+        self.name = name
+
+
+class Overloaded(ServiceUnavailable):
+    """Raised by ConcurrencyLimit.slot() when the limit is reached."""
+
+    def __init__(self, name: str):
+        super().__init__(f"too many concurrent '{name}' requests", 1.0)
+        self.name = name
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5,
+                 reset_seconds: float = 30.0, slow_call_ms: float | None = None,
+                 min_timeout: float | None = None, max_timeout: float | None = None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.slow_call_ms = slow_call_ms
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self._srtt_ms: float | None = None
+        self._rttvar_ms = 0.0
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error: str | None = None
+        self._trial_started_at: float | None = None
+        self._lock = threading.Lock()
+        _breakers[name] = self
+
+    def _transition(self, state: str) -> None:
+        print(f"[Circuit] {self.name}: {self.state} → {state}"
+              + (f" ({self.last_error})" if state == OPEN and self.last_error else ""))
+        self.state = state
+        CIRCUIT_TRANSITIONS.inc(self.name, state)
+
+    def allow(self) -> bool:
+        """True if a call may go ahead now. Cheap; call it on every request."""
+        if self.state == CLOSED:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self.opened_at >= self.reset_seconds:
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                # One trial at a time; a trial whose caller never reported
+                # back is given up on after reset_seconds
+                trial = self._trial_started_at
+                if trial is None or now - trial >= self.reset_seconds:
+                    self._trial_started_at = now
+                    return True
+            return self.state == CLOSED
+
+    def _observe(self, elapsed_ms: float) -> None:
+        if self._srtt_ms is None:
+            self._srtt_ms, self._rttvar_ms = elapsed_ms, elapsed_ms / 2
+        else:
+            self._rttvar_ms = 0.75 * self._rttvar_ms + 0.25 * abs(self._srtt_ms - elapsed_ms)
+            self._srtt_ms = 0.875 * self._srtt_ms + 0.125 * elapsed_ms
+
+    @property
+    def timeout(self) -> float | None:
+        """Seconds to wait for the next call: recent latency, clamped to [min, max]."""
+        if self.max_timeout is None:
+            return None
+        if self._srtt_ms is None:
+            return self.max_timeout
+        adaptive = (self._srtt_ms + 4 * self._rttvar_ms) / 1000
+        return min(self.max_timeout, max(self.min_timeout or 0.0, adaptive))
+
+    @property
+    def degraded(self) -> bool:
+        """Open, probing, failing, or running at over half the slow-call threshold."""
+        if self.state != CLOSED or self.failures:
+            return True
+        return (self.slow_call_ms is not None and self._srtt_ms is not None
+                and self._srtt_ms > self.slow_call_ms / 2)
+
+    @property
+    def retry_after(self) -> float:
+        if self.state == CLOSED:
+            return 1.0
+        return max(1.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def record_success(self, elapsed_ms: float | None = None) -> None:
+        if elapsed_ms is not None:
+            self._observe(elapsed_ms)
+        if self.slow_call_ms is not None and elapsed_ms is not None and elapsed_ms > self.slow_call_ms:
+            self.record_failure(f"slow call: {elapsed_ms:.0f} ms")
+            return
+        if self.state == CLOSED and self.failures == 0:
+            return
+        with self._lock:
+            self.failures = 0
+            self._trial_started_at = None
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self, error=None) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_started_at = None
+            if error is not None:
+                self.last_error = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    @contextmanager
+    def guard(self):
+        """Run the block as one call: raises CircuitOpenError if not allowed, records the outcome."""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after)
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success((time.perf_counter() - start) * 1000)
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "failures": self.failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_seconds": self.reset_seconds,
+            "slow_call_ms": self.slow_call_ms,
+            "latency_ms": round(self._srtt_ms, 1) if self._srtt_ms is not None else None,
+            "timeout_seconds": round(self.timeout, 2) if self.timeout is not None else None,
+            "degraded": self.degraded,
+            "open_for_seconds": round(time.monotonic() - self.opened_at, 1) if self.state != CLOSED else None,
+            "last_error": self.last_error,
+        }
+
+
+class ConcurrencyLimit:
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.in_flight = 0
+        self.shed = 0
+        self._lock = threading.Lock()
+        _limits[name] = self
+
+    @contextmanager
+    def slot(self):
+        with self._lock:
+            if self.in_flight >= self.limit:
+                self.shed += 1
+                LOAD_SHED.inc(self.name)
+                raise Overloaded(self.name)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def status(self) -> dict:
+        return {"name": self.name, "limit": self.limit, "in_flight": self.in_flight, "shed": self.shed}
+
+
+def status() -> dict:
+    return {
+        "breakers": [breaker.status() for breaker in _breakers.values()],
+        "limits": [limit.status() for limit in _limits.values()],
+    }
+
+
+# ─── Breakers ───
+
+# Guards connecting (database.get_connection), where stalls pile up first
+DATABASE = CircuitBreaker(
+    "database",
+    failure_threshold=int(os.getenv("DB_BREAKER_FAILURES", "5")),
+    reset_seconds=float(os.getenv("DB_BREAKER_RESET_SECONDS", "30")),
+    slow_call_ms=float(os.getenv("DB_SLOW_CALL_MS", "1500")),
+    min_timeout=2.0,        # libpq's connect_timeout floor
+    max_timeout=float(os.getenv("DB_CONNECT_TIMEOUT", "10")),
+)
+GROQ = CircuitBreaker(
+    "groq",
+    failure_threshold=int(os.getenv("GROQ_BREAKER_FAILURES", "3")),
+    reset_seconds=float(os.getenv("GROQ_BREAKER_RESET_SECONDS", "120")),
+    min_timeout=2.0,
+    max_timeout=float(os.getenv("GROQ_TIMEOUT", "5")),
+)
+# Read replica (DATABASE_READ_URL); while open, reads go to the primary
+DATABASE_READ = CircuitBreaker(
+    "database_read",
+    failure_threshold=3,
+    reset_seconds=float(os.getenv("DB_BREAKER_RESET_SECONDS", "30")),
+    slow_call_ms=float(os.getenv("DB_SLOW_CALL_MS", "1500")),
+    min_timeout=2.0,
+    max_timeout=float(os.getenv("DB_CONNECT_TIMEOUT", "10")),
+)
+# Server-side analytics event on every ?ref= visit
+GA4 = CircuitBreaker("ga4", failure_threshold=3, reset_seconds=60, min_timeout=0.5, max_timeout=2.0)
+
+
+# ─── Concurrency limits ───
+
+DASHBOARD_LIMIT = ConcurrencyLimit("dashboard", int(os.getenv("DASHBOARD_CONCURRENCY", "4")))
+INSIGHTS_LIMIT = ConcurrencyLimit("insights", int(os.getenv("INSIGHTS_CONCURRENCY", "1")))
+
+
+def connect_timeout(breaker: CircuitBreaker = DATABASE) -> int:
+    """A database breaker's adaptive timeout as a whole-second libpq connect_timeout."""
+    return max(2, math.ceil(breaker.timeout))
@@ -0,0 +1,123 @@
+"""
+Diagnostics Router — admin-only views into the running process.
+
+/admin/queries shows the query profiler's top-N statements (see
+database/profiler.py); add `?format=json` for the raw numbers.
+
+/admin/diagnostics reports process memory and the sizes of registered
+in-process structures (see memstats.py), circuit breaker states and the
+visit spool backlog. tracemalloc stays off until an
+admin starts it:
+    POST /admin/diagnostics/tracemalloc/start?frames=1
+    POST /admin/diagnostics/tracemalloc/baseline
+    GET  /admin/diagnostics/allocations?diff=true
+    POST /admin/diagnostics/tracemalloc/stop
+"""
+
+import hmac
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from config import SESSION_TOKEN
+from database import profiler, changes, replica_status
+from database.spool import visits as visit_spool
+import memstats
+import resilience
+import geoip
+from templating import templates
+
+router = APIRouter()
+
+
+@router.get("/admin/queries", response_class=HTMLResponse)
+async def query_profile(request: Request, order_by: str = "total_ms", limit: int = 20, format: str = "html"):
+    """Top-N profiled queries by total time (or mean_ms / max_ms / calls / slow)."""
+    auth = request.cookies.get("auth", "")
+    if not hmac.compare_digest(auth, SESSION_TOKEN):
+        return templates.TemplateResponse("admin_login.html", {
+            "request": request,
+            "redirect_to": "/admin/queries"
+        })
+
+    queries = profiler.top(max(1, min(limit, 200)), order_by)
+    if format == "json":
+        return JSONResponse({
+            "enabled": profiler.QUERY_PROFILING,
+            "slow_query_ms": profiler.SLOW_QUERY_MS,
+            "queries": queries,
+        })
+
+    return templates.TemplateResponse("query_profile.html", {
+        "request": request,
+        "enabled": profiler.QUERY_PROFILING,
+        "slow_ms": profiler.SLOW_QUERY_MS,
+        "sample_rate": profiler.EXPLAIN_SAMPLE_RATE,
+        "order_by": order_by,
+        "queries": queries,
+    })
+
+
+@router.post("/admin/queries/reset")
+async def reset_query_profile(request: Request):
+    auth = request.cookies.get("auth", "")
+    if not hmac.compare_digest(auth, SESSION_TOKEN):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    profiler.reset()
+    return RedirectResponse(url="/admin/queries", status_code=303)
+
+
+@router.get("/admin/diagnostics")
+async def diagnostics(request: Request):
+    auth = request.cookies.get("auth", "")
+    if not hmac.compare_digest(auth, SESSION_TOKEN):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    return {
+        "process": memstats.process_memory(),
+        "structures": memstats.structure_sizes(),
+        "tracemalloc": memstats.tracemalloc_status(),
+        "cache_notify": changes.status(),
+        "circuits": resilience.status(),
+        "visit_spool": visit_spool.status(),
+        "geoip": geoip.status(),
+        "read_replica": replica_status(),
+    }
+
+
+@router.post("/admin/diagnostics/tracemalloc/{action}")
+async def control_tracemalloc(request: Request, action: str, frames: int = 1):
+    """start (with traceback depth `frames`), baseline (snapshot to diff against) or stop."""
+    auth = request.cookies.get("auth", "")
+    if not hmac.compare_digest(auth, SESSION_TOKEN):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    if action == "start":
+        memstats.start_tracing(frames)
+    elif action == "stop":
+        memstats.stop_tracing()
+    elif action == "baseline":
+        try:
+            memstats.take_baseline()
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+    else:
+        raise HTTPException(status_code=404, detail="Unknown action")
+    return memstats.tracemalloc_status()
+
+
+@router.get("/admin/diagnostics/allocations")
+async def allocations(request: Request, limit: int = 20, group_by: str = "lineno", diff: bool = False):
+    """Top allocation sites now, or (diff=true) the biggest growth since the baseline."""
+    auth = request.cookies.get("auth", "")
+    if not hmac.compare_digest(auth, SESSION_TOKEN):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(status_code=400, detail="group_by must be lineno, filename or traceback")
+    limit = max(1, min(limit, 100))
+    try:
+        if diff:
+            return {"diff": memstats.diff_allocations(limit, group_by)}
+        return {"top": memstats.top_allocations(limit, group_by)}
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
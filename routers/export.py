@@ -0,0 +1,194 @@
+"""
+Export Router — streaming CSV / NDJSON exports of applications and visits.
+
+Rows are read from a server-side cursor and written to the response one
+batch at a time, so memory use stays constant regardless of export size.
+Exports read from the replica when DATABASE_READ_URL is set.
+"""
+
+import io
+import csv
+import json
+import hmac
+import zlib
+from datetime import datetime
+from typing import Iterator
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import StreamingResponse
+from database import get_read_connection, get_server_cursor, STREAM_BATCH_SIZE
+from routers.tracking import SESSION_TOKEN, VALID_OUTCOMES, reads_primary, _is_iso_date
+
+router = APIRouter()
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# dataset → (columns, FROM clause, date column used for date_from/date_to)
+# Outcome filtering always applies to the joined application row.
+EXPORTS = {
+    "applications": (
+        [
+            "id", "company_name", "person_name", "position", "date_applied",
+            "outcome", "outcome_date", "ref_code", "notes", "outreach_channel",
+            "contact_person", "role_category", "followed_up", "follow_up_date",
+            "follow_up_response", "rejection_reason", "created_at",
+        ],
+        "applications a",
+        "a.date_applied",
+    ),
+    "visits": (
+        [
+            "v.id", "v.ref_code", "v.timestamp", "v.visit_count", "v.pages_visited",
+            "v.country", "v.is_return_visit", "v.visit_source", "v.time_on_site",
+            "v.utm_source", "v.utm_medium",
+        ],
+        "visits v LEFT JOIN applications a ON a.ref_code = v.ref_code",
+        "v.timestamp",
+    ),
+    "application-visits": (
+        [
+            "a.id AS application_id", "a.company_name", "a.position", "a.date_applied",
+            "a.outcome", "a.outreach_channel", "a.role_category",
+            "v.id AS visit_id", "v.timestamp", "v.is_return_visit", "v.visit_source",
+            "v.time_on_site", "v.utm_source", "v.utm_medium",
+        ],
+        "applications a LEFT JOIN visits v ON v.ref_code = a.ref_code",
+        "a.date_applied",
+    ),
+}
+
+
+def _column_name(col: str) -> str:
+    """'a.id AS application_id' → 'application_id', 'v.timestamp' → 'timestamp'."""
+    return col.split(" AS ")[-1].split(".")[-1]
+
+
+def _build_query(dataset: str, date_from: str | None, date_to: str | None,
+                 outcome: str | None) -> tuple[str, list, list[str]]:
+    columns, source, date_col = EXPORTS[dataset]
+    where, params = [], []
+    if date_from:
+        where.append(f"{date_col} >= %s::date")
+        params.append(date_from)
+    if date_to:
+        where.append(f"{date_col} < %s::date + 1")
+        params.append(date_to)
+    if outcome:
+        where.append("a.outcome = %s")
+        params.append(outcome)
+
+    columns_sql = ", ".join(c if "." in c else f"a.{c}" for c in columns)
+    query = f"SELECT {columns_sql} FROM {source}"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += f" ORDER BY {date_col}"
+    return query, params, [_column_name(c) for c in columns]
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _json_default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def _stream_rows(query: str, params: list, names: list[str], fmt: str,
+                 batch_size: int = STREAM_BATCH_SIZE, primary: bool = False) -> Iterator[bytes]:
+    """Yields one encoded chunk per batch of rows read from a server-side cursor."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if fmt == "csv":
+        writer.writerow(names)
+
+    try:
+        with get_read_connection(primary) as conn, get_server_cursor("export", batch_size, conn=conn) as cur:
+            cur.execute(query, params)
+            pending = 0
+            for row in cur:
+                if fmt == "csv":
+                    writer.writerow([_csv_value(v) for v in row])
+                else:
+                    buf.write(json.dumps(dict(zip(names, row)), default=_json_default))
+                    buf.write("\n")
+                pending += 1
+                if pending >= batch_size:
+                    yield buf.getvalue().encode("utf-8")
+                    buf.seek(0)
+                    buf.truncate()
+                    pending = 0
+    except Exception as e:
+        # Headers are already sent. Re-raising makes the server abort the
+        # chunked response, so the download fails instead of ending short.
+        print(f"[Export] Stream aborted: {type(e).__name__}: {e}")
+        raise
+
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def _gzip_stream(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+# ─── Routes ───
+
+@router.get("/admin/export/{dataset}")
+async def export_dataset(
+    request: Request,
+    dataset: str,
+    format: str = "csv",
+    gzip: bool = False,
+    date_from: str | None = None,
+    date_to: str | None = None,
+    outcome: str | None = None,
+):
+    """
+    Streams `applications`, `visits` or `application-visits` as CSV or NDJSON.
+    Filters: date_from / date_to (YYYY-MM-DD, inclusive) on date_applied
+    (visit timestamp for the visits export) and application outcome.
+    Password protected.
+    """
+    auth = request.cookies.get("auth", "")
+    if not hmac.compare_digest(auth, SESSION_TOKEN):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    if dataset not in EXPORTS:
+        raise HTTPException(status_code=404, detail=f"Unknown export. Must be one of: {sorted(EXPORTS)}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Must be one of: {sorted(EXPORT_FORMATS)}")
+    # Checked here: a bad ::date cast would only fail once the 200 is sent
+    for value in (date_from, date_to):
+        if value and not _is_iso_date(value):
+            raise HTTPException(status_code=400, detail="Invalid date format (YYYY-MM-DD)")
+    if outcome and outcome not in VALID_OUTCOMES:
+        raise HTTPException(status_code=400, detail=f"Invalid outcome. Must be one of: {VALID_OUTCOMES}")
+
+    query, params, names = _build_query(dataset, date_from, date_to, outcome)
+    body = _stream_rows(query, params, names, format, primary=reads_primary(request))
+
+    filename = f"{dataset}-{datetime.now().strftime('%Y%m%d')}.{format}"
+    media_type = EXPORT_FORMATS[format]
+    if gzip:
+        body = _gzip_stream(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
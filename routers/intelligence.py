@@ -3,40 +3,30 @@ Portfolio Intelligence Router — v1.1
 Generates AI-powered insights from application and visit data using Groq.
 
 How it works:
-1. collect_portfolio_data() pulls all data from the 3 tables
+1. collect_portfolio_data() streams all data from the 3 tables
 2. generate_insights(data) sends that data to Groq and gets back structured insights
 3. Results are cached in memory for 1 hour to avoid repeated API calls
 4. Cache is cleared whenever new data arrives (visit, application, outcome change)
+5. While Groq is failing (see resilience.GROQ) the last good insights are
+   served instead, and only one regeneration runs at a time
 """
 
-import os
 import json
 import hmac
-import hashlib
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from typing import Iterator, NamedTuple
+from psycopg.rows import args_row
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from database import get_cursor
-from dotenv import load_dotenv
-
-load_dotenv()
+from templating import templates
+from database import get_read_connection, get_server_cursor, STREAM_BATCH_SIZE, changes
+from config import SESSION_TOKEN, GROQ_API_KEY
+from timing import stage
+from metrics import GROQ_REQUEST_DURATION, GROQ_REQUESTS, GROQ_TOKENS, INSIGHTS_CACHE
+from resilience import GROQ, INSIGHTS_LIMIT, CircuitOpenError
+import memstats
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
-
-# ─── Auth (same pattern as tracking.py) ───
-
-DASHBOARD_PASSWORD = os.getenv("DASHBOARD_PASSWORD", "changeme")
-SESSION_SECRET_KEY = os.getenv("SESSION_SECRET_KEY", "")
-SESSION_TOKEN = hmac.new(
-    key=SESSION_SECRET_KEY.encode(),
-    msg=DASHBOARD_PASSWORD.encode(),
-    digestmod=hashlib.sha256
-).hexdigest()
-
-GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
-
 
 # ─── In-Memory Cache ───
 # Resets on server restart. This is acceptable for a single-server free-tier app.
@@ -44,7 +34,9 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 insight_cache = {
     "insights": [],
     "generated_at": None,
+    "last_good": [],        # survives clears; served while Groq is unavailable
 }
+memstats.register("intelligence.insight_cache", insight_cache)
 
 CACHE_TTL = timedelta(hours=1)
 
@@ -55,9 +47,12 @@ def get_cached_insights():
     Returns None if the cache is empty or expired.
     """
     if insight_cache["generated_at"] is None:
+        INSIGHTS_CACHE.inc("miss")
         return None
     if datetime.now() - insight_cache["generated_at"] > CACHE_TTL:
+        INSIGHTS_CACHE.inc("miss")
         return None
+    INSIGHTS_CACHE.inc("hit")
     return insight_cache["insights"]
 
 
@@ -67,23 +62,147 @@ def set_cached_insights(insights: list):
     """
     insight_cache["insights"] = insights
     insight_cache["generated_at"] = datetime.now()
+    INSIGHTS_CACHE.inc("regenerate")
 
 
 def clear_insights_cache():
     """
-    Resets the cache to empty. Called from tracking.py whenever
-    new data arrives (visit logged, application saved, outcome updated).
+    Resets the cache to empty. Runs whenever new data arrives (visit
+    logged, application saved, outcome updated) — in this worker directly,
+    and in other workers via database.changes when CACHE_NOTIFY is on.
     """
     insight_cache["insights"] = []
     insight_cache["generated_at"] = None
 
 
+def _on_data_change(change):
+    # Time-on-site and page beacons arrive constantly; insights tolerate
+    # that staleness for up to CACHE_TTL rather than regenerating per beacon.
+    if change.column not in ("time_on_site", "pages_visited"):
+        clear_insights_cache()
+
+
+changes.subscribe(_on_data_change)
+
+
 # ─── Data Collection ───
+# Rows are streamed from server-side cursors as compact NamedTuple records,
+# so callers can fold aggregates over millions of visits without ever
+# holding the full table in memory.
+
+class ApplicationRecord(NamedTuple):
+    id: int
+    company_name: str
+    person_name: str | None
+    position: str
+    date_applied: date | None
+    outcome: str | None
+    outcome_date: date | None
+    ref_code: str | None
+    notes: str | None
+    outreach_channel: str | None
+    contact_person: str | None
+    role_category: str | None
+    followed_up: bool | None
+    follow_up_date: date | None
+    follow_up_response: str | None
+    rejection_reason: str | None
+    created_at: datetime | None
+
+
+class VisitRecord(NamedTuple):
+    id: int
+    ref_code: str
+    timestamp: datetime | None
+    visit_count: int | None
+    country: str | None
+    is_return_visit: bool | None
+    visit_source: str | None
+    time_on_site: int | None
+    utm_source: str | None
+    utm_medium: str | None
+
+
+class RefCodeRecord(NamedTuple):
+    id: int
+    ref_code: str
+    application_id: int | None
+    created_date: datetime | None
+    is_active: bool | None
+
+
+# table → (record type, query); column order must match the record fields
+_STREAM_QUERIES = {
+    "applications": (ApplicationRecord, """
+        SELECT id, company_name, person_name, position,
+               date_applied, outcome, outcome_date, ref_code, notes,
+               outreach_channel, contact_person, role_category,
+               followed_up, follow_up_date, follow_up_response,
+               rejection_reason, created_at
+        FROM applications
+        ORDER BY date_applied DESC
+    """),
+    "visits": (VisitRecord, """
+        SELECT id, ref_code, timestamp, visit_count, country,
+               is_return_visit, visit_source, time_on_site, utm_source, utm_medium
+        FROM visits
+        ORDER BY timestamp DESC
+    """),
+    "ref_codes": (RefCodeRecord, """
+        SELECT id, ref_code, application_id, created_date, is_active
+        FROM ref_codes
+        ORDER BY created_date DESC
+    """),
+}
+
+
+def stream_records(table: str, batch_size: int = STREAM_BATCH_SIZE, conn=None) -> Iterator[NamedTuple]:
+    """
+    Yields one record per row of `table` ("applications", "visits" or
+    "ref_codes"), fetched from a server-side cursor `batch_size` rows at a time.
+    Pass `conn` to share one connection across several streams.
+    """
+    record, query = _STREAM_QUERIES[table]
+    with get_server_cursor(f"stream_{table}", batch_size, args_row(record), conn) as cur:
+        cur.execute(query)
+        yield from cur
+
+
+def summarize_visits(batch_size: int = STREAM_BATCH_SIZE) -> dict:
+    """
+    Folds the visits table into per-ref aggregates in a single streaming pass.
+    Memory grows with the number of distinct ref codes, not with visits.
+    """
+    per_ref = {}
+    total = 0
+    for v in stream_records("visits", batch_size):
+        total += 1
+        stats = per_ref.get(v.ref_code)
+        if stats is None:
+            stats = per_ref[v.ref_code] = {
+                "visits": 0, "return_visits": 0, "time_on_site": 0,
+                "first_visit": v.timestamp, "last_visit": v.timestamp,
+            }
+        stats["visits"] += 1
+        if v.is_return_visit:
+            stats["return_visits"] += 1
+        if v.time_on_site:
+            stats["time_on_site"] += v.time_on_site
+        if v.timestamp is not None:
+            # Rows arrive newest first
+            stats["first_visit"] = v.timestamp
+    return {"total_visits": total, "per_ref": per_ref}
+
+
+def _fmt(value, fmt: str) -> str:
+    return value.strftime(fmt) if value else ""
+
 
 def collect_portfolio_data() -> dict:
     """
-    Queries all 3 tables and returns a structured dict.
-    Each key contains a list of dicts (one per row).
+    Streams all 3 tables and returns a structured dict.
+    Each key contains a list of dicts (one per row), built directly from the
+    streamed records so rows are never materialized twice.
     Returns empty lists if tables have no data — never errors.
     """
     data = {
@@ -93,73 +212,48 @@ def collect_portfolio_data() -> dict:
     }
 
     try:
-        with get_cursor() as cur:
-            # All applications
-            cur.execute("""
-                SELECT id, company_name, person_name, position,
-                       date_applied, outcome, outcome_date, ref_code, notes,
-                       outreach_channel, contact_person, role_category,
-                       followed_up, follow_up_date, follow_up_response,
-                       rejection_reason, created_at
-                FROM applications
-                ORDER BY date_applied DESC
-            """)
-            rows = cur.fetchall()
-            for row in rows:
+        # A summary cached for an hour does not mind a few seconds of replica lag
+        with stage("collect_data"), get_read_connection() as conn:
+            for row in stream_records("applications", conn=conn):
                 data["applications"].append({
-                    "id": row["id"],
-                    "company_name": row["company_name"],
-                    "person_name": row["person_name"] or "",
-                    "position": row["position"],
-                    "date_applied": row["date_applied"].strftime("%Y-%m-%d") if row["date_applied"] else "",
-                    "outcome": row["outcome"] or "pending",
-                    "outcome_date": row["outcome_date"].strftime("%Y-%m-%d") if row.get("outcome_date") else "",
-                    "ref_code": row["ref_code"] or "",
-                    "notes": row["notes"] or "",
-                    "outreach_channel": row.get("outreach_channel") or "",
-                    "contact_person": row.get("contact_person") or "",
-                    "role_category": row.get("role_category") or "",
-                    "followed_up": bool(row.get("followed_up")) if row.get("followed_up") is not None else False,
-                    "follow_up_date": row["follow_up_date"].strftime("%Y-%m-%d") if row.get("follow_up_date") else "",
-                    "follow_up_response": row.get("follow_up_response") or "",
-                    "rejection_reason": row.get("rejection_reason") or "",
+                    "id": row.id,
+                    "company_name": row.company_name,
+                    "person_name": row.person_name or "",
+                    "position": row.position,
+                    "date_applied": _fmt(row.date_applied, "%Y-%m-%d"),
+                    "outcome": row.outcome or "pending",
+                    "outcome_date": _fmt(row.outcome_date, "%Y-%m-%d"),
+                    "ref_code": row.ref_code or "",
+                    "notes": row.notes or "",
+                    "outreach_channel": row.outreach_channel or "",
+                    "contact_person": row.contact_person or "",
+                    "role_category": row.role_category or "",
+                    "followed_up": bool(row.followed_up),
+                    "follow_up_date": _fmt(row.follow_up_date, "%Y-%m-%d"),
+                    "follow_up_response": row.follow_up_response or "",
+                    "rejection_reason": row.rejection_reason or "",
                 })
 
-            # All visits
-            cur.execute("""
-                SELECT id, ref_code, timestamp, visit_count, country,
-                       is_return_visit, visit_source, time_on_site, utm_source, utm_medium
-                FROM visits
-                ORDER BY timestamp DESC
-            """)
-            rows = cur.fetchall()
-            for row in rows:
+            for row in stream_records("visits", conn=conn):
                 data["visits"].append({
-                    "id": row["id"],
-                    "ref_code": row["ref_code"],
-                    "timestamp": row["timestamp"].strftime("%Y-%m-%d %H:%M") if row["timestamp"] else "",
-                    "visit_count": row["visit_count"],
-                    "country": row["country"] or "",
-                    "is_return_visit": bool(row.get("is_return_visit")) if row.get("is_return_visit") is not None else False,
-                    "visit_source": row.get("visit_source") or "",
-                    "time_on_site": row.get("time_on_site") if row.get("time_on_site") is not None else None,
-                    "utm_source": row.get("utm_source") or "",
-                    "utm_medium": row.get("utm_medium") or "",
+                    "id": row.id,
+                    "ref_code": row.ref_code,
+                    "timestamp": _fmt(row.timestamp, "%Y-%m-%d %H:%M"),
+                    "visit_count": row.visit_count,
+                    "country": row.country or "",
+                    "is_return_visit": bool(row.is_return_visit),
+                    "visit_source": row.visit_source or "",
+                    "time_on_site": row.time_on_site,
+                    "utm_source": row.utm_source or "",
+                    "utm_medium": row.utm_medium or "",
                 })
 
-            # All ref codes
-            cur.execute("""
-                SELECT id, ref_code, application_id, created_date, is_active
-                FROM ref_codes
-                ORDER BY created_date DESC
-            """)
-            rows = cur.fetchall()
-            for row in rows:
+            for row in stream_records("ref_codes", conn=conn):
                 data["ref_codes"].append({
-                    "id": row["id"],
-                    "ref_code": row["ref_code"],
-                    "application_id": row["application_id"],
-                    "is_active": row["is_active"],
+                    "id": row.id,
+                    "ref_code": row.ref_code,
+                    "application_id": row.application_id,
+                    "is_active": row.is_active,
                 })
 
     except Exception as e:
@@ -206,7 +300,8 @@ def generate_insights(data: dict) -> list:
 
     Rules:
     - Skips the API call if fewer than 3 applications exist
-    - Uses a 5-second timeout to avoid hanging
+    - Goes through the GROQ circuit breaker, with its adaptive timeout
+      (at most GROQ_TIMEOUT seconds) and no SDK retries
     - Returns a fallback insight on ANY error (network, parse, timeout)
     - Validates each insight dict has the required keys and valid type
     """
@@ -217,12 +312,13 @@ def generate_insights(data: dict) -> list:
     # Skip if no API key configured
     if not GROQ_API_KEY:
         print("[Intelligence] GROQ_API_KEY not set — returning fallback")
+        GROQ_REQUESTS.inc("not_configured")
         return FALLBACK_INSIGHTS
 
     try:
         from groq import Groq
 
-        client = Groq(api_key=GROQ_API_KEY, timeout=5.0)
+        client = Groq(api_key=GROQ_API_KEY, timeout=GROQ.timeout, max_retries=0)
 
         # Build user prompt with the actual data
         user_prompt = (
@@ -239,16 +335,22 @@ def generate_insights(data: dict) -> list:
             "Return 3 to 6 insights."
         )
 
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": GROQ_SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.4,
-            max_tokens=2000,
-        )
+        with stage("groq"), GROQ.guard(), GROQ_REQUEST_DURATION.time():
+            response = client.chat.completions.create(
+                model="llama-3.3-70b-versatile",
+                messages=[
+                    {"role": "system", "content": GROQ_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt},
+                ],
+                response_format={"type": "json_object"},
+                temperature=0.4,
+                max_tokens=2000,
+            )
+
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            GROQ_TOKENS.inc("prompt", amount=usage.prompt_tokens or 0)
+            GROQ_TOKENS.inc("completion", amount=usage.completion_tokens or 0)
 
         raw = response.choices[0].message.content.strip()
 
@@ -264,10 +366,12 @@ def generate_insights(data: dict) -> list:
                     break
             else:
                 print(f"[Intelligence] Unexpected dict structure: {list(parsed.keys())}")
+                GROQ_REQUESTS.inc("invalid_response")
                 return FALLBACK_INSIGHTS
 
         if not isinstance(parsed, list):
             print(f"[Intelligence] Expected list, got {type(parsed).__name__}")
+            GROQ_REQUESTS.inc("invalid_response")
             return FALLBACK_INSIGHTS
 
         # Validate each insight has the required keys
@@ -290,25 +394,53 @@ def generate_insights(data: dict) -> list:
 
         if not validated:
             print("[Intelligence] No valid insights after validation")
+            GROQ_REQUESTS.inc("invalid_response")
             return FALLBACK_INSIGHTS
 
+        GROQ_REQUESTS.inc("ok")
+        insight_cache["last_good"] = validated
         return validated
 
+    except CircuitOpenError:
+        GROQ_REQUESTS.inc("circuit_open")
+        return FALLBACK_INSIGHTS
     except json.JSONDecodeError as e:
         print(f"[Intelligence] Failed to parse Groq response as JSON: {e}")
+        GROQ_REQUESTS.inc("invalid_response")
         return FALLBACK_INSIGHTS
     except Exception as e:
         print(f"[Intelligence] Groq API error: {e}")
+        GROQ_REQUESTS.inc("error")
         return FALLBACK_INSIGHTS
 
 
+def regenerate_insights() -> list:
+    """
+    Collect data, ask Groq and cache the result. A failed generation is not
+    cached (the next request retries, breaker permitting); the last good
+    insights are returned in its place when there are any. Raises
+    resilience.Overloaded if a regeneration is already running.
+    """
+    with INSIGHTS_LIMIT.slot():
+        insights = generate_insights(collect_portfolio_data())
+    if insights is FALLBACK_INSIGHTS:
+        if insight_cache["last_good"]:
+            INSIGHTS_CACHE.inc("stale")
+            return insight_cache["last_good"]
+        return insights
+    set_cached_insights(insights)
+    return insights
+
+
 # ─── Routes ───
 
 @router.get("/insights", response_class=HTMLResponse)
-async def insights_page(request: Request):
+def insights_page(request: Request):
     """
     Portfolio Intelligence page — password protected.
-    Shows AI-generated insight cards with type badges.
+    Shows AI-generated insight cards with type badges. Sync: a cache miss
+    regenerates in the threadpool under INSIGHTS_LIMIT, and shows the last
+    good insights while another regeneration is running.
     """
     auth = request.cookies.get("auth", "")
     if not hmac.compare_digest(auth, SESSION_TOKEN):
@@ -322,9 +454,10 @@ async def insights_page(request: Request):
 
     if insights is None:
         # Generate fresh insights
-        data = collect_portfolio_data()
-        insights = generate_insights(data)
-        set_cached_insights(insights)
+        try:
+            insights = regenerate_insights()
+        except Exception:
+            insights = insight_cache["last_good"] or FALLBACK_INSIGHTS
 
     return templates.TemplateResponse("insights.html", {
         "request": request,
@@ -334,10 +467,11 @@ async def insights_page(request: Request):
 
 
 @router.post("/insights/refresh")
-async def refresh_insights(request: Request):
+def refresh_insights(request: Request):
     """
     Clears the cache, regenerates insights, and returns the new insights
-    as JSON.  Password protected.
+    as JSON.  Password protected. Sync so it blocks a threadpool worker,
+    not the event loop; a second concurrent refresh gets a 503.
     """
     auth = request.cookies.get("auth", "")
     if not hmac.compare_digest(auth, SESSION_TOKEN):
@@ -346,8 +480,6 @@ async def refresh_insights(request: Request):
     clear_insights_cache()
 
     # Regenerate now so the caller gets fresh data
-    data = collect_portfolio_data()
-    insights = generate_insights(data)
-    set_cached_insights(insights)
+    insights = regenerate_insights()
 
     return {"insights": insights}
@@ -0,0 +1,171 @@
+"""
+Live Router — pushes dashboard changes to open dashboards over Server-Sent Events.
+
+GET /dashboard/stream is an admin-only `text/event-stream`. Writes already
+announce themselves through database.changes once they have committed; this
+router collects the affected keys, waits LIVE_DEBOUNCE_MS to coalesce a
+burst, re-reads just those applications and sends each client:
+
+    event: rows     data: {"rows": [{id, company_name, ..., views, time_on_site}]}
+    event: resync   data: {}    (bulk import / listener reconnect — refetch /dashboard/data)
+
+Every event carries `id: <worker>-<version>`, where the version counts the
+dashboard changes this worker has seen. A client resumes with that id
+(Last-Event-ID on reconnect, ?since= from the rendered page) and is only
+told to resync when it missed something.
+
+Rows carry the full current state, so duplicates (e.g. a local change and
+its CACHE_NOTIFY echo) are harmless. Each worker only streams changes it
+sees, so run CACHE_NOTIFY=true with more than one worker.
+"""
+
+import os
+import json
+import hmac
+import asyncio
+import threading
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from database import get_cursor, changes
+from routers.tracking import SESSION_TOKEN, DASHBOARD_FIELDS, DASHBOARD_QUERY, dashboard_row
+
+router = APIRouter()
+
+LIVE_DEBOUNCE_MS = float(os.getenv("LIVE_DEBOUNCE_MS", "50"))
+HEARTBEAT_SECONDS = 15
+# Events buffered per client; a client that falls this far behind gets a resync
+CLIENT_QUEUE_SIZE = 100
+
+_clients: set[asyncio.Queue] = set()
+_loop: asyncio.AbstractEventLoop | None = None
+_wake: asyncio.Event | None = None
+_flusher: asyncio.Task | None = None
+
+# Keys waiting for the next flush. Filled from writer threads.
+_pending_lock = threading.Lock()
+_pending_keys: set[str] = set()       # application id or ref code
+_pending_tokens: set[str] = set()     # visit tokens (time_on_site updates)
+_pending_resync = False
+_version = 0                          # dashboard changes seen by this worker
+
+
+def stream_id() -> str:
+    """Id of the latest dashboard change; a client holding it has seen everything."""
+    return f"{changes.ORIGIN}-{_version}"
+
+
+def _on_change(change: changes.Change) -> None:
+    global _pending_resync, _version
+    if change.table not in ("applications", "visits", None) or change.column == "pages_visited":
+        return
+    with _pending_lock:
+        _version += 1
+        if not _clients or _loop is None:
+            return
+        if change.table is None or change.key is None:
+            _pending_resync = True
+        elif change.column == "time_on_site":
+            _pending_tokens.add(change.key)
+        else:
+            _pending_keys.add(change.key)
+    _loop.call_soon_threadsafe(_wake.set)
+
+
+changes.subscribe(_on_change)
+
+
+def _fetch_rows(keys: list[str], tokens: list[str]) -> list[dict]:
+    where = """
+        WHERE a.id::text = ANY(%(keys)s)
+           OR a.ref_code = ANY(%(keys)s)
+           OR a.ref_code IN (SELECT ref_code FROM visits WHERE visit_token = ANY(%(tokens)s))
+    """
+    # From the primary: these rows were written moments ago
+    with get_cursor() as cur:
+        cur.execute(DASHBOARD_QUERY.format(where=where), {"keys": keys, "tokens": tokens})
+        return [dict(zip(DASHBOARD_FIELDS, dashboard_row(app))) for app in cur.fetchall()]
+
+
+def _format(event: str, data: dict, event_id: str | None = None) -> str:
+    return (f"id: {event_id or stream_id()}\nevent: {event}\n"
+            f"data: {json.dumps(data, separators=(',', ':'))}\n\n")
+
+
+def _broadcast(message: str) -> None:
+    for queue in list(_clients):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too far behind for deltas to be useful; start it over
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(_format("resync", {}))
+
+
+async def _flush_forever() -> None:
+    global _pending_resync
+    while True:
+        await _wake.wait()
+        await asyncio.sleep(LIVE_DEBOUNCE_MS / 1000)
+        _wake.clear()
+        with _pending_lock:
+            keys, tokens, resync = list(_pending_keys), list(_pending_tokens), _pending_resync
+            event_id = stream_id()
+            _pending_keys.clear()
+            _pending_tokens.clear()
+            _pending_resync = False
+
+        if resync:
+            _broadcast(_format("resync", {}, event_id))
+        elif keys or tokens:
+            try:
+                rows = await run_in_threadpool(_fetch_rows, keys, tokens)
+            except Exception as e:
+                print(f"[Live] Row refresh failed: {type(e).__name__}: {e}")
+                _broadcast(_format("resync", {}))
+                continue
+            if rows:
+                _broadcast(_format("rows", {"rows": rows}, event_id))
+
+
+def _ensure_flusher() -> None:
+    global _loop, _wake, _flusher
+    loop = asyncio.get_running_loop()
+    if _loop is not loop:
+        _loop, _wake = loop, asyncio.Event()
+        _flusher = loop.create_task(_flush_forever())
+
+
+async def _event_stream(since: str | None):
+    queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+    _clients.add(queue)
+    try:
+        current = stream_id()
+        yield f"retry: 5000\nid: {current}\n\n"
+        # Missed changes while away, or was last served by another worker
+        if since != current:
+            yield _format("resync", {}, current)
+        while True:
+            try:
+                yield await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+    finally:
+        _clients.discard(queue)
+
+
+@router.get("/dashboard/stream")
+async def dashboard_stream(request: Request):
+    """Server-Sent Events feed of dashboard row changes, resumable by event id."""
+    auth = request.cookies.get("auth", "")
+    if not hmac.compare_digest(auth, SESSION_TOKEN):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    _ensure_flusher()
+    return StreamingResponse(
+        _event_stream(request.headers.get("last-event-id") or request.query_params.get("since")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
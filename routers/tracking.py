@@ -4,25 +4,66 @@ Handles ref code generation, visit logging, admin panel, and dashboard.
 Includes rate limiting and input validation.
 """
 
+import io
 import os
 import re
+import csv
 import json
 import html
 import hmac
-import hashlib
+import time
 import secrets
-import string
-import smtplib
-import urllib.request as urlrequest
+import threading
 import urllib.parse as urlparse
 from collections import defaultdict
-from email.mime.text import MIMEText
-from datetime import datetime, timedelta
-from fastapi import APIRouter, Request, Form, HTTPException, Depends
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from datetime import date, datetime, timedelta, timezone
+from fastapi import APIRouter, Request, Form, HTTPException, Depends, UploadFile, File
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from database import get_cursor
+from templating import templates
+from database import get_cursor, get_read_cursor, changes
+from database.ref_codes import allocator as ref_code_allocator, is_ref_code
+from database.spool import visits as visit_spool, SpoolFull
+from database.retry import run_transaction
+import journeys
+import geoip
+from resilience import DATABASE, GA4, CLOSED, DASHBOARD_LIMIT, CircuitOpenError
+from timing import stage
+from metrics import VISITS, GA4_EVENTS, NOTIFICATION_EMAILS, SPOOLED_VISITS
+import memstats
+from config import (
+    DASHBOARD_PASSWORD, SESSION_SECRET_KEY, SESSION_TOKEN, BASE_URL, EXCLUDED_IPS,
+    NOTIFICATION_EMAIL, NOTIFICATION_EMAIL_PASSWORD, GA4_MEASUREMENT_ID, GA4_API_SECRET,
+    DATABASE_READ_URL,
+)
+
+try:
+    import orjson
+except ImportError:  # optional — falls back to the stdlib encoder
+    orjson = None
+
+
+# ─── Read-your-writes ───
+# With a read replica, an admin who just changed something could reload the
+# dashboard before the replica has the change. Every admin write stamps a
+# cookie, and reads read from the primary until it expires.
+READ_PRIMARY_COOKIE = "read_primary_until"
+READ_PRIMARY_SECONDS = int(os.getenv("DATABASE_READ_STICKY_SECONDS", "15"))
+
+
+def mark_write(response) -> None:
+    """Send this browser's reads to the primary for READ_PRIMARY_SECONDS."""
+    if DATABASE_READ_URL:
+        response.set_cookie(READ_PRIMARY_COOKIE, str(int(time.time()) + READ_PRIMARY_SECONDS),
+                            max_age=READ_PRIMARY_SECONDS, httponly=True, samesite="strict")
+
+
+def reads_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
 
 
 # ─── Rate Limiter (in-memory) ───
@@ -31,6 +72,7 @@ from database import get_cursor
 _rate_limit_store: dict[tuple, list[datetime]] = {}
 RATE_LIMIT_WINDOW = timedelta(seconds=60)
 MAX_VISITS_PER_WINDOW = 5
+memstats.register("tracking.rate_limit_store", _rate_limit_store)
 
 def _is_rate_limited(ip: str, ref_code: str) -> bool:
     """Check if this IP+ref_code combo was logged very recently."""
@@ -69,36 +111,53 @@ def _validate_application_input(company: str, position: str):
     if len(position) > 200:
         raise HTTPException(status_code=400, detail="Position too long (max 200 chars)")
 
+def _is_iso_date(value: str) -> bool:
+    """YYYY-MM-DD and a real calendar date (2024-13-45 is rejected here, not by the INSERT)."""
+    if not re.match(r"^\d{4}-\d{2}-\d{2}$", value):
+        return False
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
 V12_OUTREACH_CHANNELS = {"cold_founder_email", "hr_email", "linkedin_dm", "portal_apply", "referral"}
 V12_CONTACT_PERSONS = {"founder", "hr", "hiring_manager", "unknown"}
 V12_ROLE_CATEGORIES = {"data_analyst", "apm", "founders_office", "ai_engineer", "business_analyst", "other"}
 V12_FOLLOW_UP_RESPONSES = {"no_response", "positive", "negative", "interview_scheduled"}
 VISIT_SOURCES = {"email_click", "direct", "linkedin", "unknown"}
 
-router = APIRouter()
-templates = Jinja2Templates(directory="templates")
+# Seconds a ?ref= page load waits for a database connection before the
+# visit is spooled instead (libpq minimum: 2)
+VISIT_CONNECT_TIMEOUT = int(os.getenv("VISIT_CONNECT_TIMEOUT", "2"))
 
-DASHBOARD_PASSWORD = os.getenv("DASHBOARD_PASSWORD", "changeme")
+VALID_OUTCOMES = ['pending', 'got_call', 'rejected', 'no_response']
+
+def _validate_v12_fields(outreach_channel: str | None, contact_person: str | None,
+                         role_category: str | None, follow_up_response: str | None,
+                         follow_up_date: str | None):
+    """Validate the optional v1.2 application fields against their vocabularies."""
+    if outreach_channel and outreach_channel not in V12_OUTREACH_CHANNELS:
+        raise HTTPException(status_code=400, detail="Invalid outreach_channel value")
+    if contact_person and contact_person not in V12_CONTACT_PERSONS:
+        raise HTTPException(status_code=400, detail="Invalid contact_person value")
+    if role_category and role_category not in V12_ROLE_CATEGORIES:
+        raise HTTPException(status_code=400, detail="Invalid role_category value")
+    if follow_up_response and follow_up_response not in V12_FOLLOW_UP_RESPONSES:
+        raise HTTPException(status_code=400, detail="Invalid follow_up_response value")
+    if follow_up_date and not _is_iso_date(follow_up_date):
+        raise HTTPException(status_code=400, detail="Invalid follow_up_date format (YYYY-MM-DD)")
+
+router = APIRouter()
 
 # ─── Session Token (replaces storing plaintext password in cookie) ───
-# HMAC-sign the password so the cookie never contains the actual password.
-# Same password always produces the same token, so sessions survive restarts.
-SESSION_SECRET_KEY = os.getenv("SESSION_SECRET_KEY", "")
+# SESSION_TOKEN is derived once in config.py from the password and secret key.
 if not SESSION_SECRET_KEY:
     raise RuntimeError(
         "SESSION_SECRET_KEY is not set. "
         "Generate one with: python -c \"import secrets; print(secrets.token_hex(32))\" "
         "and add it to your .env file."
     )
-SESSION_TOKEN = hmac.new(
-    key=SESSION_SECRET_KEY.encode(),
-    msg=DASHBOARD_PASSWORD.encode(),
-    digestmod=hashlib.sha256
-).hexdigest()
-
-BASE_URL = os.getenv("BASE_URL", "http://127.0.0.1:8000")
-NOTIFICATION_EMAIL = os.getenv("NOTIFICATION_EMAIL", "")
-NOTIFICATION_EMAIL_PASSWORD = os.getenv("NOTIFICATION_EMAIL_PASSWORD", "")
 
 def get_client_ip(request: Request) -> str:
     forwarded = request.headers.get("X-Forwarded-For")
@@ -107,11 +166,10 @@ def get_client_ip(request: Request) -> str:
     return request.client.host if request.client else "unknown"
 
 def _is_internal_visit(request: Request) -> bool:
-    excluded = [ip.strip() for ip in os.getenv("EXCLUDED_IPS", "").split(",") if ip.strip()]
     if request.cookies.get("portfolio_owner") == "true":
         return True
     ip = get_client_ip(request)
-    return ip in excluded
+    return ip in EXCLUDED_IPS
 
 def _parse_ga_client_id(request: Request) -> str | None:
     ga_cookie = request.cookies.get("_ga")
@@ -133,15 +191,17 @@ def _fire_ga4_recruiter_visit_event(
     utm_source: str | None,
     utm_medium: str | None,
 ):
-    measurement_id = os.getenv("GA4_MEASUREMENT_ID", "").strip()
-    api_secret = os.getenv("GA4_API_SECRET", "").strip()
+    measurement_id = GA4_MEASUREMENT_ID
+    api_secret = GA4_API_SECRET
     if not measurement_id or not api_secret:
         print("[GA4] GA4_MEASUREMENT_ID/GA4_API_SECRET not set — skipping server event")
+        GA4_EVENTS.inc("skipped")
         return
 
     client_id = _parse_ga_client_id(request)
     if not client_id:
         print("[GA4] _ga cookie missing/unparseable — skipping server event")
+        GA4_EVENTS.inc("skipped")
         return
 
     endpoint = f"https://www.google-analytics.com/mp/collect?{urlparse.urlencode({'measurement_id': measurement_id, 'api_secret': api_secret})}"
@@ -162,6 +222,8 @@ def _fire_ga4_recruiter_visit_event(
     }
 
     try:
+        import urllib.request as urlrequest
+
         data = json.dumps(payload).encode("utf-8")
         req = urlrequest.Request(
             endpoint,
@@ -169,11 +231,17 @@ def _fire_ga4_recruiter_visit_event(
             headers={"Content-Type": "application/json"},
             method="POST",
         )
-        with urlrequest.urlopen(req, timeout=2) as resp:
+        with GA4.guard(), urlrequest.urlopen(req, timeout=GA4.timeout) as resp:
             if resp.status >= 400:
                 print(f"[GA4] Event failed: HTTP {resp.status}")
+                GA4_EVENTS.inc("failed")
+            else:
+                GA4_EVENTS.inc("sent")
+    except CircuitOpenError:
+        GA4_EVENTS.inc("skipped")
     except Exception as e:
         print(f"[GA4] Event error: {e}")
+        GA4_EVENTS.inc("error")
 
 
 # ─── Auth Middleware ───
@@ -189,18 +257,12 @@ def verify_password(password: str):
 
 def generate_ref_code() -> str:
     """
-    Generate a unique 8-character alphanumeric ref code.
-    Uses Python secrets module for cryptographic randomness.
-    Checks database to guarantee uniqueness.
+    Allocate a unique 8-character alphanumeric ref code.
+    Codes are a keyed permutation of a database sequence (database/ref_codes.py),
+    so uniqueness needs no lookup and most calls are served from a locally
+    reserved block without any round trip.
     """
-    alphabet = string.ascii_lowercase + string.digits
-    while True:
-        code = ''.join(secrets.choice(alphabet) for _ in range(8))
-        # Check uniqueness
-        with get_cursor() as cur:
-            cur.execute("SELECT id FROM ref_codes WHERE ref_code = %s", (code,))
-            if cur.fetchone() is None:
-                return code
+    return ref_code_allocator.next_code()
 
 
 def save_application(company_name: str, position: str, person_name: str = None, 
@@ -220,35 +282,34 @@ def save_application(company_name: str, position: str, person_name: str = None,
     ref_code = generate_ref_code()
     applied_date = date_applied or datetime.now().strftime('%Y-%m-%d')
 
-    if outreach_channel and outreach_channel not in V12_OUTREACH_CHANNELS:
-        raise HTTPException(status_code=400, detail="Invalid outreach_channel value")
-    if contact_person and contact_person not in V12_CONTACT_PERSONS:
-        raise HTTPException(status_code=400, detail="Invalid contact_person value")
-    if role_category and role_category not in V12_ROLE_CATEGORIES:
-        raise HTTPException(status_code=400, detail="Invalid role_category value")
-    if follow_up_response and follow_up_response not in V12_FOLLOW_UP_RESPONSES:
-        raise HTTPException(status_code=400, detail="Invalid follow_up_response value")
-    if follow_up_date and not re.match(r"^\d{4}-\d{2}-\d{2}$", follow_up_date):
-        raise HTTPException(status_code=400, detail="Invalid follow_up_date format (YYYY-MM-DD)")
+    _validate_v12_fields(outreach_channel, contact_person, role_category,
+                         follow_up_response, follow_up_date)
     
     with get_cursor() as cur:
-        # Insert application
-        cur.execute(
-            """INSERT INTO applications (
-                    company_name, person_name, position, date_applied, ref_code, notes,
-                    outreach_channel, contact_person, role_category,
-                    followed_up, follow_up_date, follow_up_response, rejection_reason
-               )
-               VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-               RETURNING id""",
-            (
-                company_name, person_name or None, position, applied_date, ref_code, notes or None,
-                outreach_channel or None, contact_person or None, role_category or None,
-                bool(followed_up), follow_up_date or None, follow_up_response or None,
-                rejection_reason or None
+        # Insert application. The conflict branch only fires if a generated
+        # code equals a legacy random one — take the next code and retry.
+        while True:
+            cur.execute(
+                """INSERT INTO applications (
+                        company_name, person_name, position, date_applied, ref_code, notes,
+                        outreach_channel, contact_person, role_category,
+                        followed_up, follow_up_date, follow_up_response, rejection_reason
+                   )
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                   ON CONFLICT (ref_code) DO NOTHING
+                   RETURNING id""",
+                (
+                    company_name, person_name or None, position, applied_date, ref_code, notes or None,
+                    outreach_channel or None, contact_person or None, role_category or None,
+                    bool(followed_up), follow_up_date or None, follow_up_response or None,
+                    rejection_reason or None
+                )
             )
-        )
-        app_id = cur.fetchone()["id"]
+            inserted = cur.fetchone()
+            if inserted:
+                app_id = inserted["id"]
+                break
+            ref_code = generate_ref_code()
         
         # Insert ref code mapping
         cur.execute(
@@ -256,13 +317,8 @@ def save_application(company_name: str, position: str, person_name: str = None,
                VALUES (%s, %s, TRUE)""",
             (ref_code, app_id)
         )
+        changes.publish(cur, "applications", ref_code)
 
-    try:
-        from routers.intelligence import clear_insights_cache
-        clear_insights_cache()
-    except Exception:
-        pass
-    
     ref_link = f"{BASE_URL}/?ref={ref_code}"
     return {
         "id": app_id,
@@ -273,6 +329,166 @@ def save_application(company_name: str, position: str, person_name: str = None,
     }
 
 
+def generate_ref_codes(count: int) -> list[str]:
+    """
+    Allocate `count` unique ref codes in one pass — at most one sequence
+    query for the whole batch, no uniqueness lookups.
+    """
+    return ref_code_allocator.reserve(count)
+
+
+# Column order shared by the bulk INSERT and _prepare_import_row
+_IMPORT_COLUMNS = (
+    "company_name", "person_name", "position", "date_applied", "ref_code", "notes",
+    "outreach_channel", "contact_person", "role_category",
+    "followed_up", "follow_up_date", "follow_up_response", "rejection_reason", "outcome",
+)
+# Keeps each multi-row INSERT well under Postgres' 65535 parameter limit
+_IMPORT_CHUNK_SIZE = 500
+
+
+def _prepare_import_row(raw: dict) -> dict:
+    """
+    Validate and normalize one imported row with the same rules as the
+    admin form. Raises HTTPException with a readable detail on bad input.
+    """
+    def field(name):
+        value = raw.get(name)
+        if value is None:
+            return ""
+        return str(value).strip()
+
+    company_name = field("company_name")
+    position = field("position")
+    _validate_application_input(company_name, position)
+
+    date_applied = field("date_applied")
+    if date_applied and not _is_iso_date(date_applied):
+        raise HTTPException(status_code=400, detail="Invalid date_applied format (YYYY-MM-DD)")
+
+    outcome = field("outcome") or "pending"
+    if outcome not in VALID_OUTCOMES:
+        raise HTTPException(status_code=400, detail=f"Invalid outcome. Must be one of: {VALID_OUTCOMES}")
+
+    followed_up = field("followed_up").lower() in {"true", "on", "1", "yes"}
+    follow_up_date = field("follow_up_date") if followed_up else ""
+    follow_up_response = field("follow_up_response") if followed_up else ""
+    _validate_v12_fields(field("outreach_channel"), field("contact_person"),
+                         field("role_category"), follow_up_response, follow_up_date)
+
+    return {
+        "company_name": _sanitize(company_name),
+        "person_name": _sanitize(field("person_name")) or None,
+        "position": _sanitize(position),
+        "date_applied": date_applied or datetime.now().strftime('%Y-%m-%d'),
+        "notes": _sanitize(field("notes"), 500) or None,
+        "outreach_channel": field("outreach_channel") or None,
+        "contact_person": field("contact_person") or None,
+        "role_category": field("role_category") or None,
+        "followed_up": followed_up,
+        "follow_up_date": follow_up_date or None,
+        "follow_up_response": follow_up_response or None,
+        "rejection_reason": _sanitize(field("rejection_reason"), 500) or None,
+        "outcome": outcome,
+    }
+
+
+def parse_import_rows(content: str, fmt: str) -> list[dict]:
+    """Parse CSV (with a header row) or JSONL text into a list of raw row dicts."""
+    if fmt == "csv":
+        return list(csv.DictReader(io.StringIO(content)))
+    if fmt == "jsonl":
+        rows = []
+        for line_no, line in enumerate(content.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise HTTPException(status_code=400, detail=f"Line {line_no}: invalid JSON ({e.msg})")
+            if not isinstance(row, dict):
+                raise HTTPException(status_code=400, detail=f"Line {line_no}: expected a JSON object")
+            rows.append(row)
+        return rows
+    raise HTTPException(status_code=400, detail="Invalid format. Must be one of: ['csv', 'jsonl']")
+
+
+def _insert_application_rows(cur, chunk: list[tuple[int, dict]]) -> dict[str, int]:
+    """
+    Multi-row INSERT of prepared rows; returns {ref_code: application id}.
+    Rows whose code clashes with a legacy ref code get a fresh one and are
+    re-inserted, mirroring the single-row retry in save_application.
+    """
+    ids: dict[str, int] = {}
+    remaining = chunk
+    while remaining:
+        placeholders = ", ".join(
+            "(" + ", ".join(["%s"] * len(_IMPORT_COLUMNS)) + ")" for _ in remaining
+        )
+        cur.execute(
+            f"""INSERT INTO applications ({", ".join(_IMPORT_COLUMNS)})
+                VALUES {placeholders}
+                ON CONFLICT (ref_code) DO NOTHING
+                RETURNING id, ref_code""",
+            [row[col] for _, row in remaining for col in _IMPORT_COLUMNS]
+        )
+        ids.update({r["ref_code"]: r["id"] for r in cur.fetchall()})
+        remaining = [item for item in remaining if item[1]["ref_code"] not in ids]
+        for (_, row), code in zip(remaining, generate_ref_codes(len(remaining))):
+            row["ref_code"] = code
+    return ids
+
+
+def import_applications(raw_rows: list[dict], partial: bool = False) -> dict:
+    """
+    Bulk version of save_application.
+    Validates every row, allocates all ref codes in one pass and writes
+    applications + ref_codes with multi-row INSERTs in a single transaction.
+
+    Rows are numbered from 1. If any row is invalid nothing is written,
+    unless `partial` is set, in which case the valid rows are imported.
+    Returns {"imported": [...], "errors": [{"row": n, "error": "..."}]}.
+    """
+    prepared, errors = [], []
+    for row_no, raw in enumerate(raw_rows, start=1):
+        try:
+            prepared.append((row_no, _prepare_import_row(raw)))
+        except HTTPException as e:
+            errors.append({"row": row_no, "error": e.detail})
+
+    if not prepared or (errors and not partial):
+        return {"imported": [], "errors": errors}
+
+    for (_, row), code in zip(prepared, generate_ref_codes(len(prepared))):
+        row["ref_code"] = code
+
+    imported = []
+    with get_cursor() as cur:
+        for start in range(0, len(prepared), _IMPORT_CHUNK_SIZE):
+            chunk = prepared[start:start + _IMPORT_CHUNK_SIZE]
+            ids = _insert_application_rows(cur, chunk)
+
+            cur.execute(
+                f"""INSERT INTO ref_codes (ref_code, application_id, is_active)
+                    VALUES {", ".join(["(%s, %s, TRUE)"] * len(chunk))}""",
+                [v for _, row in chunk for v in (row["ref_code"], ids[row["ref_code"]])]
+            )
+
+            for row_no, row in chunk:
+                imported.append({
+                    "row": row_no,
+                    "id": ids[row["ref_code"]],
+                    "company_name": row["company_name"],
+                    "position": row["position"],
+                    "ref_code": row["ref_code"],
+                    "ref_link": f"{BASE_URL}/?ref={row['ref_code']}",
+                })
+
+        changes.publish(cur, "applications")
+
+    return {"imported": imported, "errors": errors}
+
+
 def _derive_visit_source(request: Request, utm_source: str | None, utm_medium: str | None) -> str:
     if utm_medium:
         m = utm_medium.strip().lower()
@@ -295,73 +511,71 @@ def log_visit(ref_code: str, request: Request = None) -> str | None:
     """
     Log a portfolio visit for a given ref code.
     Silently ignores invalid/non-existent ref codes — no errors, no fake rows.
-    Returns a per-visit token if a row was inserted, else None.
+    Returns a per-visit token if a row was inserted (or spooled), else None.
+
+    While the database breaker is open, or if the insert fails, the visit
+    goes to the local spool (database/spool.py) instead and is replayed
+    once the database is back.
     """
     if not request:
         return None
     if _is_internal_visit(request):
+        VISITS.inc("internal")
         return None
 
-    try:
-        with get_cursor() as cur:
-            cur.execute(
-                "SELECT id, is_active FROM ref_codes WHERE ref_code = %s",
-                (ref_code,)
-            )
-            ref_record = cur.fetchone()
-
-            if ref_record is None or not ref_record["is_active"]:
-                return None
+    client_ip = get_client_ip(request)
+    utm_source = request.query_params.get("utm_source")
+    utm_medium = request.query_params.get("utm_medium")
+    if utm_source:
+        utm_source = _sanitize(utm_source, 100)
+    if utm_medium:
+        utm_medium = _sanitize(utm_medium, 100)
 
-            client_ip = get_client_ip(request)
-            if _is_rate_limited(client_ip, ref_code):
-                return None
+    visit_source = _derive_visit_source(request, utm_source, utm_medium)
+    if visit_source not in VISIT_SOURCES:
+        visit_source = "unknown"
 
-            utm_source = request.query_params.get("utm_source")
-            utm_medium = request.query_params.get("utm_medium")
-            if utm_source:
-                utm_source = _sanitize(utm_source, 100)
-            if utm_medium:
-                utm_medium = _sanitize(utm_medium, 100)
+    visit_token = secrets.token_urlsafe(16)
+    visit = {
+        "kind": "visit",
+        "ref_code": ref_code,
+        "visit_token": visit_token,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "country": geoip.country(client_ip),
+        "visit_source": visit_source,
+        "utm_source": utm_source or None,
+        "utm_medium": utm_medium or None,
+    }
 
-            visit_source = _derive_visit_source(request, utm_source, utm_medium)
-            if visit_source not in VISIT_SOURCES:
-                visit_source = "unknown"
+    rate_limited = None
 
+    def record_visit(cur):
+        nonlocal rate_limited
+        with stage("ref_lookup"):
             cur.execute(
-                "SELECT COUNT(*) as cnt FROM visits WHERE ref_code = %s",
+                "SELECT id, is_active FROM ref_codes WHERE ref_code = %s",
                 (ref_code,)
             )
-            cnt = cur.fetchone()["cnt"]
-            visit_count = cnt + 1
-            is_return_visit = cnt > 0
+            ref_record = cur.fetchone()
 
-            country = None
-            visit_token = secrets.token_urlsafe(16)
+        if ref_record is None or not ref_record["is_active"]:
+            return "unknown_ref", None, None
 
-            cur.execute(
-                """INSERT INTO visits (
-                        ref_code, visit_count, country,
-                        visit_token, is_return_visit, visit_source,
-                        utm_source, utm_medium
-                   )
-                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
-                (
-                    ref_code, visit_count, country,
-                    visit_token, is_return_visit, visit_source,
-                    utm_source or None, utm_medium or None
-                )
-            )
+        # Once per visit, not once per attempt: run_transaction may retry
+        if rate_limited is None:
+            with stage("rate_limit"):
+                rate_limited = _is_rate_limited(client_ip, ref_code)
+        if rate_limited:
+            return "rate_limited", None, None
 
-            if visit_count == 1:
-                _send_first_visit_notification(ref_code)
+        with stage("visit_insert"):
+            is_return_visit = _insert_visit(cur, visit)
 
-            try:
-                from routers.intelligence import clear_insights_cache
-                clear_insights_cache()
-            except Exception:
-                pass
+        changes.publish(cur, "visits", ref_code)
 
+        app = None
+        # Enrichment (GA4 event) is skipped while the database struggles
+        if not DATABASE.degraded:
             cur.execute("""
                 SELECT a.company_name, a.position
                 FROM applications a
@@ -369,8 +583,34 @@ def log_visit(ref_code: str, request: Request = None) -> str | None:
                 WHERE rc.ref_code = %s
             """, (ref_code,))
             app = cur.fetchone()
+        return "logged", is_return_visit, app
+
+    try:
+        result, is_return_visit, app = run_transaction(record_visit, connect_timeout=VISIT_CONNECT_TIMEOUT)
+    except CircuitOpenError:
+        if rate_limited is None:
+            with stage("rate_limit"):
+                rate_limited = _is_rate_limited(client_ip, ref_code)
+        if rate_limited:
+            VISITS.inc("rate_limited")
+            return None
+        return _spool_visit(visit)
+    except Exception as e:
+        print(f"[Tracking] log_visit error: {e} — spooling visit")
+        VISITS.inc("error")
+        return _spool_visit(visit)
+
+    VISITS.inc(result)
+    if result != "logged":
+        return None
+
+    # After commit: never notify about a visit that was rolled back
+    if is_return_visit is False:
+        with stage("smtp"):
+            _send_first_visit_notification(ref_code)
 
-        if app:
+    if app:
+        with stage("ga4"):
             _fire_ga4_recruiter_visit_event(
                 request=request,
                 ref_code=ref_code,
@@ -382,10 +622,114 @@ def log_visit(ref_code: str, request: Request = None) -> str | None:
                 utm_medium=utm_medium,
             )
 
-        return visit_token
-    except Exception as e:
-        print(f"[Tracking] log_visit error: {e}")
+    replay_spool_in_background()
+    return visit_token
+
+
+def _insert_visit(cur, visit: dict) -> bool | None:
+    """
+    Insert one visit record (live or spooled). Returns is_return_visit, or
+    None if a row with this visit_token already exists.
+    """
+    cur.execute(
+        "SELECT COUNT(*) as cnt FROM visits WHERE ref_code = %s",
+        (visit["ref_code"],)
+    )
+    cnt = cur.fetchone()["cnt"]
+    is_return_visit = cnt > 0
+
+    cur.execute(
+        """INSERT INTO visits (
+                ref_code, timestamp, visit_count, country,
+                visit_token, is_return_visit, visit_source,
+                utm_source, utm_medium
+           )
+           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+           ON CONFLICT (visit_token) DO NOTHING""",
+        (
+            visit["ref_code"], visit["timestamp"], cnt + 1, visit.get("country"),
+            visit["visit_token"], is_return_visit, visit["visit_source"],
+            visit["utm_source"], visit["utm_medium"]
+        )
+    )
+    return is_return_visit if cur.rowcount else None
+
+
+def _spool(record: dict) -> bool:
+    try:
+        visit_spool.append(record)
+    except SpoolFull:
+        SPOOLED_VISITS.inc("dropped")
+        return False
+    except OSError as e:
+        print(f"[Spool] Could not spool {record['kind']} record: {e}")
+        SPOOLED_VISITS.inc("dropped")
+        return False
+    SPOOLED_VISITS.inc("spooled")
+    return True
+
+
+def _spool_visit(visit: dict) -> str | None:
+    # Anyone can send ?ref=, so only well-formed codes take spool space;
+    # whether the code exists is checked on replay. No GA4 event: that needs
+    # the application row.
+    if not is_ref_code(visit["ref_code"]):
+        VISITS.inc("unknown_ref")
         return None
+    return visit["visit_token"] if _spool(visit) else None
+
+
+def _replay_records(records: list[dict]) -> None:
+    """Apply one spool file in a single transaction (idempotent by visit_token)."""
+
+    def replay(cur):
+        first_visits, outcomes = [], []
+        for record in records:
+            if record["kind"] == "visit":
+                cur.execute(
+                    "SELECT is_active FROM ref_codes WHERE ref_code = %s",
+                    (record["ref_code"],)
+                )
+                ref_record = cur.fetchone()
+                if ref_record is None or not ref_record["is_active"]:
+                    outcomes.append("unknown_ref")
+                    continue
+                is_return_visit = _insert_visit(cur, record)
+                if is_return_visit is False:
+                    first_visits.append(record["ref_code"])
+                outcomes.append("replayed" if is_return_visit is not None else "duplicate")
+            elif record["kind"] == "time":
+                _update_time_on_site(cur, record["visit_token"], record["seconds"])
+            elif record["kind"] == "pages":
+                journeys.append_pages(cur, {record["visit_token"]: record["pages"]})
+        changes.publish(cur, "visits")
+        return first_visits, outcomes
+
+    first_visits, outcomes = run_transaction(replay)
+    for outcome in outcomes:
+        SPOOLED_VISITS.inc(outcome)
+    for ref_code in first_visits:
+        _send_first_visit_notification(ref_code)
+
+
+def replay_spool() -> int:
+    """Replay all spooled writes now; returns the number of records applied."""
+    if DATABASE.state != CLOSED:
+        return 0
+    try:
+        replayed = visit_spool.replay(_replay_records)
+    except Exception as e:
+        print(f"[Spool] Replay failed, will retry: {type(e).__name__}: {e}")
+        return 0
+    if replayed:
+        print(f"[Spool] Replayed {replayed} spooled records")
+    return replayed
+
+
+def replay_spool_in_background() -> None:
+    if not visit_spool.pending:
+        return
+    threading.Thread(target=replay_spool, name="spool-replay", daemon=True).start()
 
 
 class TrackTimePayload(BaseModel):
@@ -393,38 +737,77 @@ class TrackTimePayload(BaseModel):
     elapsed_seconds: int
 
 
+def _update_time_on_site(cur, token: str, seconds: int) -> int:
+    cur.execute(
+        """
+        UPDATE visits
+        SET time_on_site = CASE
+            WHEN time_on_site IS NULL THEN %s
+            ELSE GREATEST(time_on_site, %s)
+        END
+        WHERE visit_token = %s
+        """,
+        (seconds, seconds, token)
+    )
+    changes.publish(cur, "visits", token, column="time_on_site")
+    return cur.rowcount
+
+
 @router.post("/track-time")
-async def track_time(request: Request, payload: TrackTimePayload):
+def track_time(request: Request, payload: TrackTimePayload):
     if _is_internal_visit(request):
         return {"ok": True}
 
+    # Checked before the spool: anyone can send this beacon
     token = (payload.visit_token or "").strip()
-    if not token or len(token) > 200:
+    if not journeys.valid_token(token):
         raise HTTPException(status_code=400, detail="Invalid visit_token")
 
     seconds = int(payload.elapsed_seconds)
     if seconds < 0 or seconds > 6 * 60 * 60:
         raise HTTPException(status_code=400, detail="Invalid elapsed_seconds")
 
+    # The visit itself may still be in the spool; keep the update behind it
+    spooled = {"kind": "time", "visit_token": token, "seconds": seconds}
     try:
-        with get_cursor() as cur:
-            cur.execute(
-                """
-                UPDATE visits
-                SET time_on_site = CASE
-                    WHEN time_on_site IS NULL THEN %s
-                    ELSE GREATEST(time_on_site, %s)
-                END
-                WHERE visit_token = %s
-                """,
-                (seconds, seconds, token)
-            )
+        def update_time(cur):
+            return _update_time_on_site(cur, token, seconds)
+
+        updated = run_transaction(update_time, connect_timeout=VISIT_CONNECT_TIMEOUT)
+        if not updated and visit_spool.pending:
+            _spool(spooled)
+        return {"ok": True}
+    except CircuitOpenError:
+        _spool(spooled)
         return {"ok": True}
     except Exception as e:
-        print(f"[Tracking] track_time error: {e}")
+        print(f"[Tracking] track_time error: {e} — spooling update")
+        _spool(spooled)
         return {"ok": True}
 
 
+class TrackPagePayload(BaseModel):
+    visit_token: str
+    path: str
+
+
+@router.post("/track-page")
+async def track_page(request: Request, payload: TrackPagePayload):
+    """One page view within a tracked visit; buffered and written in batches (journeys.py)."""
+    if _is_internal_visit(request):
+        return {"ok": True}
+
+    token = (payload.visit_token or "").strip()
+    if not journeys.valid_token(token):
+        raise HTTPException(status_code=400, detail="Invalid visit_token")
+    path = (payload.path or "").strip()
+    if not journeys.valid_path(path):
+        raise HTTPException(status_code=400, detail="Invalid path")
+
+    journeys.record(token, path)
+    return {"ok": True}
+
+
 def _send_first_visit_notification(ref_code: str):
     """
     Send email notification when a ref link is opened for the first time.
@@ -432,6 +815,7 @@ def _send_first_visit_notification(ref_code: str):
     """
     if not NOTIFICATION_EMAIL or not NOTIFICATION_EMAIL_PASSWORD:
         print(f"[Notification] First visit to ref:{ref_code} — email not configured, skipping")
+        NOTIFICATION_EMAILS.inc("skipped")
         return
     
     # Get application details for the notification
@@ -460,6 +844,10 @@ def _send_first_visit_notification(ref_code: str):
     """
     
     try:
+        # Imported here: only the first visit per ref code ever sends mail
+        import smtplib
+        from email.mime.text import MIMEText
+
         msg = MIMEText(body)
         msg['Subject'] = subject
         msg['From'] = NOTIFICATION_EMAIL
@@ -470,14 +858,16 @@ def _send_first_visit_notification(ref_code: str):
             server.send_message(msg)
         
         print(f"[Notification] Email sent for ref:{ref_code} → {app['company_name']}")
+        NOTIFICATION_EMAILS.inc("sent")
     except Exception as e:
         print(f"[Notification] Failed to send email: {e}")
+        NOTIFICATION_EMAILS.inc("failed")
 
 
 # ─── API Routes ───
 
 @router.post("/generate-ref")
-async def generate_ref_endpoint(
+def generate_ref_endpoint(
     company_name: str = Form(...),
     position: str = Form(...),
     person_name: str = Form(None),
@@ -529,7 +919,7 @@ async def admin_panel(request: Request):
 
 
 @router.post("/admin/application")
-async def submit_application(
+def submit_application(
     request: Request,
     company_name: str = Form(...),
     position: str = Form(...),
@@ -571,12 +961,14 @@ async def submit_application(
             follow_up_date=follow_up_date or None,
             follow_up_response=follow_up_response or None,
         )
-        return templates.TemplateResponse("admin.html", {
+        response = templates.TemplateResponse("admin.html", {
             "request": request,
             "authenticated": True,
             "success": True,
             "result": result
         })
+        mark_write(response)
+        return response
     except HTTPException as e:
         return templates.TemplateResponse("admin.html", {
             "request": request,
@@ -594,11 +986,134 @@ async def submit_application(
         })
 
 
+@router.post("/admin/import")
+async def import_applications_endpoint(
+    request: Request,
+    file: UploadFile = File(...),
+    format: str = Form(""),
+    partial: str = Form("")
+):
+    """
+    Bulk-import applications from a CSV or JSONL upload.
+    Returns per-row errors and every generated ref link in one response.
+    """
+    auth = request.cookies.get("auth", "")
+    if not hmac.compare_digest(auth, SESSION_TOKEN):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    fmt = format or ("jsonl" if (file.filename or "").lower().endswith((".jsonl", ".ndjson")) else "csv")
+    try:
+        content = (await file.read()).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+
+    rows = parse_import_rows(content, fmt)
+    try:
+        # The upload is read on the event loop; the inserts block, so they run in the threadpool
+        result = await run_in_threadpool(
+            import_applications, rows, partial=str(partial).lower() in {"true", "on", "1", "yes"})
+    except Exception as e:
+        print(f"[Admin] Bulk import failed: {type(e).__name__}: {e}")
+        raise HTTPException(status_code=500, detail=f"{type(e).__name__}: {str(e)[:200]}")
+
+    status = 200 if not result["errors"] else (207 if result["imported"] else 400)
+    response = JSONResponse(result, status_code=status)
+    if result["imported"]:
+        mark_write(response)
+    return response
+
+
 # ─── Dashboard Routes ───
 
+# Columnar dashboard payload: one array per field instead of one dict per
+# application. Low-cardinality fields are dictionary-encoded — the column
+# holds indexes into `dicts[field]`. dashboard.html expands it client-side.
+DASHBOARD_FIELDS = (
+    "id", "company_name", "person_name", "position", "date_applied",
+    "outcome", "ref_code", "views", "first_viewed", "time_on_site",
+)
+DASHBOARD_DICT_FIELDS = ("position", "outcome")
+
+
+# Applications with their visit aggregates. Also used by routers/live.py to
+# re-read single rows, so filters go in {where}.
+DASHBOARD_QUERY = """
+    SELECT 
+        a.id,
+        a.company_name,
+        a.person_name,
+        a.position,
+        a.date_applied,
+        a.outcome,
+        a.ref_code,
+        COUNT(v.id) AS visit_count,
+        MIN(v.timestamp) AS first_visit,
+        COALESCE(SUM(v.time_on_site), 0) AS time_on_site
+    FROM applications a
+    LEFT JOIN visits v ON a.ref_code = v.ref_code
+    {where}
+    GROUP BY a.id
+    ORDER BY a.date_applied DESC
+"""
+
+
+def dashboard_row(app: dict) -> tuple:
+    """One DASHBOARD_QUERY row as values in DASHBOARD_FIELDS order."""
+    first_visit = app["first_visit"]
+    date_applied = app["date_applied"]
+    return (
+        app["id"],
+        app["company_name"],
+        app["person_name"] or "",
+        app["position"],
+        date_applied.strftime("%Y-%m-%d") if date_applied else "",
+        app["outcome"],
+        app["ref_code"] or "",
+        app["visit_count"],
+        first_visit.strftime("%Y-%m-%d %H:%M") if first_visit else None,
+        int(app["time_on_site"]),
+    )
+
+
+def _encode_dashboard_columns(applications: list[dict]) -> dict:
+    cols = {field: [] for field in DASHBOARD_FIELDS}
+    dicts = {field: {} for field in DASHBOARD_DICT_FIELDS}
+
+    for app in applications:
+        row = dashboard_row(app)
+        for field, value in zip(DASHBOARD_FIELDS, row):
+            codes = dicts.get(field)
+            if codes is not None:
+                value = codes.setdefault(value, len(codes))
+            cols[field].append(value)
+
+    return {
+        "n": len(applications),
+        "cols": cols,
+        "dicts": {field: list(codes) for field, codes in dicts.items()},
+    }
+
+
+def _script_json(value) -> str:
+    """
+    Serialize for inlining inside a <script> tag. Uses orjson when installed.
+    '<' only ever occurs inside JSON strings, so escaping it is lossless
+    and rules out a stray '</script>'.
+    """
+    if orjson is not None:
+        text = orjson.dumps(value).decode("utf-8")
+    else:
+        text = json.dumps(value, separators=(",", ":"))
+    return text.replace("<", "\\u003c")
+
+
 @router.get("/dashboard", response_class=HTMLResponse)
-async def dashboard_page(request: Request):
-    """Private dashboard — shows all applications with visit data and analytics."""
+def dashboard_page(request: Request):
+    """
+    Private dashboard — shows all applications with visit data and analytics.
+    Sync (runs in the threadpool) and capped at DASHBOARD_CONCURRENCY
+    concurrent renders; beyond that it answers 503 at once.
+    """
     auth = request.cookies.get("auth", "")
     if not hmac.compare_digest(auth, SESSION_TOKEN):
         return templates.TemplateResponse("admin_login.html", {
@@ -606,66 +1121,82 @@ async def dashboard_page(request: Request):
             "redirect_to": "/dashboard"
         })
     
-    with get_cursor() as cur:
-        # Get all applications with visit counts
-        cur.execute("""
-            SELECT 
-                a.id,
-                a.company_name,
-                a.person_name,
-                a.position,
-                a.date_applied,
-                a.outcome,
-                a.ref_code,
-                COUNT(v.id) AS visit_count,
-                MIN(v.timestamp) AS first_visit
-            FROM applications a
-            LEFT JOIN visits v ON a.ref_code = v.ref_code
-            GROUP BY a.id
-            ORDER BY a.date_applied DESC
-        """)
-        applications = cur.fetchall()
+    from routers.live import stream_id
+    with DASHBOARD_LIMIT.slot():
+        # Taken before the query: the live stream resyncs if anything changes after it
+        live_id = stream_id()
+        with stage("dashboard_query"), get_read_cursor(primary=reads_primary(request)) as cur:
+            # Get all applications with visit counts
+            cur.execute(DASHBOARD_QUERY.format(where=""))
+            applications = cur.fetchall()
     
-    # Build the complete dataset as JSON for client-side filtering
-    all_applications = []
-    for app in applications:
-        first_viewed = None
-        if app["first_visit"]:
-            first_viewed = app["first_visit"].strftime("%Y-%m-%d %H:%M")
-        
-        all_applications.append({
-            "id": app["id"],
-            "company_name": app["company_name"],
-            "person_name": app["person_name"] or "",
-            "position": app["position"],
-            "date_applied": app["date_applied"].strftime("%Y-%m-%d") if app["date_applied"] else "",
-            "outcome": app["outcome"],
-            "ref_code": app["ref_code"] or "",
-            "views": app["visit_count"],
-            "first_viewed": first_viewed,
-            "viewed": app["visit_count"] > 0,
-        })
+        # Build the complete dataset (columnar) for client-side filtering
+        dataset = _encode_dashboard_columns(applications)
     
-    # ── AI Insights ──
-    from routers.intelligence import get_cached_insights, generate_insights, collect_portfolio_data
-    insights = get_cached_insights()
-    if insights is None:
-        try:
-            data = collect_portfolio_data()
-            insights = generate_insights(data)
-        except Exception:
-            insights = []
+        # ── AI Insights ── (stale ones while Groq is down or busy)
+        from routers.intelligence import get_cached_insights, regenerate_insights, insight_cache
+        insights = get_cached_insights()
+        if insights is None:
+            try:
+                insights = regenerate_insights()
+            except Exception:
+                insights = insight_cache["last_good"]
     
     return templates.TemplateResponse("dashboard.html", {
         "request": request,
-        "json_data": json.dumps(all_applications),
-        "insights_json": json.dumps(insights),
+        "json_data": _script_json(dataset),
+        "insights_json": _script_json(insights),
+        "stream_id_json": _script_json(live_id),
     })
 
 
+@router.get("/dashboard/data")
+def dashboard_data(request: Request):
+    """Columnar dashboard dataset; the live view re-fetches it after a bulk change."""
+    auth = request.cookies.get("auth", "")
+    if not hmac.compare_digest(auth, SESSION_TOKEN):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    with DASHBOARD_LIMIT.slot(), stage("dashboard_query"), get_read_cursor(primary=reads_primary(request)) as cur:
+        cur.execute(DASHBOARD_QUERY.format(where=""))
+        applications = cur.fetchall()
+    return JSONResponse(_encode_dashboard_columns(applications))
+
+
+@router.get("/dashboard/journeys/{application_id}")
+def dashboard_journeys(request: Request, application_id: int):
+    """Visits of one application with the pages each one went through (newest first)."""
+    auth = request.cookies.get("auth", "")
+    if not hmac.compare_digest(auth, SESSION_TOKEN):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    with get_read_cursor(primary=reads_primary(request)) as cur:
+        cur.execute("""
+            SELECT v.timestamp, v.pages_visited, v.time_on_site, v.visit_source, v.country
+            FROM visits v
+            JOIN applications a ON a.ref_code = v.ref_code
+            WHERE a.id = %s
+            ORDER BY v.timestamp DESC
+            LIMIT 50
+        """, (application_id,))
+        rows = cur.fetchall()
+
+    return {"visits": [
+        {
+            "timestamp": row["timestamp"].strftime("%Y-%m-%d %H:%M") if row["timestamp"] else None,
+            "pages": row["pages_visited"].split(journeys.SEPARATOR) if row["pages_visited"] else [],
+            "time_on_site": row["time_on_site"],
+            "source": row["visit_source"],
+            "country": row["country"],
+        }
+        for row in rows
+    ]}
+
+
 @router.post("/dashboard/update-outcome")
-async def update_outcome(
+def update_outcome(
     request: Request,
+    response: Response,
     application_id: int = Form(...),
     outcome: str = Form(...)
 ):
@@ -674,11 +1205,10 @@ async def update_outcome(
     if not hmac.compare_digest(auth, SESSION_TOKEN):
         raise HTTPException(status_code=403, detail="Access denied")
     
-    valid_outcomes = ['pending', 'got_call', 'rejected', 'no_response']
-    if outcome not in valid_outcomes:
-        raise HTTPException(status_code=400, detail=f"Invalid outcome. Must be one of: {valid_outcomes}")
+    if outcome not in VALID_OUTCOMES:
+        raise HTTPException(status_code=400, detail=f"Invalid outcome. Must be one of: {VALID_OUTCOMES}")
     
-    with get_cursor() as cur:
+    def set_outcome(cur):
         cur.execute(
             """
             UPDATE applications
@@ -688,12 +1218,13 @@ async def update_outcome(
             """,
             (outcome, outcome, application_id)
         )
+        if cur.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Application not found")
+        changes.publish(cur, "applications", application_id)
 
-    try:
-        from routers.intelligence import clear_insights_cache
-        clear_insights_cache()
-    except Exception:
-        pass
-    
-    return RedirectResponse(url="/dashboard", status_code=303)
+    run_transaction(set_outcome)
+    mark_write(response)
+
+    # The dashboard patches its own row; other open dashboards get it over SSE
+    return {"ok": True, "id": application_id, "outcome": outcome}
 
@@ -0,0 +1,91 @@
+"""
+Shared Jinja2 environment for AI Portfolio.
+
+main.py and every router render through this single `templates` object, so
+each template is parsed and compiled once per process instead of once per
+module. Compiled bytecode is also kept in a filesystem cache, so a fresh
+worker (e.g. a Vercel cold start) loads it instead of compiling again.
+
+Precompile every template ahead of time (build step or manual warm-up):
+    python templating.py
+"""
+
+import os
+import tempfile
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+from fastapi.templating import Jinja2Templates
+from config import env_flag, GA4_MEASUREMENT_ID
+from timing import stage
+import memstats
+
+TEMPLATES_DIR = "templates"
+
+# Reload templates when their files change (local development only)
+TEMPLATE_AUTO_RELOAD = env_flag("TEMPLATE_AUTO_RELOAD")
+
+# Compile every template while the app starts instead of on first request
+PRECOMPILE_TEMPLATES = env_flag("PRECOMPILE_TEMPLATES")
+
+# /tmp is the only writable location on Vercel
+JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "ai-portfolio-jinja")
+
+
+class _BytecodeCache(FileSystemBytecodeCache):
+    """Filesystem bytecode cache that treats a read-only directory as a miss."""
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            pass
+
+
+def _bytecode_cache() -> FileSystemBytecodeCache | None:
+    try:
+        os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+    except OSError:
+        pass
+    if not os.path.isdir(JINJA_CACHE_DIR):
+        print(f"[Templates] Bytecode cache dir {JINJA_CACHE_DIR} unavailable — compiling in memory only")
+        return None
+    return _BytecodeCache(JINJA_CACHE_DIR)
+
+
+env = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=True,
+    auto_reload=TEMPLATE_AUTO_RELOAD,
+    bytecode_cache=_bytecode_cache(),
+    cache_size=-1,
+)
+# Compiled templates reference the shared environment — count entries only
+memstats.register("templating.compiled_templates", env.cache, deep=False)
+
+
+class _TimedTemplates(Jinja2Templates):
+    """Jinja2Templates whose renders show up as the `render` timing stage."""
+
+    def TemplateResponse(self, *args, **kwargs):
+        with stage("render"):
+            return super().TemplateResponse(*args, **kwargs)
+
+
+templates = _TimedTemplates(env=env)
+templates.env.globals["GA4_MEASUREMENT_ID"] = GA4_MEASUREMENT_ID
+
+
+def precompile_templates() -> int:
+    """Load (and so compile + cache) every .html template. Returns the count."""
+    names = env.list_templates(extensions=["html"])
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+if PRECOMPILE_TEMPLATES:
+    precompile_templates()
+
+
+if __name__ == "__main__":
+    count = precompile_templates()
+    print(f"✅ Precompiled {count} templates into {JINJA_CACHE_DIR}")
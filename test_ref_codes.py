@@ -0,0 +1,72 @@
+"""
+Ref Code Tests — database/ref_codes.py
+Checks the keyed permutation behind ref codes: distinct sequence numbers
+give distinct codes, and every code is 8 lowercase base36 characters.
+Pure code, no database needed.
+Run with: python test_ref_codes.py
+"""
+
+import random
+from database.ref_codes import permute, encode, code_for, ALPHABET, CODE_LENGTH, DOMAIN
+
+PASS = 0
+FAIL = 0
+
+KEY = "test-key"
+
+
+def test(name, condition):
+    global PASS, FAIL
+    status = "✅ PASS" if condition else "❌ FAIL"
+    if condition:
+        PASS += 1
+    else:
+        FAIL += 1
+    print(f"  {status} — {name}")
+
+
+print("\n🔑 Ref Code Tests\n" + "="*50)
+
+# 1. Bijectivity
+print("\n1. Distinct inputs → distinct codes")
+first = [permute(n, KEY) for n in range(20_000)]
+test("First 20k sequence numbers map to 20k distinct values", len(set(first)) == len(first))
+
+rng = random.Random(42)
+sample = rng.sample(range(DOMAIN), 20_000)
+test("20k random inputs across the domain map to distinct values",
+     len({permute(n, KEY) for n in sample}) == len(sample))
+test("Every output stays inside the domain", all(0 <= v < DOMAIN for v in first))
+test("Top of the domain is accepted", 0 <= permute(DOMAIN - 1, KEY) < DOMAIN)
+
+try:
+    permute(DOMAIN, KEY)
+    rejected = False
+except ValueError:
+    rejected = True
+test("Values outside the domain are rejected", rejected)
+
+# 2. Codes
+print("\n2. Code format")
+codes = [code_for(n, KEY) for n in range(20_000)]
+test("Every code is 8 characters", all(len(c) == CODE_LENGTH for c in codes))
+test("Codes use only lowercase base36", all(set(c) <= set(ALPHABET) for c in codes))
+test("20k codes are distinct", len(set(codes)) == len(codes))
+test("encode() pads small values to full width", encode(0) == "0" * CODE_LENGTH and encode(35) == "0000000z")
+test("encode() of the largest value is all z", encode(DOMAIN - 1) == "z" * CODE_LENGTH)
+test("Consecutive numbers do not give neighbouring codes",
+     sum(codes[i][:4] == codes[i + 1][:4] for i in range(1000)) < 50)
+
+# 3. Keying
+print("\n3. Keying")
+test("Same key, same code", code_for(12345, KEY) == code_for(12345, KEY))
+test("Different key, different codes",
+     sum(code_for(n, KEY) != code_for(n, "other-key") for n in range(1000)) > 990)
+
+print(f"\n{'='*50}")
+print(f"Results: {PASS} passed, {FAIL} failed out of {PASS + FAIL} tests")
+if FAIL == 0:
+    print("🎉 All ref code tests passed!")
+else:
+    print("⚠️  Some tests failed — review above.")
+print()
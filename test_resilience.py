@@ -0,0 +1,122 @@
+"""
+Circuit Breaker Tests — resilience.py
+Walks a CircuitBreaker through closed → open → half-open → closed/open,
+including the single half-open trial, slow calls and the adaptive timeout.
+Pure code, no database needed.
+Run with: python test_resilience.py
+"""
+
+import time
+from resilience import CircuitBreaker, CircuitOpenError, ConcurrencyLimit, Overloaded, CLOSED, OPEN, HALF_OPEN
+
+PASS = 0
+FAIL = 0
+
+RESET = 0.05
+
+
+def test(name, condition):
+    global PASS, FAIL
+    status = "✅ PASS" if condition else "❌ FAIL"
+    if condition:
+        PASS += 1
+    else:
+        FAIL += 1
+    print(f"  {status} — {name}")
+
+
+def failing_call(breaker):
+    try:
+        with breaker.guard():
+            raise ConnectionError("boom")
+    except ConnectionError:
+        pass
+
+
+print("\n⚡ Circuit Breaker Tests\n" + "="*50)
+
+# 1. Closed → open
+print("\n1. Opening")
+breaker = CircuitBreaker("test-open", failure_threshold=3, reset_seconds=RESET)
+test("Starts closed and allows calls", breaker.state == CLOSED and breaker.allow())
+failing_call(breaker)
+failing_call(breaker)
+test("Stays closed below the threshold", breaker.state == CLOSED and breaker.failures == 2)
+breaker.record_success()
+test("A success resets the failure count", breaker.failures == 0)
+for _ in range(3):
+    failing_call(breaker)
+test("Opens after 3 failures in a row", breaker.state == OPEN)
+test("Refuses calls while open", not breaker.allow())
+try:
+    with breaker.guard():
+        ran = True
+    ran = True
+except CircuitOpenError as e:
+    ran = False
+    test("guard() raises CircuitOpenError with a Retry-After", e.retry_after >= 1.0)
+test("guard() does not run the block while open", not ran)
+test("Last error is kept for status()", "boom" in breaker.status()["last_error"])
+
+# 2. Half-open: exactly one trial
+print("\n2. Half-open")
+time.sleep(RESET * 1.2)
+test("First caller after reset_seconds gets the trial", breaker.allow() and breaker.state == HALF_OPEN)
+test("A second caller is refused during the trial", not breaker.allow())
+breaker.record_success(5.0)
+test("A successful trial closes the breaker", breaker.state == CLOSED and breaker.allow())
+
+for _ in range(3):
+    failing_call(breaker)
+time.sleep(RESET * 1.2)
+failing_call(breaker)
+test("A failed trial reopens the breaker", breaker.state == OPEN and not breaker.allow())
+
+time.sleep(RESET * 1.2)
+test("Reopened breaker offers a new trial after reset_seconds", breaker.allow())
+time.sleep(RESET * 1.2)
+test("A trial that never reports back is given up on", breaker.allow())
+
+# 3. Slow calls
+print("\n3. Slow calls")
+breaker = CircuitBreaker("test-slow", failure_threshold=2, reset_seconds=RESET, slow_call_ms=100)
+breaker.record_success(50.0)
+test("A fast call is a success", breaker.failures == 0)
+breaker.record_success(500.0)
+breaker.record_success(500.0)
+test("Calls slower than slow_call_ms count as failures", breaker.state == OPEN)
+test("Slow-call reason is reported", "slow call" in breaker.last_error)
+
+# 4. Adaptive timeout
+print("\n4. Adaptive timeout")
+breaker = CircuitBreaker("test-timeout", min_timeout=0.5, max_timeout=5.0)
+test("No samples yet → max_timeout", breaker.timeout == 5.0)
+for _ in range(20):
+    breaker.record_success(10.0)
+test("Steady fast calls → min_timeout floor", breaker.timeout == 0.5)
+for _ in range(20):
+    breaker.record_success(3000.0)
+test("Slow calls raise the timeout", 0.5 < breaker.timeout <= 5.0)
+for _ in range(20):
+    breaker.record_success(60000.0)
+test("Capped at max_timeout", breaker.timeout == 5.0)
+
+# 5. Concurrency limit
+print("\n5. Concurrency limit")
+limit = ConcurrencyLimit("test-limit", 1)
+with limit.slot():
+    try:
+        with limit.slot():
+            shed = False
+    except Overloaded:
+        shed = True
+test("Second concurrent request is shed", shed and limit.shed == 1)
+test("Slot is released afterwards", limit.in_flight == 0)
+
+print(f"\n{'='*50}")
+print(f"Results: {PASS} passed, {FAIL} failed out of {PASS + FAIL} tests")
+if FAIL == 0:
+    print("🎉 All circuit breaker tests passed!")
+else:
+    print("⚠️  Some tests failed — review above.")
+print()
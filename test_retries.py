@@ -0,0 +1,166 @@
+"""
+Transaction Retry Tests — database/retry.py
+Injects serialization failures (SQLSTATE 40001) into transactions and checks
+that run_transaction retries, rolls back each failed attempt, and gives up.
+Needs a local PostgreSQL in DATABASE_URL; creates and drops one scratch table.
+Run with: python test_retries.py
+"""
+
+import threading
+from database import get_cursor
+import database.retry as retry
+from database.retry import run_transaction
+
+PASS = 0
+FAIL = 0
+
+INJECT_40001 = """
+    DO $$ BEGIN
+        RAISE EXCEPTION 'injected conflict' USING ERRCODE = 'serialization_failure';
+    END $$
+"""
+
+
+def test(name, condition):
+    global PASS, FAIL
+    status = "✅ PASS" if condition else "❌ FAIL"
+    if condition:
+        PASS += 1
+    else:
+        FAIL += 1
+    print(f"  {status} — {name}")
+
+
+def rows():
+    with get_cursor() as cur:
+        cur.execute("SELECT note FROM retry_test ORDER BY id")
+        return [r["note"] for r in cur.fetchall()]
+
+
+def reset():
+    with get_cursor() as cur:
+        cur.execute("TRUNCATE retry_test")
+
+
+print("\n🔁 Transaction Retry Tests\n" + "="*50)
+
+# Keep the suite fast; backoff itself is checked separately below
+retry.DB_RETRY_BASE_MS = 1
+retry.DB_RETRY_MAX_MS = 5
+
+with get_cursor() as cur:
+    cur.execute("CREATE TABLE IF NOT EXISTS retry_test (id SERIAL PRIMARY KEY, note TEXT)")
+reset()
+
+try:
+    # 1. Injected conflicts are retried and only the last attempt commits
+    print("\n1. Transient 40001")
+    calls = []
+
+    def flaky_insert(cur):
+        calls.append(1)
+        cur.execute("INSERT INTO retry_test (note) VALUES (%s)", (f"attempt {len(calls)}",))
+        if len(calls) < 3:
+            cur.execute(INJECT_40001)
+        return "done"
+
+    result = run_transaction(flaky_insert)
+    test("Returns fn's result after retries", result == "done")
+    test("Ran 3 attempts", len(calls) == 3)
+    test("Failed attempts rolled back, last one committed", rows() == ["attempt 3"])
+
+    # 2. A persistent conflict is raised after DB_RETRY_ATTEMPTS
+    print("\n2. Persistent 40001")
+    reset()
+    calls = []
+
+    def always_conflicts(cur):
+        calls.append(1)
+        cur.execute("INSERT INTO retry_test (note) VALUES ('never')")
+        cur.execute(INJECT_40001)
+
+    try:
+        run_transaction(always_conflicts, attempts=4)
+        raised = None
+    except Exception as e:
+        raised = e
+    test("Raises the serialization failure", getattr(raised, "sqlstate", None) == "40001")
+    test("Gave up after 4 attempts", len(calls) == 4)
+    test("Nothing committed", rows() == [])
+
+    # 3. Other errors are not retried
+    print("\n3. Non-retryable errors")
+    calls = []
+
+    def bad_sql(cur):
+        calls.append(1)
+        cur.execute("SELECT * FROM no_such_table")
+
+    try:
+        run_transaction(bad_sql)
+    except Exception as e:
+        raised = e
+    test("Undefined table raised at once (1 attempt)", len(calls) == 1 and getattr(raised, "sqlstate", None) == "42P01")
+
+    calls = []
+
+    def python_error(cur):
+        calls.append(1)
+        raise ValueError("not a database error")
+
+    try:
+        run_transaction(python_error)
+    except ValueError:
+        pass
+    test("Python exception raised at once (1 attempt)", len(calls) == 1)
+
+    # 4. A real conflict: two SERIALIZABLE transactions read-then-write the same rows
+    print("\n4. Real serialization conflict")
+    reset()
+    barrier = threading.Barrier(2, timeout=10)
+    attempts = {"a": 0, "b": 0}
+    errors = []
+
+    def count_then_insert(worker):
+        def txn(cur):
+            attempts[worker] += 1
+            cur.execute("SET TRANSACTION ISOLATION LEVEL SERIALIZABLE")
+            cur.execute("SELECT COUNT(*) AS cnt FROM retry_test")
+            n = cur.fetchone()["cnt"]
+            if attempts[worker] == 1:
+                barrier.wait()      # both have read before either writes
+            cur.execute("INSERT INTO retry_test (note) VALUES (%s)", (f"{worker} saw {n}",))
+        return txn
+
+    def worker(name):
+        try:
+            run_transaction(count_then_insert(name))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(name,)) for name in attempts]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    test("Both transactions committed", not errors and len(rows()) == 2)
+    test("The loser was retried", sum(attempts.values()) >= 3)
+    test("Retry saw the winner's row", sorted(note.split(" saw ")[1] for note in rows()) == ["0", "1"])
+
+    # 5. Backoff stays within its exponential ceiling
+    print("\n5. Backoff")
+    retry.DB_RETRY_BASE_MS, retry.DB_RETRY_MAX_MS = 10, 500
+    test("Attempt 1 waits at most 10 ms", all(retry.backoff(1) <= 0.010 for _ in range(100)))
+    test("Attempt 4 waits at most 80 ms", all(retry.backoff(4) <= 0.080 for _ in range(100)))
+    test("Capped at DB_RETRY_MAX_MS", all(retry.backoff(20) <= 0.500 for _ in range(100)))
+finally:
+    with get_cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS retry_test")
+
+print(f"\n{'='*50}")
+print(f"Results: {PASS} passed, {FAIL} failed out of {PASS + FAIL} tests")
+if FAIL == 0:
+    print("🎉 All retry tests passed!")
+else:
+    print("⚠️  Some tests failed — review above.")
+print()
@@ -0,0 +1,140 @@
+"""
+Spool Tests — database/spool.py
+Appends records to a Journal in a scratch directory and checks that replay
+seals the active file, claims and removes sealed files, keeps a file whose
+handler failed, adopts files of dead processes, and enforces max_bytes.
+Pure code, no database needed.
+Run with: python test_spool.py
+"""
+
+import os
+import glob
+import tempfile
+import subprocess
+import sys
+from database.spool import Journal, SpoolFull
+
+PASS = 0
+FAIL = 0
+
+
+def test(name, condition):
+    global PASS, FAIL
+    status = "✅ PASS" if condition else "❌ FAIL"
+    if condition:
+        PASS += 1
+    else:
+        FAIL += 1
+    print(f"  {status} — {name}")
+
+
+def files(journal, pattern="*"):
+    return glob.glob(os.path.join(journal.directory, f"{journal.name}-{pattern}"))
+
+
+def record(i):
+    return {"kind": "visit", "visit_token": f"token-{i}"}
+
+
+print("\n📼 Spool Tests\n" + "="*50)
+
+directory = tempfile.mkdtemp(prefix="spool-test-")
+
+# 1. Seal and replay
+print("\n1. Seal and replay")
+journal = Journal("visits", directory)
+test("Empty directory → nothing pending", not journal.pending)
+for i in range(3):
+    journal.append(record(i))
+test("Appends go to this process's .jsonl", files(journal) == [journal._active_path] and journal.pending)
+
+batches = []
+replayed = journal.replay(batches.append)
+test("Replay returns the record count", replayed == 3)
+test("Handler got the records in order", batches == [[record(0), record(1), record(2)]])
+test("Replayed file is removed", files(journal) == [])
+test("Nothing pending afterwards", not journal.pending)
+
+journal.append(record(3))
+test("Appends after replay start a fresh file", files(journal) == [journal._active_path])
+journal.replay(batches.append)
+
+# 2. Failed handler keeps the file
+print("\n2. Handler failure")
+journal.append(record(4))
+
+
+def broken(records):
+    raise RuntimeError("database down")
+
+
+try:
+    journal.replay(broken)
+    raised = False
+except RuntimeError:
+    raised = True
+test("Handler error is raised", raised)
+test("Sealed file is kept, unclaimed", len(files(journal, "*.sealed")) == 1 and not files(journal, "*.sealed.*"))
+journal.append(record(5))
+batches = []
+test("Next replay picks up kept and new records", journal.replay(batches.append) == 2)
+test("Oldest file first", batches == [[record(4)], [record(5)]])
+
+# 3. Torn lines and dead processes
+print("\n3. Recovery")
+with open(os.path.join(directory, "visits-1-999.sealed"), "w", encoding="utf-8") as f:
+    f.write('{"kind": "visit", "visit_token": "torn-ok"}\n{"kind": "vis')
+batches = []
+journal.replay(batches.append)
+test("Torn final line is skipped, the rest replayed", batches == [[{"kind": "visit", "visit_token": "torn-ok"}]])
+
+dead = subprocess.Popen([sys.executable, "-c", "pass"])
+dead.wait()
+with open(os.path.join(directory, f"visits-{dead.pid}.jsonl"), "w", encoding="utf-8") as f:
+    f.write('{"kind": "visit", "visit_token": "orphan"}\n')
+with open(os.path.join(directory, f"visits-2-{dead.pid}.sealed.{dead.pid}"), "w", encoding="utf-8") as f:
+    f.write('{"kind": "visit", "visit_token": "claimed-by-dead"}\n')
+batches = []
+journal.replay(batches.append)
+tokens = sorted(r["visit_token"] for batch in batches for r in batch)
+test("Dead process's active file and claim are adopted", tokens == ["claimed-by-dead", "orphan"])
+test("Directory is empty again", files(journal) == [])
+
+# 4. Size cap
+print("\n4. Size cap")
+line_bytes = len('{"kind":"visit","visit_token":"token-0"}\n')
+capped = Journal("capped", directory, max_bytes=line_bytes * 3)
+for i in range(3):
+    capped.append(record(i))
+try:
+    capped.append(record(3))
+    full = False
+except SpoolFull:
+    full = True
+test("Append past max_bytes raises SpoolFull", full)
+test("SpoolFull is an OSError", issubclass(SpoolFull, OSError))
+test("Dropped records are counted", capped.dropped == 1 and capped.status()["dropped"] == 1)
+test("Nothing is written past the cap", capped.status()["bytes"] == line_bytes * 3)
+capped.replay(lambda records: None)
+capped.append(record(4))
+test("Replay frees space for new records", capped.status()["bytes"] == line_bytes)
+
+reopened = Journal("capped", directory, max_bytes=line_bytes)
+try:
+    reopened.append(record(5))
+    full = False
+except SpoolFull:
+    full = True
+test("Leftover files count towards the cap after a restart", full)
+
+for path in files(capped):
+    os.remove(path)
+os.rmdir(directory)
+
+print(f"\n{'='*50}")
+print(f"Results: {PASS} passed, {FAIL} failed out of {PASS + FAIL} tests")
+if FAIL == 0:
+    print("🎉 All spool tests passed!")
+else:
+    print("⚠️  Some tests failed — review above.")
+print()
@@ -0,0 +1,122 @@
+"""
+Per-request stage timing for AI Portfolio.
+
+Wrap interesting work in `with stage("name"):` — ref lookup, DB queries,
+GA4 / SMTP calls, template rendering. TimingMiddleware decides per request
+whether to time it:
+- admin requests (valid auth cookie) are always timed and get a
+  `Server-Timing` header the browser devtools can display;
+- other requests are sampled at TIMING_SAMPLE_RATE and only logged.
+
+Untimed requests pay a single ContextVar lookup per stage.
+"""
+
+import os
+import json
+import hmac
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from starlette.datastructures import MutableHeaders
+from starlette.requests import cookie_parser
+from config import SESSION_TOKEN
+
+TIMING_SAMPLE_RATE = float(os.getenv("TIMING_SAMPLE_RATE", "0.01"))
+
+
+class RequestTimer:
+    __slots__ = ("start", "stages")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: dict[str, list] = {}       # name → [total_ms, count]
+
+    def add(self, name: str, ms: float):
+        entry = self.stages.get(name)
+        if entry is None:
+            self.stages[name] = [ms, 1]
+        else:
+            entry[0] += ms
+            entry[1] += 1
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def server_timing(self) -> str:
+        parts = [
+            f'{name};desc="{count}x";dur={ms:.1f}' if count > 1 else f"{name};dur={ms:.1f}"
+            for name, (ms, count) in self.stages.items()
+        ]
+        parts.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[RequestTimer | None] = ContextVar("request_timer", default=None)
+
+
+def current_timer() -> RequestTimer | None:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str):
+    """Time the enclosed block as `name` if the current request is being timed."""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, (time.perf_counter() - start) * 1000)
+
+
+def _is_admin(scope) -> bool:
+    for key, value in scope.get("headers", []):
+        if key == b"cookie":
+            auth = cookie_parser(value.decode("latin-1")).get("auth", "")
+            return hmac.compare_digest(auth, SESSION_TOKEN)
+    return False
+
+
+class TimingMiddleware:
+    def __init__(self, app, sample_rate: float = TIMING_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        admin = _is_admin(scope)
+        if not admin and random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        timer = RequestTimer()
+        token = _current.set(timer)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if admin:
+                    MutableHeaders(raw=message["headers"]).append("Server-Timing", timer.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            print("[Timing] " + json.dumps({
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status,
+                "total_ms": round(timer.elapsed_ms(), 1),
+                "stages": {name: round(ms, 1) for name, (ms, _) in timer.stages.items()},
+                "sampled": not admin,
+            }))
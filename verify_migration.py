@@ -1,11 +1,26 @@
 """
 Migration verification script for AI Portfolio.
 Compares a source DB (Neon) and a target DB (CockroachDB) after import.
+
+With --deep, every row is compared as well. Each table is split into id
+ranges of --chunk-size source rows; both sides hash each range (an md5 over
+per-row md5s, computed in the database) on --jobs connections at once.
+Only ranges whose hashes differ are split further, down to ranges small
+enough to compare row by row, so what crosses the network grows with the
+number of differences rather than the size of the tables. Failures name
+the ids missing from the target, extra in it, or changed.
+
+Usage:
+    python verify_migration.py --source $NEON_URL --target $COCKROACH_URL --deep
 """
 
 import argparse
 import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import psycopg
+from psycopg import sql
 from psycopg.rows import dict_row
 
 
@@ -123,10 +138,192 @@ def _smoke_dashboard_query(conn) -> list[str]:
         return [f"dashboard smoke query failed: {e}"]
 
 
+# ─── Deep verification ───
+
+SOURCE, TARGET = "source", "target"
+
+# Ranges with at most this many source rows are compared row by row
+LEAF_ROWS = 200
+# A mismatching range is re-split into this many parts per level
+FANOUT = 16
+# Ids listed per kind of difference; the rest are counted
+MAX_REPORTED_IDS = 20
+
+
+class _Connections:
+    """One connection per worker thread and side, opened on first use."""
+
+    def __init__(self, urls: dict[str, str], jobs: int):
+        self.urls = urls
+        self.executor = ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="verify")
+        self._local = threading.local()
+        self._opened = []
+        self._lock = threading.Lock()
+
+    def _conn(self, side: str):
+        conns = self._local.__dict__.setdefault("conns", {})
+        if side not in conns:
+            conn = psycopg.connect(self.urls[side], autocommit=True, row_factory=dict_row)
+            # Timestamps are hashed as text, so both sides must render them alike
+            conn.execute("SET TIME ZONE 'UTC'")
+            conns[side] = conn
+            with self._lock:
+                self._opened.append(conn)
+        return conns[side]
+
+    def _fetch(self, side: str, query, params: dict) -> list[dict]:
+        with self._conn(side).cursor() as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
+
+    def submit(self, side: str, query, params: dict):
+        return self.executor.submit(self._fetch, side, query, params)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+        for conn in self._opened:
+            conn.close()
+
+
+def _range_filter(lo, hi):
+    """WHERE clause for ids in (lo, hi]; None leaves that side open."""
+    conditions = []
+    if lo is not None:
+        conditions.append(sql.SQL("id > %(lo)s"))
+    if hi is not None:
+        conditions.append(sql.SQL("id <= %(hi)s"))
+    if not conditions:
+        return sql.SQL("TRUE")
+    return sql.SQL(" AND ").join(conditions)
+
+
+def _row_hash(columns: list[str]):
+    """md5 of one row's columns as text, NULL kept distinct from ''."""
+    parts = [sql.SQL("coalesce({}::text, '\\N')").format(sql.Identifier(c)) for c in columns]
+    return sql.SQL("md5(concat_ws(chr(31), {}))").format(sql.SQL(", ").join(parts))
+
+
+class _TableDiff:
+    def __init__(self, table: str, columns: list[str], conns: _Connections):
+        self.table = table
+        self.columns = columns
+        self.conns = conns
+        self.missing: list[int] = []
+        self.extra: list[int] = []
+        self.changed: list[int] = []
+        self.chunks = 0
+        self.mismatched = 0
+        self.rows = {SOURCE: 0, TARGET: 0}
+
+    def _boundaries(self, lo, hi, rows_per_range: int) -> list:
+        """Source ids splitting (lo, hi] into ranges of rows_per_range rows."""
+        query = sql.SQL("""
+            SELECT id FROM (
+                SELECT id, row_number() OVER (ORDER BY id) AS rn FROM {table} WHERE {where}
+            ) numbered
+            WHERE mod(rn, %(every)s) = 0
+            ORDER BY id
+        """).format(table=sql.Identifier(self.table), where=_range_filter(lo, hi))
+        rows = self.conns.submit(SOURCE, query, {"lo": lo, "hi": hi, "every": rows_per_range}).result()
+        bounds = [row["id"] for row in rows]
+        if bounds and bounds[-1] == hi:
+            bounds.pop()
+        return bounds
+
+    def _hash_ranges(self, ranges: list[tuple]) -> list[dict]:
+        query = sql.SQL("""
+            SELECT count(*) AS n, md5(string_agg({row_hash}, '' ORDER BY id)) AS h
+            FROM {table} WHERE {where}
+        """)
+        futures = []
+        for lo, hi in ranges:
+            q = query.format(row_hash=_row_hash(self.columns), table=sql.Identifier(self.table),
+                             where=_range_filter(lo, hi))
+            futures.append({side: self.conns.submit(side, q, {"lo": lo, "hi": hi}) for side in (SOURCE, TARGET)})
+        return [{side: future.result()[0] for side, future in pair.items()} for pair in futures]
+
+    def _compare_rows(self, lo, hi) -> None:
+        query = sql.SQL("SELECT id, {row_hash} AS h FROM {table} WHERE {where}").format(
+            row_hash=_row_hash(self.columns), table=sql.Identifier(self.table), where=_range_filter(lo, hi))
+        futures = {side: self.conns.submit(side, query, {"lo": lo, "hi": hi}) for side in (SOURCE, TARGET)}
+        source = {row["id"]: row["h"] for row in futures[SOURCE].result()}
+        target = {row["id"]: row["h"] for row in futures[TARGET].result()}
+        self.missing.extend(sorted(source.keys() - target.keys()))
+        self.extra.extend(sorted(target.keys() - source.keys()))
+        self.changed.extend(sorted(i for i in source.keys() & target.keys() if source[i] != target[i]))
+
+    def compare(self, lo=None, hi=None, rows_per_range: int = 5000, top: bool = True) -> None:
+        bounds = self._boundaries(lo, hi, rows_per_range)
+        ranges = list(zip([lo] + bounds, bounds + [hi]))
+        hashes = self._hash_ranges(ranges)
+        if top:
+            self.chunks = len(ranges)
+            for side in (SOURCE, TARGET):
+                self.rows[side] = sum(h[side]["n"] for h in hashes)
+
+        for (range_lo, range_hi), h in zip(ranges, hashes):
+            if h[SOURCE]["n"] == h[TARGET]["n"] and h[SOURCE]["h"] == h[TARGET]["h"]:
+                continue
+            if top:
+                self.mismatched += 1
+            if h[SOURCE]["n"] <= LEAF_ROWS:
+                self._compare_rows(range_lo, range_hi)
+            else:
+                self.compare(range_lo, range_hi, max(LEAF_ROWS, rows_per_range // FANOUT), top=False)
+
+    def failures(self) -> list[str]:
+        def ids(values):
+            shown = ", ".join(str(i) for i in values[:MAX_REPORTED_IDS])
+            more = len(values) - MAX_REPORTED_IDS
+            return shown + (f" (+{more} more)" if more > 0 else "")
+
+        failures = []
+        if self.rows[SOURCE] != self.rows[TARGET]:
+            failures.append(f"row count mismatch for {self.table}: source={self.rows[SOURCE]} target={self.rows[TARGET]}")
+        if self.missing:
+            failures.append(f"{self.table}: {len(self.missing)} rows missing in target, ids {ids(self.missing)}")
+        if self.extra:
+            failures.append(f"{self.table}: {len(self.extra)} rows only in target, ids {ids(self.extra)}")
+        if self.changed:
+            failures.append(f"{self.table}: {len(self.changed)} rows differ, ids {ids(self.changed)}")
+        return failures
+
+
+def deep_verify(source_url: str, target_url: str, tables: list[str],
+                chunk_size: int = 5000, jobs: int = 4) -> list[str]:
+    """Compare every row of `tables` between the two databases; returns failures."""
+    failures: list[str] = []
+    conns = _Connections({SOURCE: source_url, TARGET: target_url}, jobs)
+    try:
+        for table in tables:
+            started = time.perf_counter()
+            src_cols = _fetch_columns(conns._conn(SOURCE), table)
+            tgt_cols = _fetch_columns(conns._conn(TARGET), table)
+            columns = sorted(src_cols.keys() & tgt_cols.keys())
+            if "id" not in columns:
+                failures.append(f"{table}: no id column on both sides, cannot deep-verify")
+                continue
+            diff = _TableDiff(table, columns, conns)
+            try:
+                diff.compare(rows_per_range=chunk_size)
+            except Exception as e:
+                failures.append(f"deep check failed for {table}: {e}")
+                continue
+            failures.extend(diff.failures())
+            print(f"[Verify] {table}: {diff.rows[SOURCE]} rows in {diff.chunks} chunks, "
+                  f"{diff.mismatched} mismatched ({time.perf_counter() - started:.1f}s)")
+    finally:
+        conns.close()
+    return failures
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--source", required=True, help="SOURCE_DATABASE_URL (Neon)")
     parser.add_argument("--target", required=True, help="TARGET_DATABASE_URL (CockroachDB)")
+    parser.add_argument("--deep", action="store_true", help="Compare every row via chunked checksums")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Source rows per checksum chunk (--deep)")
+    parser.add_argument("--jobs", type=int, default=4, help="Connections per side (--deep)")
     args = parser.parse_args()
 
     failures: list[str] = []
@@ -149,6 +346,8 @@ def main():
                 if missing_cols:
                     failures.append(f"target missing columns in {table}: {sorted(missing_cols)}")
 
+                if args.deep:
+                    continue        # counted per chunk below, without a full COUNT(*)
                 try:
                     src_cnt = _row_count(src, table) if table in src_tables else None
                     tgt_cnt = _row_count(tgt, table)
@@ -164,6 +363,10 @@ def main():
 
             failures.extend(_smoke_dashboard_query(tgt))
 
+        if args.deep:
+            tables = sorted(REQUIRED_TABLES & src_tables & tgt_tables)
+            failures.extend(deep_verify(args.source, args.target, tables, args.chunk_size, args.jobs))
+
     except Exception as e:
         print(f"Verification failed to run: {e}")
         sys.exit(2)